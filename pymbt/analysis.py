@@ -0,0 +1,209 @@
+"""Static analysis of statecharts.
+
+StaticAnalysis finds structural problems in a statechart in time linear
+in its size, cheaply rejecting broken models before exploring them or
+running NuSMV:
+
+ * OR-states without a start state
+ * guards that are always false, i.e. constant, contradictory (e.g.
+   "m > 1 and m < 1") or outside the range of a variable, where the
+   values a variable may take are inferred when it is only ever
+   assigned numbers (or given by ranges)
+ * transitions triggered by events which are neither inputs nor produced
+   by any transition that may fire
+ * states that are never active, i.e. not reachable from the start state
+   through the hierarchy and transitions that may fire
+
+The last two are found together, following transitions from the start
+state as their states are reached and their events produced.
+
+A transition is dead when its guard is false, its event never occurs or
+its source state is unreachable.
+
+  >>> for problem in analyse(sc, inputs=['coffee', 'inc']):
+  ...     print problem
+
+check_start_nodes finds start nodes without exactly one successor in a
+graph, as make_statechart uses just one.
+"""
+
+from conflicts import _get_number, get_guard_bounds, intersect_bounds, is_empty, is_within
+from transition import get_names
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class StaticAnalysis(object):
+    """Static analysis of a statechart.
+
+    :param inputs: input events of the environment (default: every event
+                   that is not local)
+    :param ranges: dict of variable -> (lower, upper) bounds (inclusive)
+                   overriding inferred values
+    """
+
+    def __init__(self, sc, inputs=None, ranges=None):
+        sc.load_all()
+        self.sc = sc
+        self.inputs = None if inputs is None else set(inputs)
+        self.ranges = ranges or dict()
+        self.values = self.get_variable_values()
+        # variables only ever assigned integers
+        self.integers = set(name for (name, values) in self.values.items()
+                if values is not None and all(isinstance(v, (int, long)) for v in values))
+        self.false_guards = [t for t in sc.all_transitions if self.is_guard_false(t)]
+        self._propagate()
+        self.unreachable_states = [st for st in sc.all_states if st not in self.reachable]
+        self.dead_events = set(t.event for t in sc.all_transitions
+                if not self.is_input(t) and t.event not in self.live_events)
+        # transition -> reason it is dead
+        self.dead_transitions = dict()
+        false_guards = set(self.false_guards)
+        for transition in sc.all_transitions:
+            if transition in false_guards:
+                reason = "guard is always false"
+            elif transition.event in self.dead_events:
+                reason = "event %s never occurs" % transition.event
+            elif transition.source not in self.reachable:
+                reason = "source state is unreachable"
+            else:
+                continue
+            self.dead_transitions[transition] = reason
+
+    def _get_inits(self):
+        return [st.init for st in self.sc.all_states if st.is_or() and st.init is not None]
+
+    def get_variable_values(self):
+        """Returns dict of variable -> frozenset of the values assigned to
+        it, or None if it is assigned anything but numbers.
+        """
+        values = dict()
+        for transition in self._get_inits() + list(self.sc.all_transitions):
+            for (name, value) in transition.get_assignments():
+                number = _get_number(value)
+                if number is None:
+                    values[name] = None
+                elif values.get(name, ()) is not None:
+                    values[name] = values.get(name, frozenset()) | frozenset([number])
+        return values
+
+    def is_guard_false(self, transition):
+        """Returns True if the guard of the transition is provably always
+        false.
+        """
+        guard_ast = transition.guard_ast
+        if guard_ast is None:
+            return False
+        if not get_names(guard_ast):
+            try:
+                return not eval(transition.guard, {}, {})
+            except Exception:
+                return False
+        for (name, bounds) in get_guard_bounds(guard_ast, self.integers).items():
+            if is_empty(bounds):
+                return True
+            if name in self.ranges:
+                (lo, hi) = self.ranges[name]
+                if is_empty(intersect_bounds(bounds, ((lo, False), (hi, False)))):
+                    return True
+            elif self.values.get(name) is not None:
+                if not any(is_within(bounds, value) for value in self.values[name]):
+                    return True
+        return False
+
+    def is_input(self, transition):
+        """Returns True if the transition is triggered without any other
+        transition firing: by an input event, a timeout or no event.
+        """
+        event = transition.event
+        if not event or transition.timeout is not None:
+            return True
+        if self.sc.locals and event in self.sc.locals:
+            return False
+        return self.inputs is None or event in self.inputs
+
+    def _propagate(self):
+        """Finds the reachable states and the local (or other non-input)
+        events that may occur by firing every transition that may fire,
+        visiting each state and transition at most once.
+        """
+        false_guards = set(self.false_guards)
+        self.reachable = reachable = set()
+        self.live_events = live_events = set()
+        # event -> transitions from reachable states waiting for it
+        waiting = dict()
+        (states, transitions) = ([], [])
+
+        def add_state(state):
+            # entering a state enters its ancestors
+            while state is not None and state not in reachable:
+                reachable.add(state)
+                states.append(state)
+                state = state.parent
+        add_state(self.sc)
+        while states or transitions:
+            if transitions:
+                transition = transitions.pop()
+                add_state(transition.destination)
+                for event in transition.outputs:
+                    if event not in live_events:
+                        live_events.add(event)
+                        transitions.extend(waiting.pop(event, ()))
+                continue
+            state = states.pop()
+            if state.is_or():
+                if state.start_state is not None:
+                    add_state(state.start_state)
+            elif state.is_and():
+                for child in state.states:
+                    add_state(child)
+            for transition in state.transitions:
+                if transition in false_guards:
+                    continue
+                if self.is_input(transition) or transition.event in live_events:
+                    transitions.append(transition)
+                else:
+                    waiting.setdefault(transition.event, []).append(transition)
+
+    def get_problems(self):
+        """Returns a list of the problems found.
+        """
+        problems = []
+        for state in self.sc.all_states:
+            if state.is_or() and state.states and state.start_state is None:
+                problems.append("No start state in %r" % state)
+        for state in self.unreachable_states:
+            problems.append("Unreachable state %r" % state)
+        for transition in self.sc.all_transitions:
+            reason = self.dead_transitions.get(transition)
+            if reason:
+                problems.append("Dead transition %r from %r: %s" % (
+                        transition.get_label(), transition.source, reason))
+        return problems
+
+
+def analyse(sc, inputs=None, ranges=None):
+    """Returns a list of the problems found by a StaticAnalysis of sc.
+    """
+    problems = StaticAnalysis(sc, inputs, ranges).get_problems()
+    log.info("Found %d problems in %r", len(problems), sc)
+    return problems
+
+
+def check_start_nodes(g):
+    """Returns a list of problems with the start nodes of a statechart
+    graph (see make_statechart): those without exactly one successor.
+    """
+    problems = []
+    for node in g.nodes():
+        data = g.node[node]
+        if data['label'].lower() != "start":
+            continue
+        successors = g.out_degree(node)
+        if successors != 1:
+            parent = data.get('parent')
+            problems.append("Start node %r in %r has %d successors" % (node,
+                    g.node[parent]['label'] if parent else g.graph.get('name', 'root'),
+                    successors))
+    return problems
@@ -0,0 +1,150 @@
+"""Bisimulation minimization of explored state graphs.
+
+Configurations of an explored graph (see pymbt.explorer) that differ
+only in ways that can never be observed, e.g. in the value of a variable
+that never affects the outputs, are bisimilar: from each, the same input
+sets give the same outputs and lead to bisimilar configurations. minimize
+partitions the nodes of the graph into blocks of bisimilar nodes and
+returns the quotient graph of the blocks, a smaller graph with the same
+observable behaviour, mapping each block back to its configurations:
+
+  >>> graph = Explorer(sc, reduce=False).explore()
+  >>> quotient = minimize(graph)
+  >>> len(graph), len(quotient.graph)
+  (53, 26)
+  >>> quotient.get_configurations(quotient.initial)
+  [((8,), (('m', 0),))]
+
+Explored graphs are deterministic, having one edge for each input set
+from a node, so blocks are refined by Hopcroft's algorithm, the special
+case of Paige and Tarjan's algorithm for functions, in O(m log n) time
+for m edges and n nodes.
+
+The graph must be explored without partial-order reduction, which omits
+edges, so a missing edge would look like an input not accepted; graphs
+tagged reduced by the explorer are refused.
+"""
+
+import networkx as nx
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class BisimulationError(Exception):
+    pass
+
+
+class Quotient(object):
+    """Quotient of an explored graph by bisimulation.
+
+    graph has a node for each block, with the original nodes in attribute
+    nodes, and an edge for each (inputs, outputs) from the block, with
+    the indexes of the transitions fired by any of the original edges.
+    """
+
+    def __init__(self, original, blocks, block_of):
+        self.original = original
+        # block -> [original node], and original node -> block
+        self.blocks = blocks
+        self.block_of = block_of
+        self.initial = block_of.get(0)
+        # configuration -> original node
+        self.nodes = dict((data['configuration'], node)
+                for (node, data) in original.nodes(data=True))
+        self.graph = nx.MultiDiGraph()
+        for (block, nodes) in enumerate(blocks):
+            self.graph.add_node(block, nodes=nodes)
+        # (block, inputs, outputs) -> (successor block, transitions)
+        edges = dict()
+        for (node, successor, data) in original.edges(data=True):
+            key = (block_of[node], data['inputs'], data['outputs'])
+            entry = edges.setdefault(key, (block_of[successor], set()))
+            if entry[0] != block_of[successor]:
+                raise BisimulationError("Blocks are not stable for %r" % (key,))
+            entry[1].update(data.get('transitions', ()))
+        for ((block, inputs, outputs), (successor, transitions)) in sorted(edges.items()):
+            self.graph.add_edge(block, successor, inputs=inputs, outputs=outputs,
+                    transitions=tuple(sorted(transitions)))
+
+    def get_block(self, configuration):
+        """Returns the block of an explored configuration.
+        """
+        return self.block_of[self.nodes[configuration]]
+
+    def get_configurations(self, block):
+        return [self.original.node[node]['configuration'] for node in self.blocks[block]]
+
+
+def _get_label(data):
+    return (data['inputs'], data['outputs'])
+
+
+def minimize(graph, key=None):
+    """Returns the Quotient of an explored graph by bisimulation,
+    observing the inputs and outputs of each edge.
+
+    :param key: function of the configuration of a node giving what else
+                must be the same in a block, e.g. the active states
+    """
+    if graph.graph.get('reduced'):
+        raise BisimulationError("Graph explored with partial-order reduction, "
+                "explore with reduce=False")
+    nodes = sorted(graph.nodes())
+    # target -> [(label, source)]
+    inverse = dict((node, []) for node in nodes)
+    signatures = dict((node, set()) for node in nodes)
+    for (source, target, data) in graph.edges(data=True):
+        label = _get_label(data)
+        if label in signatures[source]:
+            raise BisimulationError("Node %r has more than one edge %r" % (source, label))
+        signatures[source].add(label)
+        inverse[target].append((label, source))
+    # initial blocks of nodes with the same labels (and key)
+    initial = dict()
+    for node in nodes:
+        signature = frozenset(signatures[node])
+        if key is not None:
+            signature = (signature, key(graph.node[node]['configuration']))
+        initial.setdefault(signature, []).append(node)
+    blocks = [set(block) for block in sorted(initial.values())]
+    block_of = dict((node, index) for (index, block) in enumerate(blocks) for node in block)
+    todo = range(len(blocks))
+    waiting = set(todo)
+    while todo:
+        splitter = todo.pop()
+        waiting.discard(splitter)
+        # label -> sources of edges into the splitter
+        sources = dict()
+        for node in list(blocks[splitter]):
+            for (label, source) in inverse[node]:
+                sources.setdefault(label, []).append(source)
+        for label in sorted(sources):
+            touched = dict()
+            for source in sources[label]:
+                touched.setdefault(block_of[source], []).append(source)
+            for (index, part) in sorted(touched.items()):
+                block = blocks[index]
+                if len(part) == len(block):
+                    continue
+                new = len(blocks)
+                blocks.append(set(part))
+                block.difference_update(part)
+                for node in part:
+                    block_of[node] = new
+                if index in waiting:
+                    add = new
+                else:
+                    add = new if len(part) <= len(block) else index
+                if add not in waiting:
+                    waiting.add(add)
+                    todo.append(add)
+    # number blocks in order of their first node
+    order = sorted(range(len(blocks)), key=lambda index: min(blocks[index]))
+    renumber = dict((index, number) for (number, index) in enumerate(order))
+    quotient = Quotient(graph, [sorted(blocks[index]) for index in order],
+            dict((node, renumber[index]) for (node, index) in block_of.items()))
+    log.info("Minimized graph of %d nodes, %d edges to %d blocks, %d edges",
+            len(nodes), graph.number_of_edges(), len(quotient.blocks),
+            quotient.graph.number_of_edges())
+    return quotient
@@ -0,0 +1,131 @@
+"""Checkpoints of simulations and explorations.
+
+A Checkpointer periodically saves the state of a target, i.e. a
+Simulator or an Explorer, to numbered checkpoint directories and resumes
+a new target from the latest one:
+
+  >>> checkpointer = Checkpointer("run1.checkpoints", interval=600)
+  >>> explorer = Explorer(sc)
+  >>> checkpointer.resume(explorer)  # False if there is no checkpoint
+  >>> explorer.explore(checkpointer=checkpointer)
+
+Targets implement get_checkpoint(directory), returning a picklable dict
+including the fingerprint of their statechart, and set_checkpoint(state,
+directory). Disk based stores link their files into the directory, which
+is cheap as those files are never modified in place.
+
+Each checkpoint is written to a temporary directory that is renamed once
+complete, and the directory of checkpoints synced, so a crash while
+saving leaves the previous checkpoint intact.
+Resuming checks the statechart fingerprint so that a checkpoint is not
+resumed against a changed model.
+"""
+
+import cPickle as pickle
+import os
+import re
+import shutil
+import time
+
+import logging
+log = logging.getLogger(__name__)
+
+re_checkpoint = re.compile(r"^checkpoint-(\d+)$")
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class Checkpointer(object):
+    """Saves checkpoints of a simulator or explorer to a directory.
+
+    :param directory: directory to save checkpoints in
+    :param interval: minimum seconds between checkpoints from maybe_save()
+    :param keep: number of checkpoints to keep
+    """
+
+    state_file = "state.pickle"
+
+    def __init__(self, directory, interval=300.0, keep=2):
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.last_save = time.time()
+
+    def get_checkpoints(self):
+        """Returns the numbers of the complete checkpoints, oldest first.
+        """
+        numbers = []
+        for name in os.listdir(self.directory):
+            m = re_checkpoint.match(name)
+            if m:
+                numbers.append(int(m.group(1)))
+        return sorted(numbers)
+
+    def _get_path(self, number):
+        return os.path.join(self.directory, "checkpoint-%08d" % number)
+
+    def get_latest(self):
+        """Returns the path of the latest checkpoint, or None.
+        """
+        numbers = self.get_checkpoints()
+        return self._get_path(numbers[-1]) if numbers else None
+
+    def save(self, target):
+        """Saves a checkpoint of target, returning its path.
+        """
+        numbers = self.get_checkpoints()
+        path = self._get_path(numbers[-1] + 1 if numbers else 0)
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):  # left by a crash
+            shutil.rmtree(tmp_path)
+        os.mkdir(tmp_path)
+        state = target.get_checkpoint(tmp_path)
+        with open(os.path.join(tmp_path, self.state_file), 'wb') as fp:
+            pickle.dump(state, fp, pickle.HIGHEST_PROTOCOL)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.rename(tmp_path, path)
+        # make the rename durable
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        log.info("Saved checkpoint %s", path)
+        for number in self.get_checkpoints()[:-self.keep]:
+            shutil.rmtree(self._get_path(number), ignore_errors=True)
+        self.last_save = time.time()
+        return path
+
+    def maybe_save(self, target):
+        """Saves a checkpoint of target if interval seconds have passed
+        since the last one, returning its path or None.
+        """
+        if time.time() - self.last_save >= self.interval:
+            return self.save(target)
+        return None
+
+    def load(self, path, sc):
+        """Returns the state saved in a checkpoint, checking that it is
+        for the given statechart.
+        """
+        with open(os.path.join(path, self.state_file), 'rb') as fp:
+            state = pickle.load(fp)
+        if state['fingerprint'] != sc.get_fingerprint():
+            raise CheckpointError("Checkpoint %s is not for statechart %r" % (path, sc))
+        return state
+
+    def resume(self, target):
+        """Restores target from the latest checkpoint, returning False if
+        there are no checkpoints.
+        """
+        path = self.get_latest()
+        if path is None:
+            return False
+        target.set_checkpoint(self.load(path, target.sc), path)
+        log.info("Resumed from checkpoint %s", path)
+        return True
@@ -0,0 +1,307 @@
+"""The pymbt command line tool.
+
+  $ pymbt simulate models/cvm.graphml power_on inc coffee,inc
+  $ pymbt explore models/cvm.graphml --max-inputs 2
+  $ pymbt generate models/cvm.graphml --count 100 --length 20 -o tests/generated
+  $ pymbt translate models/cvm.graphml --range m=0..11 -o cvm.smv
+  $ pymbt analyse models/cvm.graphml
+
+Each command imports the modules it needs when it runs, so the tool
+starts without importing networkx until a model is read. To avoid
+reading and compiling models on every run, a server keeps them loaded
+(frozen, see pymbt.frozen, and read again when their file changes) and
+runs commands sent to a local socket:
+
+  $ pymbt serve --socket /tmp/pymbt.sock &
+  $ pymbt --server /tmp/pymbt.sock explore models/cvm.graphml
+
+A client sends its parsed arguments as a line of JSON and prints the
+output in the reply, and so imports nothing but this module.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import traceback
+from StringIO import StringIO
+
+import logging
+log = logging.getLogger(__name__)
+
+# arguments which are paths, made absolute before sending to a server
+PATH_ARGS = ('model', 'output', 'cache')
+
+
+class CLIError(Exception):
+    pass
+
+
+class ModelCache(object):
+    """Statecharts read from files, read again when a file changes.
+
+    :param freeze: if True keep frozen statecharts, which can be shared
+                   by commands running in any threads
+    """
+
+    def __init__(self, freeze=False):
+        self.freeze = freeze
+        # absolute path -> (modification time, statechart)
+        self.models = dict()
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            entry = self.models.get(path)
+            if entry is None or entry[0] != mtime:
+                from statechart import read_statechart
+                sc = read_statechart(path)
+                if self.freeze:
+                    from frozen import freeze
+                    sc = freeze(sc)
+                entry = self.models[path] = (mtime, sc)
+                self.loads += 1
+                log.info("Loaded %s", path)
+        return entry[1]
+
+
+def cmd_simulate(args, models, out):
+    from simulator import Simulator
+    sim = Simulator(models.get(args.model), seed=args.seed)
+    steps = [step.split(",") for step in args.steps]
+    steps.extend([None] * args.random)
+    for (number, inputs) in enumerate(steps):
+        if inputs is None:
+            event = sim.random_step()
+            if event is None:
+                print >> out, "no inputs expected"
+                break
+            inputs = [event]
+        else:
+            sim.enabled_inputs.update(inputs)
+            sim.next()
+        states = sorted(st.label for st in sim.active_states if st.is_basic())
+        print >> out, "%d: %s -> %s states %s variables %r" % (number + 1, ",".join(inputs),
+                ",".join(sorted(sim.outputs)) or "-", ",".join(states),
+                sorted(sim.variables.items()))
+
+
+def cmd_explore(args, models, out):
+    from explorer import Explorer
+    explorer = Explorer(models.get(args.model), max_inputs=args.max_inputs,
+            reduce=not args.no_reduce, record_graph=False)
+    explorer.explore(max_states=args.max_states)
+    for (name, value) in sorted(explorer.stats.items()):
+        print >> out, "%s: %s" % (name, value)
+
+
+def cmd_generate(args, models, out):
+    from generator import generate_random_sequences
+    sequences = generate_random_sequences(models.get(args.model), args.count, args.length,
+            seed=args.seed)
+    if args.minimize:
+        from suite import minimize_suite
+        sequences = minimize_suite(sequences, weight='length')
+    if args.output:
+        if not args.adapter:
+            raise CLIError("Generating test modules needs --adapter")
+        from suite import write_test_modules
+        for path in write_test_modules(args.output, sequences, args.model, args.adapter,
+                args.adapter_arg):
+            print >> out, path
+    else:
+        for sequence in sequences:
+            print >> out, [(list(inputs), sorted(outputs)) for (inputs, outputs) in sequence.steps]
+
+
+def cmd_translate(args, models, out):
+    from nusmv.translator import FragmentCache, NuSMVModel
+    ranges = dict()
+    for item in args.range:
+        (name, sep, value) = item.partition("=")
+        if not sep:
+            raise CLIError("Expected --range name=type, got %r" % item)
+        ranges[name] = value
+    cache = FragmentCache(args.cache) if args.cache else None
+    model = NuSMVModel(models.get(args.model), ranges=ranges, cache=cache)
+    if args.output:
+        model.write_file(args.output)
+    else:
+        model.write(out)
+    if cache is not None:
+        cache.save()
+
+
+def cmd_analyse(args, models, out):
+    from analysis import analyse
+    problems = analyse(models.get(args.model), inputs=args.input or None)
+    for problem in problems:
+        print >> out, problem
+    return 1 if problems else 0
+
+
+def cmd_serve(args, models, out):
+    models = ModelCache(freeze=True)
+    for path in args.preload:
+        models.get(path)
+    serve(args.socket, models)
+
+
+# commands a server runs
+SERVER_COMMANDS = dict(simulate=cmd_simulate, explore=cmd_explore, generate=cmd_generate,
+        translate=cmd_translate, analyse=cmd_analyse)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(prog="pymbt", description="Python MBT tool")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+            help="log more (repeat for debug logging)")
+    parser.add_argument("--server", metavar="SOCKET",
+            help="run the command on the server listening on SOCKET")
+    commands = parser.add_subparsers(dest="command")
+
+    p = commands.add_parser("simulate", help="simulate big steps")
+    p.add_argument("model")
+    p.add_argument("steps", nargs="*", metavar="INPUTS",
+            help="comma separated input events of each big step")
+    p.add_argument("--random", type=int, default=0, metavar="N",
+            help="then take N steps with random inputs")
+    p.add_argument("--seed", type=int)
+    p.set_defaults(func=cmd_simulate)
+
+    p = commands.add_parser("explore", help="explore the reachable configurations")
+    p.add_argument("model")
+    p.add_argument("--max-inputs", type=int, default=1)
+    p.add_argument("--max-states", type=int)
+    p.add_argument("--no-reduce", action="store_true",
+            help="disable partial-order reduction")
+    p.set_defaults(func=cmd_explore)
+
+    p = commands.add_parser("generate", help="generate random test sequences")
+    p.add_argument("model")
+    p.add_argument("--count", type=int, default=100)
+    p.add_argument("--length", type=int, default=20)
+    p.add_argument("--seed", type=int)
+    p.add_argument("--minimize", action="store_true",
+            help="keep only sequences adding coverage")
+    p.add_argument("-o", "--output", metavar="DIRECTORY",
+            help="write unittest modules to DIRECTORY")
+    p.add_argument("--adapter", metavar="MODULE.CLASS",
+            help="adapter class the unittest modules drive the SUT with")
+    p.add_argument("--adapter-arg", action="append", default=[], metavar="ARG",
+            help="an argument of the adapter class")
+    p.set_defaults(func=cmd_generate)
+
+    p = commands.add_parser("translate", help="translate to a NuSMV model")
+    p.add_argument("model")
+    p.add_argument("--range", action="append", default=[], metavar="NAME=TYPE",
+            help="NuSMV type of a variable, e.g. m=0..11")
+    p.add_argument("--cache", help="fragment cache file")
+    p.add_argument("-o", "--output", help="SMV file to write")
+    p.set_defaults(func=cmd_translate)
+
+    p = commands.add_parser("analyse", help="check for static problems")
+    p.add_argument("model")
+    p.add_argument("--input", action="append", default=[], metavar="EVENT",
+            help="an input event (default: every non-local event)")
+    p.set_defaults(func=cmd_analyse)
+
+    p = commands.add_parser("serve", help="run commands sent to a socket")
+    p.add_argument("--socket", required=True)
+    p.add_argument("--preload", nargs="*", default=[], metavar="MODEL")
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def run_command(args, models, out):
+    """Runs the command of parsed args, returning its exit status.
+    """
+    try:
+        return args.func(args, models, out) or 0
+    except Exception as e:
+        log.debug("Command failed", exc_info=True)
+        print >> out, "error: %s: %s" % (e.__class__.__name__, e)
+        return 1
+
+
+def create_server(path, models):
+    """Returns a server running commands sent to a Unix socket at path,
+    replacing any existing socket file.
+    """
+    import SocketServer
+
+    class Handler(SocketServer.StreamRequestHandler):
+        def handle(self):
+            out = StringIO()
+            try:
+                args = argparse.Namespace(**json.loads(self.rfile.readline()))
+                if args.command not in SERVER_COMMANDS:
+                    raise CLIError("Server cannot run %s" % args.command)
+                args.func = SERVER_COMMANDS[args.command]
+                status = run_command(args, models, out)
+            except Exception:
+                out.write(traceback.format_exc())
+                status = 1
+            self.wfile.write(json.dumps(dict(status=status, output=out.getvalue())) + "\n")
+
+    class Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(path):
+        os.remove(path)
+    return Server(path, Handler)
+
+
+def serve(path, models):
+    """Runs commands sent to a Unix socket at path until interrupted.
+    """
+    server = create_server(path, models)
+    log.info("Serving on %s", path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def send_command(path, args):
+    """Runs parsed args on the server at path, returning (status, output).
+    """
+    request = dict((name, value) for (name, value) in vars(args).items()
+            if name not in ('func', 'server', 'verbose'))
+    for name in PATH_ARGS:
+        if request.get(name):
+            request[name] = os.path.abspath(request[name])
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps(request) + "\n")
+        reply = json.loads(sock.makefile().readline())
+    finally:
+        sock.close()
+    return (reply['status'], reply['output'])
+
+
+def main(argv=None, out=None):
+    """Runs the pymbt tool, returning the exit status.
+    """
+    args = create_parser().parse_args(argv)
+    out = sys.stdout if out is None else out
+    logging.basicConfig(level=[logging.WARN, logging.INFO, logging.DEBUG][min(args.verbose, 2)],
+            format="%(asctime)s: [%(name)s]: %(levelname)s: %(message)s")
+    if args.server and args.command != "serve":
+        (status, output) = send_command(args.server, args)
+        out.write(output)
+        return status
+    return run_command(args, ModelCache(), out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""Transition conflict and priority tables.
+
+The tables are computed once when a statechart is loaded so that the
+simulator can resolve which enabled transitions fire with a few integer
+operations per transition, and so that potential non-determinism can be
+reported statically rather than discovered during a simulation.
+
+Two transitions conflict when their scopes are the same OR-state or one
+scope is an ancestor of the other, i.e. firing one exits the states the
+other would exit. Between conflicting transitions the one with the outer
+scope has priority. Conflicting transitions with the same scope have
+equal priority and so are potentially non-deterministic when both may
+be enabled together.
+"""
+
+import ast
+
+import logging
+log = logging.getLogger(__name__)
+
+INF = float('inf')
+
+
+def _get_number(node):
+    """Returns the number represented by node or None.
+    """
+    if isinstance(node, ast.Num):
+        return node.n
+    if (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub)
+            and isinstance(node.operand, ast.Num)):
+        return -node.operand.n
+    return None
+
+
+# Bounds on a variable are ((lower, strict), (upper, strict)), e.g.
+# ((0, True), (10, False)) for 0 < m <= 10
+UNBOUNDED = ((-INF, False), (INF, False))
+
+# maps comparison op -> (bounds of "x op c", swapped op for "c op x")
+_CMP_OPS = {
+    ast.Eq: (lambda c: ((c, False), (c, False)), ast.Eq),
+    ast.Lt: (lambda c: ((-INF, False), (c, True)), ast.Gt),
+    ast.LtE: (lambda c: ((-INF, False), (c, False)), ast.GtE),
+    ast.Gt: (lambda c: ((c, True), (INF, False)), ast.Lt),
+    ast.GtE: (lambda c: ((c, False), (INF, False)), ast.LtE),
+}
+
+
+def intersect_bounds(bounds1, bounds2):
+    """Returns the bounds satisfying both bounds.
+    """
+    # of equal bounds the strict one is tighter
+    lower = max(bounds1[0], bounds2[0])
+    upper = min(bounds1[1], bounds2[1], key=lambda bound: (bound[0], not bound[1]))
+    return (lower, upper)
+
+
+def is_empty(bounds):
+    """Returns True if no value is within the bounds.
+    """
+    ((lo, lo_strict), (hi, hi_strict)) = bounds
+    return lo > hi or (lo == hi and (lo_strict or hi_strict))
+
+
+def is_within(bounds, value):
+    ((lo, lo_strict), (hi, hi_strict)) = bounds
+    return (lo < value if lo_strict else lo <= value) and \
+            (value < hi if hi_strict else value <= hi)
+
+
+def _tighten(bounds):
+    """Returns integer bounds made inclusive, e.g. m < 10 as m <= 9.
+    """
+    ((lo, lo_strict), (hi, hi_strict)) = bounds
+    if lo_strict and isinstance(lo, (int, long)):
+        (lo, lo_strict) = (lo + 1, False)
+    if hi_strict and isinstance(hi, (int, long)):
+        (hi, hi_strict) = (hi - 1, False)
+    return ((lo, lo_strict), (hi, hi_strict))
+
+
+def _iter_comparisons(node):
+    """Yields the (name, op, number) comparisons conjoined in node.
+
+    Other conjuncts (e.g. disjunctions) are ignored as they can only
+    narrow the bounds further.
+    """
+    if isinstance(node, ast.Expression):
+        node = node.body
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+        for value in node.values:
+            for cmp in _iter_comparisons(value):
+                yield cmp
+    elif isinstance(node, ast.Compare):
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            if type(op) not in _CMP_OPS:
+                pass  # no constraint, e.g. x != 1
+            elif isinstance(left, ast.Name) and _get_number(right) is not None:
+                yield (left.id, type(op), _get_number(right))
+            elif isinstance(right, ast.Name) and _get_number(left) is not None:
+                yield (right.id, _CMP_OPS[type(op)][1], _get_number(left))
+            left = right
+
+
+def get_guard_bounds(guard_ast, integers=()):
+    """Returns the bounds implied by a guard as a dict of variable ->
+    bounds from the comparisons of variables with numbers conjoined in
+    the guard.
+
+    For example, "m > 0 and m <= 10" gives {'m': ((0, True), (10, False))}.
+    Variables may take any value, so strict bounds stay strict unless the
+    variable is known to be an integer.
+
+    :param integers: names of the variables only ever taking integers,
+                     whose strict integer bounds are made inclusive
+    """
+    bounds = dict()
+    if guard_ast is None:
+        return bounds
+    for (name, op, number) in _iter_comparisons(guard_ast):
+        bounds[name] = intersect_bounds(bounds.get(name, UNBOUNDED), _CMP_OPS[op][0](number))
+    for name in integers:
+        if name in bounds:
+            bounds[name] = _tighten(bounds[name])
+    return bounds
+
+
+def guards_disjoint(guard1_ast, guard2_ast):
+    """Returns True if the two guards provably cannot both be true.
+
+    Guards are disjoint when one is the negation of the other or when
+    the bounds they imply on some variable do not intersect. Returns
+    False when disjointness cannot be shown.
+    """
+    if guard1_ast is None or guard2_ast is None:
+        return False
+    (body1, body2) = (guard1_ast.body, guard2_ast.body)
+    for (g1, g2) in ((body1, body2), (body2, body1)):
+        if (isinstance(g1, ast.UnaryOp) and isinstance(g1.op, ast.Not)
+                and ast.dump(g1.operand) == ast.dump(g2)):
+            return True
+    bounds1 = get_guard_bounds(guard1_ast)
+    bounds2 = get_guard_bounds(guard2_ast)
+    for name in set(bounds1).intersection(bounds2):
+        if is_empty(intersect_bounds(bounds1[name], bounds2[name])):
+            return True
+    for bounds in (bounds1, bounds2):
+        if any(is_empty(b) for b in bounds.values()):
+            return True
+    return False
+
+
+def _depth(state):
+    return sum(1 for st in state.ancestors()) - 1
+
+
+def _may_be_active_together(state1, state2):
+    """Returns True if both states may be active in the same configuration.
+    """
+    if state1.is_descendant(state2) or state2.is_descendant(state1):
+        return True
+    return state1.get_lca(state2).is_and()
+
+
+def _events_overlap(transition1, transition2):
+    return (not transition1.event or not transition2.event
+            or transition1.event == transition2.event)
+
+
+class ConflictTable(object):
+    """Precomputed conflict and priority relations between the transitions
+    of a statechart.
+
+    Transitions are identified by their index (see StateChart.make_index)
+    and relations are stored as integer bit masks over those indexes.
+    """
+
+    def __init__(self, sc):
+        self.transitions = []
+        # rank orders transitions by priority (outer scopes first)
+        self.rank = []
+        # conflicts[i] = mask of transitions conflicting with i
+        # lower[i] = mask of conflicting transitions with lower priority than i
+        self.conflicts = []
+        self.lower = []
+        # [(t1, t2)] pairs of transitions that may be non-deterministic
+        self.nondeterministic = []
+        self.add(sc.all_transitions)
+
+    def add(self, transitions):
+        """Adds transitions indexed after those already in the table, e.g.
+        when a lazily loaded state is activated, comparing each only with
+        the transitions before it.
+        """
+        for transition in transitions:
+            j = transition.index
+            self.transitions.append(transition)
+            self.rank.append((_depth(transition.scope), j))
+            self.conflicts.append(0)
+            self.lower.append(0)
+            for i in range(j):
+                self._relate(i, j)
+
+    def update(self, transition):
+        """Recomputes the relations of a transition whose scope changed,
+        e.g. by a mutation (see pymbt.mutation), comparing only it with
+        the other transitions.
+        """
+        i = transition.index
+        bit = 1 << i
+        row = self.conflicts[i]
+        while row:
+            low = row & -row
+            j = low.bit_length() - 1
+            row ^= low
+            self.conflicts[j] &= ~bit
+            self.lower[j] &= ~bit
+        self.conflicts[i] = self.lower[i] = 0
+        self.nondeterministic = [pair for pair in self.nondeterministic
+                if transition not in pair]
+        self.rank[i] = (_depth(transition.scope), i)
+        for j in range(len(self.transitions)):
+            if j != i:
+                self._relate(min(i, j), max(i, j))
+
+    def save(self):
+        """Returns the state of the table for restore(), e.g. to undo an
+        update().
+        """
+        return (list(self.rank), list(self.conflicts), list(self.lower),
+                list(self.nondeterministic))
+
+    def restore(self, saved):
+        (self.rank, self.conflicts, self.lower, self.nondeterministic) = map(list, saved)
+
+    def _relate(self, i, j):
+        """Records the relations between transitions i < j.
+        """
+        (t1, t2) = (self.transitions[i], self.transitions[j])
+        if t1.scope is t2.scope:
+            self._add_conflict(i, j)
+            if (_events_overlap(t1, t2)
+                    and _may_be_active_together(t1.source, t2.source)
+                    and not guards_disjoint(t1.guard_ast, t2.guard_ast)):
+                self.nondeterministic.append((t1, t2))
+        elif t1.scope.is_ancestor(t2.scope, strict=True):
+            self._add_conflict(i, j)
+            self.lower[i] |= 1 << j
+        elif t2.scope.is_ancestor(t1.scope, strict=True):
+            self._add_conflict(i, j)
+            self.lower[j] |= 1 << i
+
+    def _add_conflict(self, i, j):
+        self.conflicts[i] |= 1 << j
+        self.conflicts[j] |= 1 << i
+
+    def is_conflict(self, transition1, transition2):
+        """Do the two transitions conflict?
+        """
+        return bool(self.conflicts[transition1.index] >> transition2.index & 1)
+
+    def has_priority(self, transition1, transition2):
+        """Does transition1 take priority over (conflicting) transition2?
+        """
+        return bool(self.lower[transition1.index] >> transition2.index & 1)
+
+    def resolve(self, transitions):
+        """Resolves priorities between the given enabled transitions,
+        returning a dict of scope -> [transition] of the transitions that
+        are not overridden by higher priority transitions.
+
+        More than one transition for a scope means non-determinism.
+        """
+        rank = self.rank
+        scopes = dict()
+        blocked = 0
+        for transition in sorted(transitions, key=lambda t: rank[t.index]):
+            i = transition.index
+            if blocked >> i & 1:
+                continue
+            scopes.setdefault(transition.scope, []).append(transition)
+            blocked |= self.lower[i]
+        return scopes
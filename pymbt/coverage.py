@@ -0,0 +1,169 @@
+"""Statechart coverage.
+
+Coverage counts how often each state is active, each transition fires,
+each guard evaluates true/false and each pair of consecutive input
+events occurs. Counters are kept in preallocated arrays indexed by the
+state/transition indexes of the statechart (see StateChart.make_index)
+so recording a step costs a few array increments, and counters from
+several simulators (e.g. worker processes) merge by adding arrays.
+
+  >>> coverage = sim.enable_coverage()
+  >>> ... run simulation ...
+  >>> print coverage.report(sc)
+"""
+
+import operator
+from array import array
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class CoverageError(Exception):
+    pass
+
+
+def _zeros(n):
+    return array('L', [0]) * n
+
+
+def _add(counters, other):
+    return array('L', map(operator.add, counters, other))
+
+
+class Coverage(object):
+    """Coverage counters for a statechart.
+    """
+
+    def __init__(self, sc):
+        sc.load_all()
+        self.nstates = len(sc.all_states)
+        self.ntransitions = len(sc.all_transitions)
+        # input events, plus a final pseudo event for the start of a run
+        self.events = sorted(set(t.event for t in sc.all_transitions
+                if t.event and t.timeout is None and not (sc.locals and t.event in sc.locals)))
+        self.event_ids = dict((event, id) for (id, event) in enumerate(self.events))
+        self.nevents = len(self.events) + 1
+        self.nguards = sum(1 for t in sc.all_transitions if t.guard is not None)
+        self.states = _zeros(self.nstates)
+        self.transitions = _zeros(self.ntransitions)
+        # guards[2 * index] counts false, guards[2 * index + 1] counts true
+        self.guards = _zeros(2 * self.ntransitions)
+        # event_pairs[previous * nevents + event]
+        self.event_pairs = _zeros(self.nevents * self.nevents)
+        self.last_events = [len(self.events)]
+
+    def record_states(self, states):
+        """Records the given active states.
+        """
+        counters = self.states
+        for state in states:
+            counters[state.index] += 1
+
+    def record_inputs(self, inputs):
+        """Records the input events of a big step.
+        """
+        ids = [self.event_ids[event] for event in inputs if event in self.event_ids]
+        if not ids:
+            return
+        (counters, n) = (self.event_pairs, self.nevents)
+        for previous in self.last_events:
+            for id in ids:
+                counters[previous * n + id] += 1
+        self.last_events = ids
+
+    def record_step(self, triggered, enabled, fired, states):
+        """Records a small step.
+
+        :param triggered: transitions whose event was present
+        :param enabled: triggered transitions whose guard was true
+        :param fired: transitions fired by the step
+        :param states: active states after the step
+        """
+        guards = self.guards
+        enabled = set(enabled)
+        for transition in triggered:
+            if transition.guard is not None:
+                guards[2 * transition.index + (transition in enabled)] += 1
+        counters = self.transitions
+        for transition in fired:
+            counters[transition.index] += 1
+        self.record_states(states)
+
+    def reset_run(self):
+        """Marks the start of a new run for event pair coverage.
+        """
+        self.last_events = [len(self.events)]
+
+    def merge(self, other):
+        """Adds the counters of another Coverage of the same statechart.
+        """
+        if (self.nstates, self.ntransitions, self.events) != (
+                other.nstates, other.ntransitions, other.events):
+            raise CoverageError("Cannot merge coverage of different statecharts")
+        self.states = _add(self.states, other.states)
+        self.transitions = _add(self.transitions, other.transitions)
+        self.guards = _add(self.guards, other.guards)
+        self.event_pairs = _add(self.event_pairs, other.event_pairs)
+        return self
+
+    __iadd__ = merge
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['last_events'] = [len(self.events)]
+        return state
+
+    def get_summary(self):
+        """Returns dict of coverage kind -> (covered, total).
+        """
+        def covered(counters):
+            return sum(1 for count in counters if count)
+        return {
+            # the root (index 0) is always active so is not counted
+            'states': (covered(self.states[1:]), self.nstates - 1),
+            'transitions': (covered(self.transitions), self.ntransitions),
+            'guard outcomes': (covered(self.guards), 2 * self.nguards),
+            'event pairs': (covered(self.event_pairs), self.nevents * len(self.events)),
+        }
+
+    def get_items(self):
+        """Returns the set of covered items: ('state', index),
+        ('transition', index) and ('guard', index, outcome).
+        """
+        items = set()
+        for (index, count) in enumerate(self.states):
+            if count and index:  # root is always active
+                items.add(('state', index))
+        for (index, count) in enumerate(self.transitions):
+            if count:
+                items.add(('transition', index))
+        for (index, count) in enumerate(self.guards):
+            if count:
+                items.add(('guard', index // 2, bool(index % 2)))
+        return frozenset(items)
+
+    def report(self, sc):
+        """Returns a coverage report for the statechart, broken down by
+        each (sub-)statechart.
+        """
+        if len(sc.all_states) != self.nstates:
+            raise CoverageError("Coverage is not for %r" % sc)
+        lines = []
+        for (kind, (covered, total)) in sorted(self.get_summary().items()):
+            lines.append("%s: %d/%d" % (kind, covered, total))
+        for chart in sc.all_states:
+            if not chart.is_or():
+                continue
+            lines.append("%r:" % chart)
+            for state in chart.states:
+                lines.append("  %-40r %d" % (state, self.states[state.index]))
+                for transition in state.transitions:
+                    line = "    %-38s %d" % (transition.get_label(),
+                            self.transitions[transition.index])
+                    if transition.guard is not None:
+                        line += " (guard false=%d true=%d)" % (
+                                self.guards[2 * transition.index],
+                                self.guards[2 * transition.index + 1])
+                    lines.append(line)
+        return "\n".join(lines)
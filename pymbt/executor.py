@@ -0,0 +1,446 @@
+"""Execution of test sequences against a system under test (SUT).
+
+The SUT is driven through an adapter, a user supplied class with methods
+to reset the SUT to its initial state, send it the input events of a big
+step and read the output events it produced:
+
+  class CoffeeMachineAdapter(Adapter):
+      def __init__(self, address):
+          self.conn = connect(address)
+      def reset(self):
+          self.conn.call("reset")
+      def send(self, inputs):
+          for event in inputs:
+              self.conn.call(event)
+      def read_outputs(self):
+          return set(self.conn.call("outputs"))
+
+The executor runs sequences on a pool of worker processes (or threads),
+each with its own adapter and so its own SUT instance, and checks the
+outputs observed after each step against those the simulator predicts:
+
+  >>> executor = Executor("models/cvm.graphml", CoffeeMachineAdapter,
+  ...                     adapter_args=("localhost:8000",), workers=8)
+  >>> report = executor.run(sequences)
+  >>> print report
+  ran 100/100 sequences (2000 steps) in 3.2s: 625.0 steps/s, ...
+
+By default the run stops at the first divergence. FakeAdapter simulates
+the model itself, optionally with faults, for testing.
+"""
+
+import multiprocessing
+import multiprocessing.pool
+import multiprocessing.util
+import threading
+import time
+from array import array
+
+from simulator import Simulator
+from statechart import read_statechart
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class ModelError(Exception):
+    """The simulator failed to predict a step, e.g. by non-determinism,
+    as opposed to the adapter or SUT failing.
+    """
+    pass
+
+
+class Adapter(object):
+    """Base class of SUT adapters.
+    """
+
+    def reset(self):
+        """Resets the SUT to its initial state.
+        """
+        raise NotImplementedError
+
+    def send(self, inputs):
+        """Sends the input events of a big step to the SUT.
+        """
+        raise NotImplementedError
+
+    def read_outputs(self):
+        """Returns the set of output events the SUT produced for the last
+        inputs sent.
+        """
+        raise NotImplementedError
+
+    def checkpoint(self):
+        """Returns a token to restore() the SUT to its current state, or
+        None if the SUT has no checkpoints (the default).
+        """
+        return None
+
+    def restore(self, token):
+        """Restores the SUT to the state of a checkpoint().
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the SUT when the worker exits.
+        """
+        pass
+
+
+class FakeAdapter(Adapter):
+    """Adapter for a fake SUT simulating a statechart.
+
+    :param model: statechart or path of the model to simulate
+    :param delay: seconds each step takes
+    :param faults: dict of (configuration, inputs) -> outputs to produce
+                   instead of the model's outputs, where inputs is a
+                   frozenset and configuration as given by
+                   Simulator.get_configuration()
+    :param checkpoints: if True support checkpoint() and restore()
+    """
+
+    def __init__(self, model, delay=0.0, faults=None, checkpoints=False):
+        sc = read_statechart(model) if isinstance(model, basestring) else model
+        self.sim = Simulator(sc)
+        self.initial = self.sim.get_configuration()
+        self.delay = delay
+        self.faults = faults or dict()
+        self.checkpoints = checkpoints
+        self.outputs = set()
+        self.resets = 0
+
+    def reset(self):
+        self.sim.set_configuration(self.initial)
+        self.outputs = set()
+        self.resets += 1
+
+    def checkpoint(self):
+        if not self.checkpoints:
+            return None
+        return (self.sim.get_configuration(), frozenset(self.outputs))
+
+    def restore(self, token):
+        (configuration, outputs) = token
+        self.sim.set_configuration(configuration)
+        self.outputs = set(outputs)
+
+    def send(self, inputs):
+        sim = self.sim
+        fault = self.faults.get((sim.get_configuration(), frozenset(inputs)))
+        sim.enabled_inputs.update(inputs)
+        sim.next()
+        self.outputs = set(sim.outputs if fault is None else fault)
+        if self.delay:
+            time.sleep(self.delay)
+
+    def read_outputs(self):
+        return self.outputs
+
+
+class SequenceResult(object):
+    """The result of executing a test sequence.
+
+    :param number: number of the sequence in the run
+    :param steps: number of steps executed
+    :param latencies: array of seconds taken by each step
+    :param divergence: None if passed, else (step, inputs, expected
+                       outputs, observed outputs) of the failing step
+    :param error: if the adapter or the model raised an exception, its
+                  description, starting "adapter" or "model"
+    """
+
+    def __init__(self, number, steps, latencies, divergence=None, error=None):
+        self.number = number
+        self.steps = steps
+        self.latencies = latencies
+        self.divergence = divergence
+        self.error = error
+
+    @property
+    def passed(self):
+        return self.divergence is None and self.error is None
+
+    def __repr__(self):
+        if self.error:
+            status = "error %s" % self.error
+        elif self.divergence:
+            status = "step %d inputs %r: expected %r, observed %r" % self.divergence
+        else:
+            status = "passed"
+        return "<%s %d %s>" % (self.__class__.__name__, self.number, status)
+
+
+def simulate_step(sim, inputs):
+    """Performs the big step of the model for inputs, raising ModelError
+    if the simulator fails.
+    """
+    sim.enabled_inputs.update(inputs)
+    try:
+        sim.next()
+    except Exception as e:
+        raise ModelError("%s: %s" % (e.__class__.__name__, e))
+
+
+def describe_error(e):
+    """Returns the description of an exception raised executing a step.
+    """
+    if isinstance(e, ModelError):
+        return "model %s" % e
+    return "adapter %s: %s" % (e.__class__.__name__, e)
+
+
+def execute_sequence(sim, initial, adapter, number, steps):
+    """Executes the inputs of steps on the adapter from its reset state,
+    checking the outputs after each step against the simulator, returning
+    a SequenceResult.
+
+    :param sim: simulator of the model
+    :param initial: initial configuration of the simulator
+    """
+    sim.set_configuration(initial)
+    latencies = array('d')
+    timer = time.time
+    try:
+        adapter.reset()
+        for (index, step) in enumerate(steps):
+            inputs = step[0]
+            simulate_step(sim, inputs)
+            start = timer()
+            adapter.send(inputs)
+            observed = set(adapter.read_outputs())
+            latencies.append(timer() - start)
+            if observed != sim.outputs:
+                return SequenceResult(number, index + 1, latencies, divergence=(
+                        index, tuple(inputs), sorted(sim.outputs), sorted(observed)))
+    except ModelError as e:
+        log.error("Model failed executing sequence %d: %s", number, e)
+        return SequenceResult(number, len(latencies), latencies, error=describe_error(e))
+    except Exception as e:
+        log.exception("Adapter failed executing sequence %d", number)
+        return SequenceResult(number, len(latencies), latencies, error=describe_error(e))
+    return SequenceResult(number, len(latencies), latencies)
+
+
+# state of each worker, set up by _init_worker
+_worker = threading.local()
+
+
+def _init_worker(model, adapter_class, adapter_args, adapters=None, stop=None):
+    """Sets up the simulator and adapter of a worker.
+
+    :param adapters: list to add the adapter to, for the caller to close,
+                     or None in a worker process, which closes it on exit
+    :param stop: event set to skip the remaining batches
+    """
+    _worker.stop = stop
+    sc = read_statechart(model) if isinstance(model, basestring) else model
+    _worker.sim = Simulator(sc)
+    _worker.initial = _worker.sim.get_configuration()
+    adapter = _worker.adapter = adapter_class(*adapter_args)
+    if adapters is not None:
+        adapters.append(adapter)
+    else:
+        multiprocessing.util.Finalize(None, adapter.close, exitpriority=10)
+
+
+def _run_worker(item):
+    (number, steps) = item
+    return execute_sequence(_worker.sim, _worker.initial, _worker.adapter, number, steps)
+
+
+def _is_stopped():
+    return _worker.stop is not None and _worker.stop.is_set()
+
+
+def _run_single(item):
+    if _is_stopped():
+        return ([], 0)
+    return ([_run_worker(item)], 1)
+
+
+def _run_group(items):
+    if _is_stopped():
+        return ([], 0)
+    from schedule import PrefixTrie, TrieExecution
+    trie = PrefixTrie(items, numbered=True)
+    execution = TrieExecution(_worker.sim, _worker.initial, _worker.adapter)
+    return (execution.run(trie.root), execution.resets)
+
+
+def _get_steps(sequence):
+    return getattr(sequence, 'steps', sequence)
+
+
+def _group_by_first_step(items):
+    """Returns lists of the (number, steps) items grouped by their first
+    inputs, so sequences sharing a prefix are executed together.
+    """
+    groups = dict()
+    for (number, steps) in items:
+        key = tuple(sorted(set(steps[0][0]))) if steps else ()
+        groups.setdefault(key, []).append((number, steps))
+    return sorted(groups.values(), key=lambda group: group[0][0])
+
+
+class ExecutionReport(object):
+    """Summary of an execution run.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.results = []
+        self.failures = []
+        self.latencies = array('d')
+        self.elapsed = 0.0
+        # number of SUT resets
+        self.resets = 0
+
+    def add(self, result):
+        self.results.append(result)
+        self.latencies.extend(result.latencies)
+        if not result.passed:
+            self.failures.append(result)
+
+    def add_batch(self, results, resets):
+        for result in results:
+            self.add(result)
+        self.resets += resets
+
+    @property
+    def passed(self):
+        return not self.failures and len(self.results) == self.total
+
+    @property
+    def steps(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        """Steps executed per second.
+        """
+        return self.steps / self.elapsed if self.elapsed else 0.0
+
+    def get_latency(self, percentile):
+        """Returns the given percentile of the step latencies.
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100.0))]
+
+    def get_stats(self):
+        return dict(
+                sequences=len(self.results),
+                failures=len(self.failures),
+                steps=self.steps,
+                resets=self.resets,
+                elapsed=self.elapsed,
+                throughput=self.throughput,
+                mean_latency=sum(self.latencies) / max(1, self.steps),
+                median_latency=self.get_latency(50),
+                p99_latency=self.get_latency(99),
+                max_latency=max(self.latencies or [0.0]))
+
+    def __str__(self):
+        stats = self.get_stats()
+        lines = ["ran %d/%d sequences (%d steps) in %.1fs: %.1f steps/s, latency "
+                "mean %.6fs median %.6fs p99 %.6fs max %.6fs" % (
+                    stats['sequences'], self.total, stats['steps'], stats['elapsed'],
+                    stats['throughput'], stats['mean_latency'], stats['median_latency'],
+                    stats['p99_latency'], stats['max_latency'])]
+        for result in self.failures:
+            lines.append("FAILED %r" % result)
+        return "\n".join(lines)
+
+
+class Executor(object):
+    """Executes test sequences against SUTs on a pool of workers.
+
+    :param model: path of the model (or the statechart, for threads or
+                  forked processes)
+    :param adapter_class: Adapter subclass, instantiated once per worker
+    :param adapter_args: arguments of adapter_class
+    :param workers: number of workers (0 runs sequences in this thread)
+    :param use_threads: if True use threads rather than processes
+    :param fail_fast: if True stop at the first failing sequence
+    :param schedule: if True execute sequences sharing prefixes together,
+                     each prefix once (see pymbt.schedule)
+    """
+
+    def __init__(self, model, adapter_class, adapter_args=(), workers=None,
+            use_threads=False, fail_fast=True, schedule=False):
+        self.model = model
+        self.adapter_class = adapter_class
+        self.adapter_args = tuple(adapter_args)
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        self.use_threads = use_threads
+        self.fail_fast = fail_fast
+        self.schedule = schedule
+
+    def _create_pool(self, adapters, stop):
+        if self.use_threads:
+            return multiprocessing.pool.ThreadPool(self.workers, _init_worker,
+                    (self.model, self.adapter_class, self.adapter_args, adapters, stop))
+        return multiprocessing.Pool(self.workers, _init_worker,
+                (self.model, self.adapter_class, self.adapter_args, None, stop))
+
+    def _close_adapters(self, adapters):
+        for adapter in adapters:
+            try:
+                adapter.close()
+            except Exception:
+                log.exception("Failed to close adapter %r", adapter)
+
+    def run(self, sequences):
+        """Executes TestSequences (or lists of (inputs, outputs) steps),
+        returning an ExecutionReport.
+
+        Only the inputs of each step are used: the expected outputs are
+        those predicted by the model.
+
+        When scheduling, sequences with the same first step are executed
+        by the same worker, so fail_fast stops after their group.
+        """
+        items = [(number, _get_steps(seq)) for (number, seq) in enumerate(sequences)]
+        report = ExecutionReport(len(items))
+        (run, batches) = (_run_single, items)
+        if self.schedule:
+            (run, batches) = (_run_group, _group_by_first_step(items))
+        start = time.time()
+        # adapters created in this process, closed when the run ends
+        adapters = []
+        if not self.workers:
+            try:
+                _init_worker(self.model, self.adapter_class, self.adapter_args, adapters)
+                for batch in batches:
+                    report.add_batch(*run(batch))
+                    if self.fail_fast and report.failures:
+                        break
+            finally:
+                self._close_adapters(adapters)
+        else:
+            # at the first failure the workers skip the remaining batches,
+            # the pool then closing normally, so worker processes close
+            # their adapters on exit
+            stop = threading.Event() if self.use_threads else multiprocessing.Event()
+            pool = self._create_pool(adapters, stop)
+            interrupted = True
+            try:
+                for (results, resets) in pool.imap_unordered(run, batches):
+                    report.add_batch(results, resets)
+                    if self.fail_fast and report.failures:
+                        log.warn("Stopping at failure %r", report.failures[0])
+                        stop.set()
+                        break
+                interrupted = False
+            finally:
+                if interrupted:
+                    pool.terminate()
+                else:
+                    pool.close()
+                pool.join()
+                self._close_adapters(adapters)
+        report.elapsed = time.time() - start
+        report.results.sort(key=lambda result: result.number)
+        log.info("Execution stats: %r", report.get_stats())
+        return report
@@ -0,0 +1,345 @@
+"""State-space exploration of statecharts.
+
+The explorer searches the configurations (active states and variable
+values) reachable from the initial configuration breadth-first, where
+each step of the search is a big step of the simulator for a set of
+input events, recording the result as a networkx MultiDiGraph.
+
+Partial-order reduction
+-----------------------
+
+Orthogonal regions multiply the number of configurations and of ways to
+reach them. Two input events are independent when every transition they
+may trigger (including those triggered by the local events they produce)
+is in a different region to, and shares no variables or local events
+with, every transition the other may trigger. Then:
+
+ * applying independent inputs together reaches the same configuration
+   as applying them one after the other, so only input sets whose events
+   are connected by dependencies are explored
+ * applying independent inputs in either order reaches the same
+   configuration, so sleep sets are used to explore only one order
+
+The reduction still visits every reachable configuration but omits
+redundant edges from the graph.
+
+Visited configurations are kept in a store from pymbt.visited, which
+may keep only hashes of configurations to bound memory use (the graph
+should then not be recorded either), and the frontier may spill to disk
+(see pymbt.frontier). When the visited store detects duplicates in
+delayed batches sleep sets are not used, as they need to know about
+revisits immediately, but input sets are still reduced.
+
+Timeout transitions (see pymbt.simulator) are not explored: virtual
+time is not part of a configuration, and the steps of the graph are
+sets of input events, so the configurations reached only by a timer
+expiring are missing. A warning gives the number of configurations
+with armed timers.
+
+For large state spaces the graph may be recorded in compact arrays by a
+pymbt.stategraph.GraphBuilder instead of networkx.
+
+  >>> explorer = Explorer(sc, max_inputs=2)
+  >>> graph = explorer.explore()
+  >>> explorer.stats
+  {'states': 48, 'edges': 130, ...}
+"""
+
+import itertools
+from collections import deque
+
+import networkx as nx
+
+from simulator import Simulator, NonDeterminismError
+from visited import ExactStore
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Independence(object):
+    """Static independence relation between input events.
+    """
+
+    def __init__(self, sc):
+        sc.load_all()
+        self.sc = sc
+        self.locals = sc.locals or set()
+        transitions = sc.all_transitions
+        by_event = dict()
+        for transition in transitions:
+            # timeouts are not explored, only input events
+            if transition.timeout is None:
+                by_event.setdefault(transition.event, []).append(transition)
+        # transitions without events may fire in any step
+        untriggered = by_event.pop(None, [])
+        self.closures = dict()
+        for event in by_event:
+            if event not in self.locals:
+                self.closures[event] = self._get_closure(event, by_event, untriggered)
+        self.reads = dict((t, t.get_read_variables()) for t in transitions)
+        self.writes = dict((t, t.get_written_variables()) for t in transitions)
+        self.dependent = dict()
+        for (a, b) in itertools.combinations(sorted(self.closures), 2):
+            if not self._is_independent(a, b):
+                self.dependent.setdefault(a, set()).add(b)
+                self.dependent.setdefault(b, set()).add(a)
+
+    def _get_closure(self, event, by_event, untriggered):
+        """Returns the transitions event may trigger, directly or via
+        local events.
+        """
+        closure = set(untriggered)
+        todo = [event]
+        seen = set(todo)
+        while todo:
+            for transition in by_event.get(todo.pop(), []):
+                closure.add(transition)
+                for output in transition.outputs:
+                    if output in self.locals and output not in seen:
+                        seen.add(output)
+                        todo.append(output)
+        return closure
+
+    def _are_independent(self, t1, t2):
+        if t1 is t2 or self.sc.conflicts.is_conflict(t1, t2):
+            return False
+        if self.writes[t1].intersection(self.reads[t2] | self.writes[t2]):
+            return False
+        if self.writes[t2].intersection(self.reads[t1]):
+            return False
+        locals1 = self.locals.intersection(t1.outputs)
+        locals2 = self.locals.intersection(t2.outputs)
+        return not (locals1.intersection(locals2) or
+                t1.event in locals2 or t2.event in locals1)
+
+    def _is_independent(self, a, b):
+        for t1 in self.closures[a]:
+            for t2 in self.closures[b]:
+                if not self._are_independent(t1, t2):
+                    return False
+        return True
+
+    def is_independent(self, a, b):
+        """Are input events a and b independent?
+        """
+        return a != b and b not in self.dependent.get(a, ())
+
+    def are_independent(self, inputs1, inputs2):
+        """Are all events of input sets inputs1 and inputs2 independent?
+        """
+        for a in inputs1:
+            for b in inputs2:
+                if not self.is_independent(a, b):
+                    return False
+        return True
+
+    def is_connected(self, inputs):
+        """Are the events of the input set connected by dependencies?
+        """
+        inputs = set(inputs)
+        todo = [inputs.pop()]
+        while todo and inputs:
+            dependent = self.dependent.get(todo.pop(), set()).intersection(inputs)
+            inputs.difference_update(dependent)
+            todo.extend(dependent)
+        return not inputs
+
+
+class Explorer(object):
+    """Breadth-first explorer of statechart configurations.
+
+    :param max_inputs: maximum number of inputs per big step
+    :param reduce: if True use partial-order reduction
+    :param record_graph: if True record the explored graph
+    :param graph: graph to record to (default: a networkx MultiDiGraph),
+                  e.g. a pymbt.stategraph.GraphBuilder
+    :param visited: visited store from pymbt.visited (default: ExactStore)
+    :param frontier: FIFO queue, e.g. pymbt.frontier.DiskFrontier
+                     (default: a deque)
+    """
+
+    def __init__(self, sc, max_inputs=1, reduce=True, record_graph=True, visited=None,
+            frontier=None, graph=None):
+        self.sc = sc
+        self.sim = Simulator(sc)
+        self.max_inputs = max_inputs
+        self.independence = Independence(sc) if reduce else None
+        self.initial = self.sim.get_configuration()
+        # keys of visited configurations
+        self.visited = ExactStore() if visited is None else visited
+        self.delayed = getattr(self.visited, 'delayed', False)
+        self.use_sleep_sets = reduce and not self.delayed
+        # (configuration, input sets to explore or None for all, sleep set)
+        self.frontier = deque() if frontier is None else frontier
+        # key -> sleep set of configurations waiting in the frontier
+        self.pending_sleep = dict()
+        # key -> input sets slept when configuration was explored
+        self.slept = dict()
+        if record_graph and graph is None:
+            graph = nx.MultiDiGraph()
+        self.graph = graph if record_graph else None
+        if reduce and self.graph is not None and hasattr(self.graph, 'graph'):
+            # tag networkx graphs missing the edges omitted by the reduction
+            self.graph.graph['reduced'] = True
+        # configuration -> graph node, unless the graph numbers its nodes
+        # by key (see pymbt.stategraph.GraphBuilder.get_node)
+        self.nodes = dict()
+        self.stats = dict(states=0, edges=0, slept=0, reduced_inputs=0, revisits=0,
+                nondeterministic=0, timeouts=0)
+
+    def get_key(self, configuration):
+        """Returns the key identifying a configuration in the visited store.
+        """
+        return self.visited.get_key(configuration)
+
+    def get_input_sets(self, configuration):
+        """Returns the input sets to explore from a configuration.
+        """
+        self.sim.set_configuration(configuration)
+        if self.sim.armed:
+            self.stats['timeouts'] += 1
+        events = sorted(set(self.sim.inputs.iterevents()))
+        input_sets = []
+        for size in range(1, min(self.max_inputs, len(events)) + 1):
+            for inputs in itertools.combinations(events, size):
+                if self.independence and size > 1 and \
+                        not self.independence.is_connected(inputs):
+                    self.stats['reduced_inputs'] += 1
+                    continue
+                input_sets.append(frozenset(inputs))
+        return input_sets
+
+    def get_successor(self, configuration, inputs):
+        """Returns (configuration, outputs, transitions) after a big step
+        from the given configuration with the given inputs.
+        """
+        sim = self.sim
+        sim.set_configuration(configuration)
+        sim.enabled_inputs.update(inputs)
+        sim.next()
+        return (sim.get_configuration(), frozenset(sim.outputs),
+                tuple(t.index for t in sim.fired))
+
+    def _get_node(self, configuration):
+        if hasattr(self.graph, 'get_node'):
+            return self.graph.get_node(self.get_key(configuration), configuration)
+        node = self.nodes.get(configuration)
+        if node is None:
+            node = self.nodes[configuration] = len(self.nodes)
+            self.graph.add_node(node, configuration=configuration)
+        return node
+
+    def _visit(self, configuration, sleep):
+        key = self.get_key(configuration)
+        if self.delayed:
+            self.visited.add_candidate(key, configuration)
+        elif key not in self.visited:
+            self.visited.add(key)
+            self.stats['states'] += 1
+            if sleep:
+                self.pending_sleep[key] = sleep
+            self.frontier.append((configuration, None, sleep))
+        elif key in self.pending_sleep:
+            self.pending_sleep[key] &= sleep
+        elif key in self.slept:
+            # re-explore inputs slept before that are not slept now
+            redo = self.slept[key] - sleep
+            if redo:
+                self.stats['revisits'] += 1
+                self.slept[key] -= redo
+                self.frontier.append((configuration, redo, sleep))
+
+    def _expand(self, configuration, only, sleep):
+        key = self.get_key(configuration)
+        if only is None:
+            sleep = self.pending_sleep.pop(key, sleep)
+        input_sets = self.get_input_sets(configuration)
+        if only is not None:
+            todo = [inputs for inputs in input_sets if inputs in only]
+        else:
+            todo = [inputs for inputs in input_sets if inputs not in sleep]
+            slept = sleep.intersection(input_sets)
+            if slept:
+                self.stats['slept'] += len(slept)
+                self.slept[key] = slept
+        done = []
+        for inputs in todo:
+            try:
+                (successor, outputs, transitions) = self.get_successor(configuration, inputs)
+            except NonDeterminismError as e:
+                log.warn("Skipping inputs %r from %r: %s", sorted(inputs), configuration, e)
+                self.stats['nondeterministic'] += 1
+                continue
+            self.stats['edges'] += 1
+            if self.graph is not None:
+                self.graph.add_edge(self._get_node(configuration), self._get_node(successor),
+                        inputs=tuple(sorted(inputs)), outputs=outputs, transitions=transitions)
+            next_sleep = frozenset()
+            if self.use_sleep_sets:
+                next_sleep = frozenset(other for other in itertools.chain(sleep, done)
+                        if self.independence.are_independent(inputs, other))
+            done.append(inputs)
+            self._visit(successor, next_sleep)
+
+    def get_checkpoint(self, directory):
+        """Returns the explorer state as a picklable dict, saving the files
+        of disk based stores to directory (see pymbt.checkpoint).
+        """
+        for store in (self.visited, self.frontier):
+            if hasattr(store, 'save_files'):
+                store.save_files(directory)
+        return dict(
+                fingerprint=self.sc.get_fingerprint(),
+                initial=self.initial,
+                visited=self.visited,
+                frontier=self.frontier,
+                pending_sleep=self.pending_sleep,
+                slept=self.slept,
+                graph=self.graph,
+                nodes=self.nodes,
+                stats=self.stats)
+
+    def set_checkpoint(self, state, directory):
+        """Restores the explorer state from get_checkpoint().
+        """
+        for name in ('initial', 'visited', 'frontier', 'pending_sleep', 'slept',
+                'graph', 'nodes', 'stats'):
+            setattr(self, name, state[name])
+        for store in (self.visited, self.frontier):
+            if hasattr(store, 'load_files'):
+                store.load_files(directory)
+        self.delayed = getattr(self.visited, 'delayed', False)
+        self.use_sleep_sets = self.use_sleep_sets and not self.delayed
+
+    def explore(self, max_states=None, checkpointer=None):
+        """Explores the reachable configurations, returning the graph.
+
+        :param max_states: stop after visiting this many configurations
+        :param checkpointer: pymbt.checkpoint.Checkpointer to periodically
+                             save the exploration to
+        """
+        if not self.stats['states']:
+            if self.graph is not None:
+                self._get_node(self.initial)
+            self._visit(self.initial, frozenset())
+        while True:
+            if self.delayed and (not self.frontier or self.visited.is_full()):
+                for configuration in self.visited.flush():
+                    self.stats['states'] += 1
+                    self.frontier.append((configuration, None, frozenset()))
+            if not self.frontier:
+                break
+            if checkpointer is not None:
+                checkpointer.maybe_save(self)
+            if max_states is not None and self.stats['states'] >= max_states:
+                log.warn("Stopping exploration after %d states", self.stats['states'])
+                break
+            (configuration, only, sleep) = self.frontier.popleft()
+            self._expand(configuration, only, sleep)
+        if self.stats['timeouts']:
+            log.warn("Timeouts not explored from %d configurations with armed timers",
+                    self.stats['timeouts'])
+        self.stats['omission_probability'] = self.visited.omission_probability()
+        log.info("Exploration stats: %r", self.stats)
+        return self.graph
@@ -0,0 +1,138 @@
+"""Flattened transition tables of statecharts without variables.
+
+Without variables the configurations of a statechart are just its
+active states, and there are usually few enough reachable ones that the
+whole chart can be flattened into a product automaton: configurations
+are numbered and each big step for an input event is an entry of a dense
+table indexed by configuration * events + event giving the next
+configuration and the outputs, stored in arrays.
+
+The simulator uses the table automatically when its chart can be
+flattened (see get_flat_table), stepping with a single input by a table
+lookup rather than resolving and executing transitions. Tables are built
+by simulating each big step once, so the semantics are the simulator's.
+"""
+
+from array import array
+from collections import deque
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class FlattenError(Exception):
+    pass
+
+
+class FlatTable(object):
+    """Transition table of the reachable configurations of a statechart.
+
+    :param max_configurations: give up (raising FlattenError) if more
+                               configurations are reachable
+    """
+
+    def __init__(self, sc, max_configurations=1 << 12):
+        from simulator import Simulator, NonDeterminismError, LivelockError
+        sim = Simulator(sc, flatten=False)
+        self.events = sorted(set(t.event for t in sc.all_transitions
+                if t.event and not (sc.locals and t.event in sc.locals)))
+        self.event_ids = dict((event, id) for (id, event) in enumerate(self.events))
+        nevents = len(self.events)
+        # id -> configuration, and active states dict of StateConfiguration
+        self.configurations = []
+        self.active_states = []
+        self.ids = dict()
+        # results[id] = (outputs, locals, fired transitions)
+        self.results = []
+        result_ids = dict()
+        # [configuration * nevents + event] -> next configuration/result id,
+        # -1 where the step is not deterministic
+        self.next_ids = array('l')
+        self.result_ids = array('l')
+        todo = deque([self._add(sim, sim.get_configuration(), max_configurations)])
+        while todo:
+            id = todo.popleft()
+            for event in self.events:
+                sim.set_configuration(self.configurations[id])
+                sim.enabled_inputs.add(event)
+                try:
+                    sim.next()
+                except NonDeterminismError:
+                    self.next_ids.append(-1)
+                    self.result_ids.append(-1)
+                    continue
+                except LivelockError as e:
+                    raise FlattenError(str(e))
+                result = (frozenset(sim.outputs), frozenset(sim.locals), tuple(sim.fired))
+                configuration = sim.get_configuration()
+                next_id = self.ids.get(configuration)
+                if next_id is None:
+                    next_id = self._add(sim, configuration, max_configurations)
+                    todo.append(next_id)
+                result_id = result_ids.get(result)
+                if result_id is None:
+                    result_id = result_ids[result] = len(self.results)
+                    self.results.append(result)
+                self.next_ids.append(next_id)
+                self.result_ids.append(result_id)
+        assert len(self.next_ids) == len(self.configurations) * nevents
+        self.nevents = nevents
+        log.info("Flattened %r to %d configurations, %d events, %d results",
+                sc, len(self.configurations), nevents, len(self.results))
+
+    def _add(self, sim, configuration, max_configurations):
+        if len(self.configurations) >= max_configurations:
+            raise FlattenError("More than %d configurations" % max_configurations)
+        sim.set_configuration(configuration)
+        if not sim.is_stable():
+            raise FlattenError("Unstable configuration %r" % (configuration,))
+        id = self.ids[configuration] = len(self.configurations)
+        self.configurations.append(configuration)
+        self.active_states.append(dict(sim.states.active_states))
+        return id
+
+    def lookup(self, id, event):
+        """Returns (next configuration id, (outputs, locals, fired)) of the
+        big step for event from configuration id, or None if the event is
+        unknown or the step is not deterministic.
+        """
+        event_id = self.event_ids.get(event)
+        if event_id is None:
+            return None
+        index = id * self.nevents + event_id
+        next_id = self.next_ids[index]
+        if next_id < 0:
+            return None
+        return (next_id, self.results[self.result_ids[index]])
+
+
+def can_flatten(sc):
+    """Can the statechart be flattened, i.e. has it no variables, guards,
+    actions, timeouts or states not yet loaded?
+    """
+    if sc.init is not None and sc.init.action is not None:
+        return False
+    for state in sc.iter_states():
+        if state.pending:
+            return False
+        if state.is_or() and state.init is not None and state.init.action is not None:
+            return False
+        for transition in state.transitions:
+            if transition.guard is not None or transition.action is not None \
+                    or transition.timeout is not None:
+                return False
+    return True
+
+
+def get_flat_table(sc):
+    """Returns the FlatTable of a statechart, building it on first use,
+    or None if the statechart cannot be flattened.
+    """
+    if sc.flat is None:
+        sc.flat = False
+        if can_flatten(sc):
+            try:
+                sc.flat = FlatTable(sc)
+            except FlattenError as e:
+                log.info("Not flattening %r: %s", sc, e)
+    return sc.flat or None
@@ -0,0 +1,121 @@
+"""Search frontiers that spill to disk.
+
+A breadth-first frontier is a FIFO queue. DiskFrontier keeps at most
+max_items items in memory: the oldest items are kept in memory to be
+popped, and once that is full new items are collected into batches
+which are pickled, compressed and written to files in a spill directory.
+The batches are read back in order when the items in memory run out,
+so memory use stays bounded however large the frontier grows.
+
+  >>> explorer = Explorer(sc, frontier=DiskFrontier(max_items=10 ** 6),
+  ...                     visited=DiskVisitedStore(), record_graph=False)
+"""
+
+import cPickle as pickle
+import os
+import shutil
+import tempfile
+import zlib
+from collections import deque
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class DiskFrontier(object):
+    """FIFO queue spilling batches of items to disk.
+
+    :param directory: directory for spill files (default: a temporary
+                      directory, removed by close())
+    :param max_items: high-water mark of items kept in memory
+    :param batch_size: number of items per spilled batch
+    """
+
+    def __init__(self, directory=None, max_items=1 << 20, batch_size=None):
+        self.own_directory = directory is None
+        self.directory = tempfile.mkdtemp(prefix="pymbt-frontier-") \
+                if directory is None else directory
+        self.max_items = max_items
+        self.batch_size = batch_size or max(1, max_items // 4)
+        # oldest items, then spilled batch numbers, then newest items
+        self.head = deque()
+        self.batches = deque()
+        self.tail = []
+        self.next_batch = 0
+        self.count = 0
+        self.spilled = 0
+
+    def _get_path(self, batch):
+        return os.path.join(self.directory, "batch-%08d" % batch)
+
+    def _spill(self):
+        batch = self.next_batch
+        self.next_batch += 1
+        data = zlib.compress(pickle.dumps(self.tail, pickle.HIGHEST_PROTOCOL), 1)
+        with open(self._get_path(batch), 'wb') as fp:
+            fp.write(data)
+        log.debug("Spilled %d frontier items (%d bytes) to batch %d",
+                len(self.tail), len(data), batch)
+        self.spilled += len(self.tail)
+        self.batches.append(batch)
+        self.tail = []
+
+    def _unspill(self):
+        batch = self.batches.popleft()
+        path = self._get_path(batch)
+        with open(path, 'rb') as fp:
+            items = pickle.loads(zlib.decompress(fp.read()))
+        os.remove(path)
+        self.head.extend(items)
+
+    def append(self, item):
+        if not self.batches and not self.tail and len(self.head) < self.max_items:
+            self.head.append(item)
+        else:
+            self.tail.append(item)
+            if len(self.tail) >= self.batch_size:
+                self._spill()
+        self.count += 1
+
+    def popleft(self):
+        if not self.head:
+            if self.batches:
+                self._unspill()
+            else:
+                (self.head, self.tail) = (deque(self.tail), [])
+        item = self.head.popleft()
+        self.count -= 1
+        return item
+
+    def __len__(self):
+        return self.count
+
+    def _get_files(self):
+        return [os.path.basename(self._get_path(batch)) for batch in self.batches]
+
+    def save_files(self, directory):
+        """Links the spilled batch files into a checkpoint directory.
+        """
+        for name in self._get_files():
+            os.link(os.path.join(self.directory, name), os.path.join(directory, name))
+
+    def load_files(self, directory):
+        """Links the spilled batch files from a checkpoint directory into a new
+        temporary directory, or into the directory given when created.
+        """
+        if self.own_directory:
+            self.directory = tempfile.mkdtemp(prefix="pymbt-frontier-")
+        for name in self._get_files():
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+            os.link(os.path.join(directory, name), path)
+
+    def close(self):
+        """Removes any spill files.
+        """
+        for batch in self.batches:
+            os.remove(self._get_path(batch))
+        self.batches.clear()
+        if self.own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,185 @@
+"""Frozen statecharts.
+
+freeze() converts a statechart into immutable objects with __slots__
+rather than per-instance dicts, children and transitions in tuples, and
+all derived data precomputed: indexes, transition scopes, the states
+activated with each AND-state, the conflict table and any flat table.
+A frozen statechart can be shared by any number of simulators, in any
+threads, as nothing modifies or caches anything in it:
+
+  >>> sc = freeze(read_statechart("cvm.graphml"))
+  >>> sims = [Simulator(sc) for _ in range(100)]
+
+Frozen states and transitions provide the same interface as State and
+Transition, but cannot be pickled.
+"""
+
+from conflicts import ConflictTable
+from flat import FlatTable, FlattenError, can_flatten
+from statechart import State, StateChart
+from transition import Transition
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class FrozenError(Exception):
+    pass
+
+
+class Frozen(object):
+    """Base class of immutable objects.
+    """
+    __slots__ = ()
+
+    def _get_class_name(self):
+        """Returns the name of the unfrozen class, so frozen objects have
+        the same repr as the objects they were frozen from.
+        """
+        return self.__class__.__name__[len("Frozen"):]
+
+    def _set(self, **kwargs):
+        for (name, value) in kwargs.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise FrozenError("Cannot set %s of frozen %r" % (name, self))
+
+    def __delattr__(self, name):
+        raise FrozenError("Cannot delete %s of frozen %r" % (name, self))
+
+    def __reduce_ex__(self, protocol):
+        raise FrozenError("Cannot pickle frozen %r" % self)
+
+
+class FrozenState(Frozen):
+    """Frozen basic state.
+    """
+    __slots__ = ('label', 'id', 'index', 'parent', 'states', 'transitions', 'pending')
+
+    # share the methods of State
+    ancestors_to = State.ancestors_to.im_func
+    ancestors = State.ancestors.im_func
+    get_lca = State.get_lca.im_func
+    is_descendant = State.is_descendant.im_func
+    is_ancestor = State.is_ancestor.im_func
+    iter_states = State.iter_states.im_func
+    is_basic = State.is_basic.im_func
+    to_string = State.to_string.im_func
+
+    def __repr__(self):
+        return "%s(%r)" % (self._get_class_name(), self.label)
+
+    def is_or(self):
+        return False
+
+    def is_and(self):
+        return False
+
+
+class FrozenAndState(FrozenState):
+    """Frozen AND-state.
+    """
+    # the state and its orthogonal states, all activated together
+    __slots__ = ('orthogonal',)
+
+    def is_and(self):
+        return True
+
+    def get_orthogonal_states(self):
+        return list(self.orthogonal[1:])
+
+
+class FrozenStateChart(FrozenState):
+    """Frozen OR-state, and root statechart.
+    """
+    __slots__ = ('start_state', 'init', 'locals', 'all_states', 'all_transitions',
+            'conflicts', 'flat', 'reindex')
+
+    get_fingerprint = StateChart.get_fingerprint.im_func
+    validate = StateChart.validate.im_func
+
+    def is_or(self):
+        return True
+
+    def load_all(self):
+        pass
+
+    def compile(self):
+        pass
+
+
+class FrozenTransition(Frozen):
+    """Frozen transition.
+    """
+    __slots__ = ('event', 'timeout', 'name', 'outputs', 'defines', 'guard_s', 'guard_ast',
+            'guard', 'action_s', 'action_ast', 'action', 'source', 'destination', 'scope',
+            'index')
+
+    # share the methods of Transition
+    get_assignments = Transition.get_assignments.im_func
+    get_read_variables = Transition.get_read_variables.im_func
+    get_written_variables = Transition.get_written_variables.im_func
+    eval_guard = may_occur = Transition.eval_guard.im_func
+    exec_action = Transition.exec_action.im_func
+    get_label = Transition.get_label.im_func
+
+    def __repr__(self):
+        return "%s%r" % (self._get_class_name(), (self.get_label(), self.destination))
+
+
+def _freeze_transition(transition, copies):
+    frozen = FrozenTransition.__new__(FrozenTransition)
+    source = copies.get(transition.source)
+    frozen._set(event=transition.event, timeout=transition.timeout, name=transition.name,
+            outputs=tuple(transition.outputs), defines=tuple(transition.defines),
+            guard_s=transition.guard_s, guard_ast=transition.guard_ast,
+            guard=transition.guard, action_s=transition.action_s,
+            action_ast=transition.action_ast, action=transition.action,
+            source=source, destination=copies.get(transition.destination),
+            scope=copies[transition.scope] if source else None, index=transition.index)
+    return frozen
+
+
+def freeze(sc):
+    """Returns a frozen copy of a statechart.
+    """
+    sc.load_all()
+    copies = dict()
+    # states are in preorder so parents are copied first
+    for state in sc.all_states:
+        if state.is_or():
+            cls = FrozenStateChart
+        elif state.is_and():
+            cls = FrozenAndState
+        else:
+            cls = FrozenState
+        frozen = copies[state] = cls.__new__(cls)
+        frozen._set(label=state.label, id=state.id, index=state.index,
+                parent=copies.get(state.parent), pending=None)
+    transitions = dict((t, _freeze_transition(t, copies)) for t in sc.all_transitions)
+    for state in sc.all_states:
+        frozen = copies[state]
+        frozen._set(states=tuple(copies[st] for st in state.states),
+                transitions=tuple(transitions[t] for t in state.transitions))
+        if state.is_or():
+            frozen._set(start_state=copies.get(state.start_state),
+                    init=state.init and _freeze_transition(state.init, copies),
+                    locals=None, all_states=None, all_transitions=None, conflicts=None,
+                    flat=None, reindex=False)
+        elif state.is_and():
+            orthogonal = [state] + state.get_orthogonal_states()
+            frozen._set(orthogonal=tuple(copies[st] for st in orthogonal))
+    root = copies[sc]
+    root._set(locals=frozenset(sc.locals or ()),
+            all_states=tuple(copies[st] for st in sc.all_states),
+            all_transitions=tuple(transitions[t] for t in sc.all_transitions))
+    root._set(conflicts=ConflictTable(root))
+    flat = False
+    if can_flatten(root):
+        try:
+            flat = FlatTable(root)
+        except FlattenError as e:
+            log.info("Not flattening %r: %s", root, e)
+    root._set(flat=flat)
+    return root
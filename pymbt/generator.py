@@ -0,0 +1,62 @@
+"""Test sequence generation.
+
+A test sequence is a list of big steps, each a tuple of input events and
+the set of outputs the model produces for them, starting from the initial
+configuration. Each sequence records the model items it covers (see
+Coverage.get_items) so suites can be measured and minimized (see
+pymbt.suite).
+
+  >>> sequences = list(generate_random_sequences(sc, count=100, length=20))
+"""
+
+from coverage import Coverage
+from simulator import Simulator
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class TestSequence(object):
+    """A sequence of (inputs, outputs) big steps and the items it covers.
+
+    :param duration: measured execution time (seconds), if known
+    """
+
+    def __init__(self, steps, coverage=frozenset(), duration=None):
+        self.steps = steps
+        self.coverage = coverage
+        self.duration = duration
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.steps)
+
+
+def random_walk(sim, length):
+    """Performs a random walk of up to length big steps from the current
+    configuration of sim, returning the [(inputs, outputs)] steps.
+
+    The walk ends early if no inputs are expected.
+    """
+    steps = []
+    for _ in xrange(length):
+        event = sim.random_step()
+        if event is None:
+            break
+        steps.append(((event,), frozenset(sim.outputs)))
+    return steps
+
+
+def generate_random_sequences(sc, count, length, seed=None):
+    """Yields count TestSequences of random walks of up to length steps
+    from the initial configuration.
+    """
+    sim = Simulator(sc, seed=seed)
+    initial = sim.get_configuration()
+    for _ in xrange(count):
+        sim.set_configuration(initial)
+        coverage = sim.enable_coverage(Coverage(sc))
+        steps = random_walk(sim, length)
+        yield TestSequence(steps, coverage.get_items())
@@ -0,0 +1,99 @@
+"""Bulk loading of statechart diagrams.
+
+load_statecharts reads every graph of many GraphML files on a pool of
+worker processes. Each worker parses and compiles the statecharts of a
+file and sends them back pickled (compiled guards and actions are not
+pickled but compiled again from their labels, see Transition), and a
+file that fails to load is reported rather than stopping the batch:
+
+  >>> (statecharts, errors) = load_statecharts("models/")
+  >>> statecharts[("models/cvm.graphml", 0)]
+  StateChart('root')
+  >>> errors
+  {'models/broken.graphml': 'graph 1: ParseError: ...'}
+"""
+
+import glob
+import multiprocessing
+import os
+
+from statechart import make_statechart
+from yed_graphml import read_file
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def find_files(paths, extension=".graphml"):
+    """Returns the sorted files given by paths: a directory (searched
+    recursively for files with the extension), a glob pattern, a file, or
+    a list of these.
+    """
+    if isinstance(paths, basestring):
+        paths = [paths]
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for (dirpath, dirnames, filenames) in os.walk(path):
+                files.update(os.path.join(dirpath, name) for name in filenames
+                        if name.endswith(extension))
+        else:
+            files.update(glob.glob(path))
+    return sorted(files)
+
+
+def load_file(path, lazy=False):
+    """Loads the statecharts of every graph in a file, returning (path,
+    [(graph index, statechart)], error) where error describes any
+    failures, or is None.
+    """
+    try:
+        graphs = read_file(path)
+    except Exception as e:
+        return (path, [], "%s: %s" % (e.__class__.__name__, e))
+    statecharts = []
+    errors = []
+    for (index, g) in enumerate(graphs):
+        try:
+            statecharts.append((index, make_statechart(g, lazy=lazy)))
+        except Exception as e:
+            errors.append("graph %d: %s: %s" % (index, e.__class__.__name__, e))
+    return (path, statecharts, "; ".join(errors) or None)
+
+
+def _load_file(args):
+    return load_file(*args)
+
+
+def load_statecharts(paths, processes=None, lazy=False):
+    """Loads the statecharts of all graphs in the files given by paths
+    (see find_files) on a pool of processes, returning (statecharts,
+    errors), where statecharts is a dict of (path, graph index) ->
+    StateChart and errors is a dict of path -> error.
+
+    :param processes: number of worker processes (default: number of
+                      CPUs, 0 loads in this process)
+    :param lazy: passed to make_statechart
+    """
+    files = find_files(paths)
+    items = [(path, lazy) for path in files]
+    statecharts = dict()
+    errors = dict()
+    if processes == 0:
+        results = map(_load_file, items)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_load_file, items, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+    for (path, charts, error) in results:
+        for (index, sc) in charts:
+            statecharts[(path, index)] = sc
+        if error:
+            log.warn("Failed to load %s: %s", path, error)
+            errors[path] = error
+    log.info("Loaded %d statecharts from %d files, %d files failed",
+            len(statecharts), len(files), len(errors))
+    return (statecharts, errors)
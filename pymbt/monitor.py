@@ -0,0 +1,243 @@
+"""Online monitors of safety properties evaluated during simulation.
+
+A property is a Python expression, parsed with ast like the guards of
+transitions (see pymbt.transition), over the variables of a statechart,
+the atoms active(label), true while the state is active, and
+event(name), true in a big step with the input, local, output or
+timeout event (as written on the transition, e.g. 'after(30s)'), and
+the past-time temporal operators:
+
+  previous(p)      p held at the previous big step (false at the first)
+  once(p)          p held at some big step so far
+  historically(p)  p held at every big step so far
+  since(p, q)      q held at some big step and p at every one after it
+  implies(p, q)    not p or q
+
+A property must hold after every big step; it is violated at the first
+big step where it does not:
+
+  >>> monitors = sim.enable_monitors(MonitorSet(sc, {
+  ...     'paid': "implies(event('start'), once(event('inc')))",
+  ...     'idle': "historically(not active('BUSY'))"}))
+  >>> for event in ['power_on', 'inc', 'coffee']:
+  ...     sim.enabled_inputs.add(event)
+  ...     sim.next()
+  PropertyViolation: Property 'idle' violated at step 3
+
+The properties of a MonitorSet are compiled together into a single code
+object. Each temporal operator becomes a bit of the state of a small
+automaton, the list of bits updated after each big step from
+its own previous value and the current values of its operands, so each
+update costs the same whatever the length of the run, and checking many
+properties costs one evaluation of the code.
+
+As the bits are updated at every big step, the operands of temporal
+operators are always evaluated, even where and, or, if-else or implies
+would otherwise skip them: "m == 0 or once(10 / m > 1)" fails with
+MonitorError when m is 0, and should be "once(m != 0 and 10 / m > 1)".
+If evaluating the properties fails no bits are updated.
+"""
+
+import __builtin__
+import ast
+
+from transition import ParseError, get_names
+
+import logging
+log = logging.getLogger(__name__)
+
+# temporal operator -> (number of operands, initial value)
+OPERATORS = {
+    'previous': (1, False),
+    'once': (1, False),
+    'historically': (1, True),
+    'since': (2, False),
+}
+
+# names of the atoms and operators, which may not be used as variables
+KEYWORDS = frozenset(['active', 'event', 'implies']) | frozenset(OPERATORS)
+
+
+class MonitorError(Exception):
+    pass
+
+
+class PropertyViolation(Exception):
+    """A property did not hold at a big step.
+    """
+
+    def __init__(self, message, name, step):
+        Exception.__init__(self, message)
+        self.name = name
+        self.step = step
+
+
+def _load(name):
+    return ast.Name(name, ast.Load())
+
+
+def _bit(index, ctx=ast.Load):
+    return ast.Subscript(_load('__bits'), ast.Index(ast.Num(index)), ctx())
+
+
+class _Compiler(ast.NodeTransformer):
+    """Replaces the atoms and operators of properties by plain Python,
+    adding a statement updating the bit of each temporal operator.
+    """
+
+    def __init__(self, states):
+        # label -> state index
+        self.states = states
+        self.statements = []
+        self.initial = []
+
+    def visit_Call(self, node):
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name not in KEYWORDS:
+            return self.generic_visit(node)
+        if node.keywords or node.starargs or node.kwargs:
+            raise MonitorError("%s() takes only positional operands" % name)
+        if name in ('active', 'event'):
+            if len(node.args) != 1 or not isinstance(node.args[0], ast.Str):
+                raise MonitorError("%s() takes a string, e.g. %s('X')" % (name, name))
+            value = node.args[0].s
+            if name == 'active':
+                if value not in self.states:
+                    raise MonitorError("No state labelled %r" % value)
+                if self.states[value] is None:
+                    raise MonitorError("More than one state labelled %r" % value)
+                return ast.Compare(ast.Num(self.states[value]), [ast.In()],
+                        [_load('__active')])
+            return ast.Compare(ast.Str(value), [ast.In()], [_load('__events')])
+        operands = [self.visit(arg) for arg in node.args]
+        if name == 'implies':
+            if len(operands) != 2:
+                raise MonitorError("implies() takes 2 operands")
+            return ast.BoolOp(ast.Or(), [ast.UnaryOp(ast.Not(), operands[0]), operands[1]])
+        (count, initial) = OPERATORS[name]
+        if len(operands) != count:
+            raise MonitorError("%s() takes %d operand%s" % (name, count, "s" * (count > 1)))
+        index = len(self.initial)
+        self.initial.append(initial)
+        if name == 'previous':
+            # read the bit before storing the current value for the next step
+            saved = '__previous%d' % index
+            self.statements.append(ast.Assign([ast.Name(saved, ast.Store())], _bit(index)))
+            self.statements.append(ast.Assign([_bit(index, ast.Store)], operands[0]))
+            return _load(saved)
+        if name == 'once':
+            value = ast.BoolOp(ast.Or(), [operands[0], _bit(index)])
+        elif name == 'historically':
+            value = ast.BoolOp(ast.And(), [operands[0], _bit(index)])
+        else:
+            value = ast.BoolOp(ast.Or(), [operands[1],
+                    ast.BoolOp(ast.And(), [operands[0], _bit(index)])])
+        self.statements.append(ast.Assign([_bit(index, ast.Store)], value))
+        return _bit(index)
+
+
+class MonitorSet(object):
+    """Monitors of properties of a statechart, updated after each big step
+    of a Simulator (see Simulator.enable_monitors).
+
+    :param properties: dict of name -> property, or a list of properties
+                       named by themselves
+    :param raise_violations: if True raise PropertyViolation at the first
+                             violation, else just add it to violations
+    """
+
+    def __init__(self, sc, properties, raise_violations=True):
+        sc.load_all()
+        if isinstance(properties, dict):
+            properties = sorted(properties.items())
+        else:
+            properties = [(text, text) for text in properties]
+        self.names = [name for (name, _) in properties]
+        self.properties = dict(properties)
+        self.raise_violations = raise_violations
+        states = dict()
+        for state in sc.all_states:
+            states[state.label] = None if state.label in states else state.index
+        inits = [st.init for st in sc.all_states if st.is_or() and st.init is not None]
+        variables = set(name for t in inits + list(sc.all_transitions)
+                for (name, _) in t.get_assignments())
+        compiler = _Compiler(states)
+        for (number, (name, text)) in enumerate(properties):
+            try:
+                tree = ast.parse(text, "<property>", mode="eval")
+            except SyntaxError as e:
+                raise ParseError("Failed to parse property %r (column=%s)" % (text, e.offset))
+            unknown = get_names(tree) - variables - KEYWORDS - set(dir(__builtin__))
+            if unknown:
+                raise MonitorError("Unknown variables %s in property %r" % (
+                        ", ".join(sorted(unknown)), name))
+            try:
+                body = compiler.visit(tree.body)
+            except MonitorError as e:
+                raise MonitorError("%s in property %r" % (e, name))
+            # if not <property>: __violated.append(number)
+            compiler.statements.append(ast.If(ast.UnaryOp(ast.Not(), body),
+                    [ast.Expr(ast.Call(ast.Attribute(_load('__violated'), 'append', ast.Load()),
+                        [ast.Num(number)], [], None, None))], []))
+        module = ast.fix_missing_locations(ast.Module(compiler.statements))
+        self.code = compile(module, "<properties>", mode="exec")
+        self.initial = compiler.initial
+        self.reset()
+
+    def reset(self):
+        """Restarts monitoring, e.g. after resetting the simulator.
+        """
+        self.bits = list(self.initial)
+        self.step = 0
+        # [(name, step)] of the properties violated
+        self.violations = []
+
+    def get_checkpoint(self):
+        """Returns the monitoring state as a picklable dict, saved with
+        the simulator's (see Simulator.get_checkpoint).
+        """
+        return dict(names=self.names, bits=self.bits, step=self.step,
+                violations=self.violations)
+
+    def set_checkpoint(self, state):
+        """Restores the monitoring state from get_checkpoint().
+        """
+        if state['names'] != self.names:
+            raise MonitorError("Checkpoint is for properties %r" % (state['names'],))
+        self.bits = list(state['bits'])
+        self.step = state['step']
+        self.violations = list(state['violations'])
+
+    def update(self, sim, inputs=(), expired=()):
+        """Updates the monitors after a big step of sim, raising
+        PropertyViolation if a property is violated and raise_violations
+        is True.
+
+        :param inputs: input events of the big step
+        :param expired: timeout transitions whose timers expired for the
+                        big step
+        """
+        self.step += 1
+        events = set(inputs)
+        events.update(transition.event for transition in expired)
+        for transition in sim.fired:
+            events.update(transition.outputs)
+        namespace = dict(sim.variables)
+        # update a copy, so a failure leaves the bits of the previous step
+        bits = list(self.bits)
+        namespace.update(__bits=bits, __events=events, __violated=[],
+                __active=set(st.index for st in sim.active_states))
+        try:
+            exec self.code in namespace
+        except Exception as e:
+            raise MonitorError("Failed to evaluate properties at step %d: %s: %s" % (
+                    self.step, e.__class__.__name__, e))
+        self.bits = bits
+        violated = [self.names[number] for number in namespace['__violated']]
+        if not violated:
+            return
+        self.violations.extend((name, self.step) for name in violated)
+        log.info("Properties %r violated at step %d", violated, self.step)
+        if self.raise_violations:
+            raise PropertyViolation("Property %r violated at step %d" % (
+                    violated[0], self.step), violated[0], self.step)
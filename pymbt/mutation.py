@@ -0,0 +1,314 @@
+"""Mutation analysis of test suites.
+
+A mutant is the model with one small fault: a transition going to a
+sibling of its destination, triggered by another event, with a guard
+comparison operator replaced, a constant in its action changed, or an
+output removed. A suite kills a mutant when running the inputs of one of
+its sequences on the mutant produces outputs other than those the suite
+expects, and its mutation score, the fraction of mutants killed,
+measures how well it detects faults:
+
+  >>> report = analyse_mutants(sc, suite)
+  >>> print report
+  killed 93/104 mutants (score 0.894), 11 survived:
+    t6 : inc [m<10] / m = m+1: guard Lt -> LtE
+    ...
+
+Mutants are applied to the compiled statechart in place, replacing just
+the mutated transition's fields (and, when a destination changes, its
+relations in the conflict table, saving the table's lists to restore),
+and reverted after running the suite, so nothing else is copied. Each worker process mutates its own copy of the model
+and stops running the suite on a mutant at the first divergence, trying
+first the sequence that killed the previous mutant.
+"""
+
+import ast
+import copy
+import multiprocessing
+
+from simulator import Simulator
+from statechart import read_statechart
+
+import logging
+log = logging.getLogger(__name__)
+
+# replacements of comparison operators in guards
+COMPARISONS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+class MutationError(Exception):
+    pass
+
+
+def _iter_comparisons(node):
+    """Yields (compare node, op index) of the comparisons in node.
+    """
+    for subnode in ast.walk(node):
+        if isinstance(subnode, ast.Compare):
+            for index in range(len(subnode.ops)):
+                yield (subnode, index)
+
+
+def _iter_numbers(node):
+    for subnode in ast.walk(node):
+        if isinstance(subnode, ast.Num):
+            yield subnode
+
+
+class Mutant(object):
+    """A single change to a transition of a statechart.
+
+    :param operator: name of the mutation operator
+    :param index: index of the transition
+    :param position: what is changed, e.g. the number of the comparison
+                     in the guard
+    :param value: the replacement
+    """
+
+    def __init__(self, operator, index, position, value, description):
+        self.operator = operator
+        self.index = index
+        self.position = position
+        self.value = value
+        self.description = description
+
+    def apply(self, sc):
+        """Mutates sc in place, returning what revert() needs to undo it.
+        """
+        transition = sc.all_transitions[self.index]
+        table = sc.conflicts.save() if self.operator == 'destination' else None
+        saved = (transition.__dict__.copy(), table)
+        getattr(self, "_apply_" + self.operator)(sc, transition)
+        return saved
+
+    def revert(self, sc, saved):
+        transition = sc.all_transitions[self.index]
+        transition.__dict__.clear()
+        transition.__dict__.update(saved[0])
+        if saved[1] is not None:
+            sc.conflicts.restore(saved[1])
+
+    def _apply_destination(self, sc, transition):
+        transition.destination = sc.all_states[self.value]
+        transition._scope = None
+        sc.conflicts.update(transition)
+
+    def _apply_event(self, sc, transition):
+        transition.event = self.value
+
+    def _apply_guard(self, sc, transition):
+        guard_ast = copy.deepcopy(transition.guard_ast)
+        (node, index) = list(_iter_comparisons(guard_ast))[self.position]
+        node.ops[index] = self.value()
+        transition.guard_ast = guard_ast
+        transition.guard = compile(guard_ast, "<string>", mode="eval")
+
+    def _apply_action(self, sc, transition):
+        action_ast = copy.deepcopy(transition.action_ast)
+        list(_iter_numbers(action_ast))[self.position].n = self.value
+        transition.action_ast = action_ast
+        transition.action = compile(action_ast, "<string>", mode="exec")
+
+    def _apply_output(self, sc, transition):
+        transition.outputs = [event for event in transition.outputs if event != self.value]
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.description)
+
+
+def _describe(transition, change):
+    return "%s: %s" % (transition.get_label(), change)
+
+
+def mutate_destinations(sc):
+    for transition in sc.all_transitions:
+        destination = transition.destination
+        for state in destination.parent.states:
+            if state is not destination:
+                yield Mutant('destination', transition.index, None, state.index,
+                        _describe(transition, "destination %s -> %s" % (
+                            destination.label, state.label)))
+
+
+def mutate_events(sc):
+    events = sorted(set(t.event for t in sc.all_transitions
+            if t.event and t.timeout is None))
+    for transition in sc.all_transitions:
+        if not transition.event or transition.timeout is not None:
+            continue
+        for event in events:
+            if event != transition.event:
+                yield Mutant('event', transition.index, None, event,
+                        _describe(transition, "event %s -> %s" % (transition.event, event)))
+
+
+def mutate_guards(sc):
+    for transition in sc.all_transitions:
+        if transition.guard_ast is None:
+            continue
+        for (position, (node, index)) in enumerate(_iter_comparisons(transition.guard_ast)):
+            op = type(node.ops[index])
+            for replacement in COMPARISONS:
+                if replacement is not op:
+                    yield Mutant('guard', transition.index, position, replacement,
+                            _describe(transition, "guard %s -> %s" % (
+                                op.__name__, replacement.__name__)))
+
+
+def mutate_actions(sc):
+    for transition in sc.all_transitions:
+        if transition.action_ast is None:
+            continue
+        for (position, node) in enumerate(_iter_numbers(transition.action_ast)):
+            for value in sorted(set([node.n + 1, node.n - 1, 0]) - set([node.n])):
+                yield Mutant('action', transition.index, position, value,
+                        _describe(transition, "constant %r -> %r" % (node.n, value)))
+
+
+def mutate_outputs(sc):
+    for transition in sc.all_transitions:
+        for event in transition.outputs:
+            yield Mutant('output', transition.index, None, event,
+                    _describe(transition, "output %s removed" % event))
+
+
+OPERATORS = {
+    'destination': mutate_destinations,
+    'event': mutate_events,
+    'guard': mutate_guards,
+    'action': mutate_actions,
+    'output': mutate_outputs,
+}
+
+
+def generate_mutants(sc, operators=None):
+    """Returns the list of mutants of sc by the given operators (default:
+    all of OPERATORS).
+    """
+    sc.load_all()
+    mutants = []
+    for name in sorted(operators or OPERATORS):
+        if name not in OPERATORS:
+            raise MutationError("Unknown mutation operator %r" % name)
+        mutants.extend(OPERATORS[name](sc))
+    return mutants
+
+
+def run_mutant(sc, mutant, suite, order=None):
+    """Runs the suite on a mutant of sc until the first divergence,
+    returning (number of the killing sequence, reason), or None if the
+    mutant survives.
+
+    :param suite: list of [(inputs, outputs)] steps of each sequence
+    :param order: list of the sequence numbers in the order to run them,
+                  with the killing sequence moved to the front
+    """
+    order = range(len(suite)) if order is None else order
+    saved = mutant.apply(sc)
+    try:
+        sim = Simulator(sc, flatten=False)
+        initial = sim.get_configuration()
+        for (position, number) in enumerate(order):
+            sim.set_configuration(initial)
+            for (index, (inputs, outputs)) in enumerate(suite[number]):
+                sim.enabled_inputs.update(inputs)
+                try:
+                    sim.next()
+                except Exception as e:
+                    reason = "step %d raised %s: %s" % (index, e.__class__.__name__, e)
+                else:
+                    if sim.outputs == set(outputs):
+                        continue
+                    reason = "step %d outputs %r" % (index, sorted(sim.outputs))
+                order.insert(0, order.pop(position))
+                return (number, reason)
+        return None
+    finally:
+        mutant.revert(sc, saved)
+
+
+class MutationResult(object):
+    """The result of running the suite on a mutant.
+
+    :param killer: number of the sequence killing the mutant, or None
+    """
+
+    def __init__(self, mutant, killer=None, reason=None):
+        self.mutant = mutant
+        self.killer = killer
+        self.reason = reason
+
+    @property
+    def killed(self):
+        return self.killer is not None
+
+
+class MutationReport(object):
+    """Mutation score and surviving mutants.
+    """
+
+    def __init__(self, results):
+        self.results = results
+        self.killed = [result for result in results if result.killed]
+        self.survivors = [result.mutant for result in results if not result.killed]
+
+    @property
+    def score(self):
+        return float(len(self.killed)) / len(self.results) if self.results else 1.0
+
+    def __str__(self):
+        lines = ["killed %d/%d mutants (score %.3f), %d survived%s" % (
+                len(self.killed), len(self.results), self.score, len(self.survivors),
+                ":" if self.survivors else "")]
+        lines.extend("  " + mutant.description for mutant in self.survivors)
+        return "\n".join(lines)
+
+
+# state of each worker process, set up by _init_worker
+_worker = dict()
+
+
+def _init_worker(model, suite):
+    sc = read_statechart(model) if isinstance(model, basestring) else model
+    sc.load_all()
+    _worker.update(sc=sc, suite=suite, order=range(len(suite)))
+
+
+def _run_worker(mutant):
+    killed = run_mutant(_worker['sc'], mutant, _worker['suite'], _worker['order'])
+    return MutationResult(mutant, *(killed or ()))
+
+
+def _get_steps(sequence):
+    return [(tuple(inputs), tuple(outputs)) for (inputs, outputs)
+            in getattr(sequence, 'steps', sequence)]
+
+
+def analyse_mutants(model, sequences, mutants=None, operators=None, processes=None,
+        chunksize=16):
+    """Runs the sequences on mutants of a model, returning a MutationReport.
+
+    :param model: path of the model, or its (not frozen) statechart,
+                  mutated in place but restored if processes is 0
+    :param sequences: TestSequences (or lists of (inputs, outputs) steps)
+    :param mutants: mutants to run (default: generate_mutants(operators))
+    :param processes: number of worker processes (default: number of
+                      CPUs, 0 runs mutants in this process)
+    """
+    sc = read_statechart(model) if isinstance(model, basestring) else model
+    if mutants is None:
+        mutants = generate_mutants(sc, operators)
+    suite = [_get_steps(sequence) for sequence in sequences]
+    if processes == 0:
+        _init_worker(sc, suite)
+        results = map(_run_worker, mutants)
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, (model, suite))
+        try:
+            results = pool.map(_run_worker, mutants, chunksize)
+        finally:
+            pool.terminate()
+            pool.join()
+    report = MutationReport(results)
+    log.info("Mutation analysis: %s", report)
+    return report
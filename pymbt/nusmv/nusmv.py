@@ -61,7 +61,12 @@ assignments = parse("x = 0; y=x+1; z=False", filename="<string>", mode="exec")
 def to_nusmv(s):
     """Translates a Python expression to a NuSMV expression.
     """
-    node = parse_expr(s)
+    return translate(parse_expr(s))
+
+
+def translate(node):
+    """Translates a Python expression AST to a NuSMV expression.
+    """
     generator = NuSMVVisitor()
     generator.visit(node)
     return "".join(generator.result)
@@ -154,7 +159,6 @@ class NuSMVVisitor(NodeVisitor):
     def visit_Compare(self, node):
         if len(node.ops) > 1:
             node = expand_compare(node)
-            print dump(node)
             self.visit(node)
         else:
             prec = self.get_op_precedence(node)
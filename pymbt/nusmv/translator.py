@@ -1,8 +1,34 @@
 """NuSMV model translator.
 
+NuSMVModel translates a statechart to a NuSMV model, each big step
+being a sequence of NuSMV steps as in examples/cvm.smv, and streams the
+model to a file.
 
+Translating guards and actions dominates the time taken, so the SMV
+fragments for each guard, action and state definition are kept in a
+FragmentCache keyed by their source. After a change to a model only the
+changed fragments are translated again, and the cache can be saved to
+a file to be reused by the next run:
+
+  >>> cache = FragmentCache("cvm.smv.cache")
+  >>> NuSMVModel(sc, ranges={'m': '0..11'}, cache=cache).write_file("cvm.smv")
+  >>> cache.save()
+
+NuSMV has no clock, so timeout events (e.g. after(30s), see
+pymbt.simulator) are abstracted: the timeout of each timeout transition
+is a free boolean variable timeout-<transition>, like an input event,
+so the model allows a timeout to expire at any stable step while its
+source state is active, however long it has been active.
 """
 
+import cPickle as pickle
+import os
+
+from nusmv import translate
+
+import logging
+log = logging.getLogger(__name__)
+
 
 class NuSMVDef(object):
     def __init__(self, lhs, rhs):
@@ -13,21 +39,267 @@ class NuSMVDef(object):
         return self.lhs + " := " + self.rhs + ";"
 
 
+class FragmentCache(object):
+    """Cache of translated SMV fragments keyed by their source.
+
+    :param path: file to load the cache from and save it to, if any
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.fragments = dict()
+        # keys used since loading, the others are dropped by save()
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, 'rb') as fp:
+                self.fragments = pickle.load(fp)
+
+    def get(self, key, translate):
+        """Returns the fragment for key, calling translate() to create
+        it if not cached.
+        """
+        self.used.add(key)
+        fragment = self.fragments.get(key)
+        if fragment is None:
+            self.misses += 1
+            fragment = self.fragments[key] = translate()
+        else:
+            self.hits += 1
+        return fragment
+
+    def save(self, path=None):
+        """Saves the fragments used since loading.
+        """
+        path = path or self.path
+        fragments = dict((key, self.fragments[key]) for key in self.used)
+        with open(path + ".tmp", 'wb') as fp:
+            pickle.dump(fragments, fp, pickle.HIGHEST_PROTOCOL)
+        os.rename(path + ".tmp", path)
+
+
 class NuSMVModel(object):
+    """NuSMV model of a statechart.
+
+    :param ranges: dict of variable -> NuSMV type, e.g. "0..11"
+                   (default: integer)
+    :param cache: FragmentCache to use (default: a new one)
+    """
+
+    def __init__(self, sc, ranges=None, cache=None):
+        sc.load_all()
+        self.sc = sc
+        self.ranges = ranges or dict()
+        self.cache = FragmentCache() if cache is None else cache
+        self.states = sc.all_states
+        self.transitions = sc.all_transitions
+        self.locals = sorted(sc.locals or ())
+        self.inputs = sorted(set(t.event for t in self.transitions
+                if t.event and t.timeout is None and t.event not in self.locals))
+        self.outputs = sorted(set(e for t in self.transitions for e in t.outputs
+                if e not in self.locals))
+        self.init = sc.init.get_assignments() if sc.init else []
+        self.variables = sorted(set([name for (name, value) in self.init] +
+                [name for t in self.transitions for name in t.get_written_variables()]))
+        # transitions which may compete in the same scope
+        self.competing = set()
+        for pair in sc.conflicts.nondeterministic:
+            self.competing.update(pair)
+
+    def get_name(self, transition):
+        return transition.name or "t%d" % (transition.index + 1)
+
+    def get_timeout(self, transition):
+        """Returns the variable of the timeout event of a timeout
+        transition.
+        """
+        return "timeout-" + self.get_name(transition)
+
+    def get_variable(self, state):
+        """Returns the configuration variable of an OR-state.
+        """
+        return state.label.upper()
+
+    def get_guard(self, transition):
+        if transition.guard_ast is None:
+            return "TRUE"
+        return self.cache.get(('guard', transition.guard_s),
+                lambda: translate(transition.guard_ast))
+
+    def get_updates(self, transition):
+        """Returns the [(variable, expression)] updates of the action.
+        """
+        if transition.action_ast is None:
+            return []
+        return self.cache.get(('action', transition.action_s),
+                lambda: [(name, translate(value))
+                    for (name, value) in transition.get_assignments()])
 
     def get_in_state(self):
         defs = []
         for state in self.states:
-            label = state.label.lower()
-            if state.parent:
-                parent = state.parent.label.lower()
-                nusmv_def = NuSMVDef(
-                        "in-" + label,
-                        "in-%s & %s=%s" % (parent, parent.upper(), label))
-            else:
-                nusmv_def = NuSMVDef("in-" + label, "TRUE")
-            defs.append(nusmv_def)
+            parent = state.parent
+            key = ('in', state.label, parent and parent.label, parent and parent.is_or())
+            defs.append(self.cache.get(key, lambda: self._get_in_state(state).to_string()))
         return defs
 
+    def _get_in_state(self, state):
+        label = state.label.lower()
+        if state.parent is None:
+            return NuSMVDef("in-" + label, "TRUE")
+        parent = state.parent
+        if parent.is_or():
+            return NuSMVDef("in-" + label, "in-%s & %s=%s" % (
+                    parent.label.lower(), self.get_variable(parent), label))
+        return NuSMVDef("in-" + label, "in-" + parent.label.lower())
+
+    def get_entered(self, transition):
+        """Returns the states entered by a transition whose parents are
+        OR-states, i.e. the configuration variables it sets.
+        """
+        path = list(transition.destination.ancestors_to(transition.scope))
+        entered = [st for st in path if st.parent.is_or()]
+        # other regions of AND-states on the path enter their start states
+        todo = [transition.destination]
+        for state in path[1:]:
+            if state.is_and():
+                todo.extend(st for st in state.states if st not in path)
+        while todo:
+            state = todo.pop()
+            if state.is_or():
+                if state.start_state is not None:
+                    entered.append(state.start_state)
+                    todo.append(state.start_state)
+            else:
+                todo.extend(state.states)
+        return entered
+
+    def _cases(self, lhs, cases, default):
+        lines = ["  %s := case" % lhs]
+        lines.extend("    %s: %s;" % case for case in cases)
+        lines.append("    TRUE: %s;" % default)
+        lines.append("  esac;")
+        return lines
+
+    def iter_lines(self):
+        """Yields the lines of the model.
+        """
+        names = dict((t, self.get_name(t)) for t in self.transitions)
+        or_states = [st for st in self.states if st.is_or()]
+        timeouts = [self.get_timeout(t) for t in self.transitions if t.timeout is not None]
+        events = self.inputs + timeouts + self.locals + self.outputs
+        yield "MODULE main"
+        yield ""
+        yield "VAR"
+        yield "  -- configurations"
+        for state in or_states:
+            yield "  %s: {%s};" % (self.get_variable(state),
+                    ", ".join(st.label.lower() for st in state.states))
+        for (comment, group) in (("events", self.inputs), ("timeouts", timeouts),
+                ("local events", self.locals), ("output events", self.outputs)):
+            yield "  -- " + comment
+            for event in group:
+                yield "  %s: boolean;" % event
+        yield "  -- variables"
+        for name in self.variables:
+            yield "  %s: %s;" % (name, self.ranges.get(name, "integer"))
+        yield "  -- transitions"
+        for transition in self.transitions:
+            yield "  %s: boolean;" % names[transition]
+        yield ""
+        yield "DEFINE"
+        yield "  -- in(state)"
+        for line in self.get_in_state():
+            yield "  " + line
+        yield "  -- mayoccur(t)"
+        for transition in self.transitions:
+            parts = ["in-" + transition.source.label.lower(), self.get_guard(transition)]
+            if transition.timeout is not None:
+                parts.append(self.get_timeout(transition))
+            elif transition.event:
+                parts.append(transition.event)
+            yield "  mayoccur-%s := %s;" % (names[transition], " & ".join(parts))
+        yield "  -- enabled(t)"
+        yield "  -- (a transition is enabled iff it may occur and no outer transition may occur)"
+        conflicts = self.sc.conflicts
+        for transition in self.transitions:
+            higher = ["mayoccur-" + names[t] for t in self.transitions
+                    if conflicts.has_priority(t, transition)]
+            rhs = "mayoccur-" + names[transition]
+            if higher:
+                rhs += " & !(%s)" % " | ".join(higher)
+            yield "  enabled-%s := %s;" % (names[transition], rhs)
+        stable = self.inputs + timeouts + self.locals + \
+                ["mayoccur-" + names[t] for t in self.transitions]
+        yield "  stable := !(%s);" % (" | ".join(stable) or "FALSE")
+        yield ""
+        yield "ASSIGN"
+        for state in or_states:
+            if state.start_state is not None:
+                yield "  init(%s) := %s;" % (self.get_variable(state),
+                        state.start_state.label.lower())
+        for event in events:
+            yield "  init(%s) := FALSE;" % event
+        if self.init:
+            for (name, value) in self.get_updates(self.sc.init):
+                yield "  init(%s) := %s;" % (name, value)
+        for transition in self.transitions:
+            yield "  init(%s) := FALSE;" % names[transition]
+        # configurations
+        cases = dict((state, []) for state in or_states)
+        for transition in self.transitions:
+            for state in self.get_entered(transition):
+                cases[state.parent].append(("next(%s)" % names[transition], state.label.lower()))
+        for state in or_states:
+            variable = self.get_variable(state)
+            for line in self._cases("next(%s)" % variable, cases[state], variable):
+                yield line
+        # events
+        for event in self.inputs + timeouts:
+            yield "  next(%s) := stable ? {TRUE, FALSE} : FALSE;" % event
+        for event in self.locals + self.outputs:
+            producers = ["next(%s)" % names[t] for t in self.transitions if event in t.outputs]
+            yield "  next(%s) := %s;" % (event, " | ".join(producers) or "FALSE")
+        # variables
+        updates = dict((name, []) for name in self.variables)
+        for transition in self.transitions:
+            for (name, value) in self.get_updates(transition):
+                updates[name].append(("next(%s)" % names[transition], value))
+        for name in self.variables:
+            for line in self._cases("next(%s)" % name, updates[name], name):
+                yield line
+        # transitions
+        for transition in self.transitions:
+            name = names[transition]
+            choice = "{TRUE, FALSE}" if transition in self.competing else "TRUE"
+            yield "  next(%s) := enabled-%s ? %s : FALSE;" % (name, name, choice)
+        if self.competing:
+            yield ""
+            yield "TRANS"
+            yield " -- constrain competing transitions to choose 1 transition to fire"
+            constraints = []
+            for (t1, t2) in self.sc.conflicts.nondeterministic:
+                (n1, n2) = (names[t1], names[t2])
+                constraints.append(" ((enabled-%s & enabled-%s) -> count(next(%s), next(%s)) = 1)"
+                        % (n1, n2, n1, n2))
+            yield " &\n".join(constraints)
+
     def to_string(self):
-        pass
+        return "\n".join(self.iter_lines()) + "\n"
+
+    def write(self, fp):
+        """Writes the model to a file object, a line at a time.
+        """
+        for line in self.iter_lines():
+            fp.write(line + "\n")
+
+    def write_file(self, path):
+        """Writes the model to path, replacing any existing file only once
+        the model is complete.
+        """
+        with open(path + ".tmp", 'w') as fp:
+            self.write(fp)
+        os.rename(path + ".tmp", path)
+        log.info("Wrote %s (fragment cache hits=%d misses=%d)", path,
+                self.cache.hits, self.cache.misses)
@@ -0,0 +1,254 @@
+"""Scheduling test sequences to minimize SUT resets.
+
+Resetting a SUT often takes far longer than a step, and generated test
+sequences often share long prefixes. A PrefixTrie merges the input steps
+of sequences so that TrieExecution runs each shared prefix just once,
+depth first. At a branch it returns to the branch point either by
+restoring a checkpoint of the SUT (see Adapter.checkpoint) and a saved
+simulator configuration, or, if the adapter has no checkpoints, by
+resetting and replaying the prefix:
+
+  >>> trie = PrefixTrie(sequences)
+  >>> trie.get_cost(checkpoints=False)
+  (12, 85)
+  >>> execution = TrieExecution(sim, sim.get_configuration(), adapter)
+  >>> results = execution.run(trie.root)
+
+Executor(schedule=True) executes sequences this way.
+"""
+
+from array import array
+import time
+
+from executor import ModelError, SequenceResult, _get_steps, describe_error, simulate_step
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class ScheduleError(Exception):
+    pass
+
+
+class ReplayDivergence(ScheduleError):
+    """Replaying a prefix already executed gave other outputs, e.g. as
+    the SUT is not deterministic.
+
+    :param divergence: (step, inputs, expected, observed) of the step
+    """
+
+    def __init__(self, message, divergence):
+        ScheduleError.__init__(self, message)
+        self.divergence = divergence
+
+
+class TrieNode(object):
+    """A step of the sequences in a PrefixTrie.
+
+    :param inputs: sorted tuple of the input events of the step
+    """
+
+    def __init__(self, inputs=None, parent=None):
+        self.inputs = inputs
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.children = []
+        # inputs -> child
+        self.child_inputs = dict()
+        # numbers of the sequences ending with this step
+        self.sequences = []
+
+    def add_child(self, inputs):
+        child = self.child_inputs.get(inputs)
+        if child is None:
+            child = self.child_inputs[inputs] = TrieNode(inputs, self)
+            self.children.append(child)
+        return child
+
+    def iter_nodes(self):
+        """Yields the nodes of the subtree in depth first order.
+        """
+        todo = [self]
+        while todo:
+            node = todo.pop()
+            yield node
+            todo.extend(reversed(node.children))
+
+    def get_path(self):
+        """Returns the nodes from the root (excluded) to this node.
+        """
+        path = []
+        node = self
+        while node.parent is not None:
+            path.append(node)
+            node = node.parent
+        path.reverse()
+        return path
+
+    def __repr__(self):
+        return "<%s %r depth=%d>" % (self.__class__.__name__, self.inputs, self.depth)
+
+
+class PrefixTrie(object):
+    """Trie of the input steps of test sequences.
+
+    :param sequences: TestSequences (or lists of (inputs, outputs) steps),
+                      or (number, steps) items if numbered is True
+    """
+
+    def __init__(self, sequences, numbered=False):
+        self.root = TrieNode()
+        self.count = 0
+        items = sequences if numbered else enumerate(sequences)
+        for (number, sequence) in items:
+            node = self.root
+            for step in _get_steps(sequence):
+                node = node.add_child(tuple(sorted(set(step[0]))))
+            node.sequences.append(number)
+            self.count += 1
+
+    def __len__(self):
+        """Returns the number of steps in the trie.
+        """
+        return sum(1 for _ in self.root.iter_nodes()) - 1
+
+    def get_cost(self, checkpoints=True):
+        """Returns (resets, replayed steps) of executing the trie.
+        """
+        if checkpoints:
+            return (1, 0)
+        (resets, replayed) = (1, 0)
+        for node in self.root.iter_nodes():
+            if len(node.children) > 1:
+                resets += len(node.children) - 1
+                replayed += node.depth * (len(node.children) - 1)
+        return (resets, replayed)
+
+
+class TrieExecution(object):
+    """Depth first execution of the sequences of a PrefixTrie, checking
+    the outputs after each step against the simulator.
+
+    :param sim: simulator of the model
+    :param initial: initial configuration of the simulator
+    """
+
+    def __init__(self, sim, initial, adapter):
+        self.sim = sim
+        self.initial = initial
+        self.adapter = adapter
+        self.results = []
+        # latencies of the steps since the last result
+        self.latencies = array('d')
+        self.resets = 0
+        self.replayed = 0
+        self.restores = 0
+        # False once the adapter has returned no checkpoint
+        self.checkpoints = True
+        # branch node -> (SUT checkpoint, simulator configuration)
+        self.saved = dict()
+        # node the SUT and simulator are at, None if not known
+        self.position = None
+
+    def _reset(self):
+        self.sim.set_configuration(self.initial)
+        self.adapter.reset()
+        self.resets += 1
+        self.position = None
+
+    def _step(self, node):
+        """Executes the step of node, returning None or the divergence.
+        """
+        (sim, adapter) = (self.sim, self.adapter)
+        simulate_step(sim, node.inputs)
+        start = time.time()
+        adapter.send(node.inputs)
+        observed = set(adapter.read_outputs())
+        self.latencies.append(time.time() - start)
+        if observed != sim.outputs:
+            return (node.depth - 1, node.inputs, sorted(sim.outputs), sorted(observed))
+        return None
+
+    def _move_to(self, target):
+        """Brings the SUT and simulator to target, a node already executed.
+        """
+        if self.position is target:
+            return
+        saved = self.saved.get(target)
+        if saved is not None:
+            self.adapter.restore(saved[0])
+            self.sim.set_configuration(saved[1])
+            self.restores += 1
+        else:
+            self._reset()
+            for node in target.get_path():
+                divergence = self._step(node)
+                self.replayed += 1
+                if divergence is not None:
+                    raise ReplayDivergence("Replay diverged at step %d inputs %r: "
+                            "expected %r, observed %r" % divergence, divergence)
+        self.position = target
+
+    def _save(self, node):
+        token = self.adapter.checkpoint()
+        if token is None:
+            log.info("Adapter has no checkpoints, replaying prefixes")
+            self.checkpoints = False
+        else:
+            self.saved[node] = (token, self.sim.get_configuration())
+
+    def _add_results(self, node, steps, divergence=None, error=None):
+        """Adds results for the sequences ending in the subtree of node.
+        """
+        for subnode in node.iter_nodes():
+            for number in subnode.sequences:
+                self.results.append(SequenceResult(number, steps, self.latencies,
+                        divergence=divergence, error=error))
+                self.latencies = array('d')
+
+    def run(self, root):
+        """Executes the sequences of the subtree of root (usually the root
+        of a trie), returning their SequenceResults.
+        """
+        if root.parent is None:
+            self._reset()
+            self.position = root
+            for number in root.sequences:
+                self.results.append(SequenceResult(number, 0, array('d')))
+        todo = [root]
+        while todo:
+            node = todo.pop()
+            if node.parent is not None:
+                parent = node.parent
+                try:
+                    self._move_to(parent)
+                    if node is parent.children[-1]:
+                        self.saved.pop(parent, None)
+                    divergence = self._step(node)
+                except ReplayDivergence as e:
+                    log.warn("Failed reaching %r: %s", node, e)
+                    self._add_results(node, e.divergence[0] + 1, divergence=e.divergence)
+                    self.position = None
+                    continue
+                except Exception as e:
+                    if isinstance(e, ModelError):
+                        log.error("Model failed executing %r: %s", node, e)
+                    else:
+                        log.exception("Adapter failed executing %r", node)
+                    self._add_results(node, node.depth, error=describe_error(e))
+                    self.position = None
+                    continue
+                if divergence is not None:
+                    self._add_results(node, node.depth, divergence=divergence)
+                    self.position = None
+                    continue
+                self.position = node
+                for number in node.sequences:
+                    self.results.append(SequenceResult(number, node.depth, self.latencies))
+                    self.latencies = array('d')
+            if len(node.children) > 1 and self.checkpoints:
+                self._save(node)
+            todo.extend(reversed(node.children))
+        log.info("Executed %d sequences with %d resets, %d restores and %d replayed steps",
+                len(self.results), self.resets, self.restores, self.replayed)
+        return self.results
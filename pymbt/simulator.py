@@ -104,10 +104,31 @@
      [Transition('power-off / light-off', State('OFF')),
 """
 
+import heapq
+import random
+
+from flat import get_flat_table
+
 import logging
 log = logging.getLogger(__name__)
 
 
+class NonDeterminismError(Exception):
+    pass
+
+
+class LivelockError(Exception):
+    """Raised when a big step never ends.
+
+    :param cycle: transitions fired by the small steps of the cycle, or by
+                  the last small steps if the step ran out of its budget
+    """
+
+    def __init__(self, message, cycle):
+        Exception.__init__(self, message)
+        self.cycle = cycle
+
+
 class StateConfiguration(object):
     """Represents the current configuration of a statechart
     and the logic for transitioning between configurations.
@@ -116,6 +137,9 @@ class StateConfiguration(object):
     for history connectors.
     """
     def __init__(self, sc):
+        self.sc = sc
+        # states activated since last cleared, e.g. to arm their timers
+        self.entered = []
         # maps OR-state -> current_states
         self.active_states = dict()
         # cache of AND-state -> orthogonal_states
@@ -149,6 +173,10 @@ class StateConfiguration(object):
         """Returns all sub states including the state itself down to
         OR-states.
         """
+        # precomputed by pymbt.frozen.freeze
+        orthogonal = getattr(and_state, 'orthogonal', None)
+        if orthogonal is not None:
+            return orthogonal
         if and_state not in self.and_states:
             states = and_state.get_orthogonal_states()
             states.insert(0, and_state)
@@ -166,13 +194,29 @@ class StateConfiguration(object):
             states = [state]
         # record the active state[s]
         self.active_states[state.parent] = states
+        self.entered.extend(states)
         for state in states:
+            if state.pending:
+                self.sc.load_state(state)
             if not state.is_or():
                 continue
             # Note: state will often already be active when executing transition
             if state not in self.active_states:
                 self._activate(state.start_state)
 
+    def set_active_states(self, states):
+        """Sets the active states, e.g. as returned by get_active_states().
+        """
+        self.active_states = dict()
+        for state in states:
+            if state.pending:
+                self.sc.load_state(state)
+            if state.parent.is_or():
+                if state.is_and():
+                    self.active_states[state.parent] = self._get_orthogonal_states(state)
+                else:
+                    self.active_states[state.parent] = [state]
+
     def transition(self, transition):
         """Executes the given state transition.
 
@@ -241,19 +285,56 @@ class EventSet(frozenset):
 
 class Simulator(object):
     """Simulator for statecharts.
+
+    :param flatten: if True step with the flattened transition table of
+                    the statechart when it can be flattened, built on the
+                    first big step that can use it (see pymbt.flat)
     """
 
-    def __init__(self, statechart):
+    # if True, pick the first of non-deterministic transitions rather
+    # than raising NonDeterminismError
+    allow_nondeterminism = False
+
+    # maximum number of small steps in a big step before raising
+    # LivelockError (None for no limit)
+    max_microsteps = 10000
+
+    def __init__(self, statechart, seed=None, flatten=True):
+        if statechart.conflicts is None:
+            statechart.compile()
         self.sc = statechart
+        self.random = random.Random(seed)
         self.states = StateConfiguration(statechart)
         self.variables = dict()
         self.enabled_inputs = set()
         self.outputs = set()
         self.locals = set()
-        # list of (inputs,basic_states,variables,locals/outputs)
-        self.trace = []
+        # optional recorder of each step, e.g. pymbt.trace.TraceWriter
+        self.recorder = None
+        # optional pymbt.coverage.Coverage (see enable_coverage)
+        self.coverage = None
+        # optional pymbt.monitor.MonitorSet (see enable_monitors)
+        self.monitors = None
+        # transitions fired in the current big step
+        self.fired = []
         self.log = log
         self.initialise()
+        # whether to use the flattened transition table (see flat), and
+        # the id of the current configuration in it while stepping with it
+        self.flatten = flatten
+        self.flat_id = None
+        # virtual time in seconds, and timers of timeout transitions: a
+        # heap of (deadline, timer number, transition) and a dict of
+        # transition -> number of its armed timer, other timers in the
+        # heap having been cancelled. Timers are keyed by transition, as
+        # loading a lazily loaded chart may renumber transitions.
+        self.clock = 0.0
+        self.timers = []
+        self.armed = dict()
+        self.timer_count = 0
+        # timeout transitions whose timers expired
+        self.expired = set()
+        self._update_timers()
 
     def initialise(self):
         """Initialises the simulator.
@@ -262,10 +343,118 @@ class Simulator(object):
         """
         self.sc.init.exec_action(self.variables)
 
+    def enable_coverage(self, coverage=None):
+        """Starts collecting coverage, returning the Coverage.
+
+        :param coverage: Coverage to add to (default: a new Coverage)
+        """
+        if coverage is None:
+            from coverage import Coverage
+            coverage = Coverage(self.sc)
+        coverage.reset_run()
+        coverage.record_states(self.active_states)
+        self.coverage = coverage
+        return coverage
+
+    def enable_monitors(self, monitors):
+        """Starts updating monitors of properties after each big step,
+        returning the (reset) pymbt.monitor.MonitorSet.
+        """
+        monitors.reset()
+        self.monitors = monitors
+        return monitors
+
+    def get_configuration(self):
+        """Returns the current configuration as a hashable tuple of
+        (active state indexes, variable items), both sorted.
+        """
+        if self.flat_id is not None:
+            return self.flat.configurations[self.flat_id]
+        states = tuple(sorted(st.index for st in self.active_states))
+        return (states, tuple(sorted(self.variables.iteritems())))
+
+    def set_configuration(self, configuration):
+        """Restores a configuration returned by get_configuration(),
+        clearing any events.
+        """
+        (states, variables) = configuration
+        all_states = self.sc.all_states
+        self.states.set_active_states([all_states[index] for index in states])
+        self.variables = dict(variables)
+        self.enabled_inputs = set()
+        self.outputs = set()
+        self.locals = set()
+        self.fired = []
+        self.flat_id = None
+        # restart the timers of the active states
+        self.timers = []
+        self.armed = dict()
+        self.expired = set()
+        self.states.entered = self.active_states
+        self._update_timers()
+
+    def get_checkpoint(self, directory=None):
+        """Returns the simulator state as a picklable dict (see
+        pymbt.checkpoint), transitions of timers given by their indexes.
+        """
+        # first, as it loads any pending transitions, renumbering them
+        fingerprint = self.sc.get_fingerprint()
+        return dict(
+                fingerprint=fingerprint,
+                configuration=self.get_configuration(),
+                enabled_inputs=self.enabled_inputs,
+                outputs=self.outputs,
+                locals=self.locals,
+                random=self.random.getstate(),
+                coverage=self.coverage,
+                clock=self.clock,
+                timers=[(deadline, number, transition.index)
+                    for (deadline, number, transition) in self.timers],
+                armed=dict((transition.index, number)
+                    for (transition, number) in self.armed.iteritems()),
+                timer_count=self.timer_count,
+                expired=[transition.index for transition in self.expired],
+                monitors=self.monitors.get_checkpoint() if self.monitors else None)
+
+    def set_checkpoint(self, state, directory=None):
+        """Restores the simulator state from get_checkpoint(), including
+        that of the monitors if enabled (with the same properties).
+        """
+        self.set_configuration(state['configuration'])
+        self.enabled_inputs = set(state['enabled_inputs'])
+        self.outputs = set(state['outputs'])
+        self.locals = set(state['locals'])
+        self.random.setstate(state['random'])
+        self.coverage = state['coverage']
+        self.sc.load_all()
+        all_transitions = self.sc.all_transitions
+        self.clock = state['clock']
+        self.timers = [(deadline, number, all_transitions[index])
+                for (deadline, number, index) in state['timers']]
+        self.armed = dict((all_transitions[index], number)
+                for (index, number) in state['armed'].iteritems())
+        self.timer_count = state['timer_count']
+        self.expired = set(all_transitions[index] for index in state['expired'])
+        if self.monitors is not None and state['monitors'] is not None:
+            self.monitors.set_checkpoint(state['monitors'])
+
+    def random_step(self):
+        """Fires a randomly chosen expected input, returning its event or
+        None if no input is expected.
+        """
+        events = sorted(set(self.inputs.iterevents()))
+        if not events:
+            return None
+        event = self.random.choice(events)
+        self.enabled_inputs.add(event)
+        self.next()
+        return event
+
     def is_stable(self):
-        """A statechart is stable when there are no inputs or enabled transitions.
+        """A statechart is stable when there are no inputs, expired timers or
+        enabled transitions.
         """
-        return not(self.enabled_inputs or self.enabled_transitions)
+        return not(self.enabled_inputs or self.expired or self.enabled_transitions)
 
     @property
     def active_states(self):
@@ -293,36 +482,41 @@ class Simulator(object):
         """
         inputs = []
         for transition in self.transitions:
-            if transition.event and not self._is_local(transition.event):
+            if transition.event and transition.timeout is None \
+                    and not self._is_local(transition.event):
                 inputs.append(Input(transition.event, self))
         return EventSet(inputs)
 
+    def get_triggered_transitions(self):
+        """Returns transitions from the active states whose event, if any,
+        is present, regardless of their guards.
+        """
+        transitions = []
+        for state in self.active_states:
+            for transition in state.transitions:
+                if transition.timeout is not None:
+                    if transition not in self.expired:
+                        continue
+                elif transition.event and not (
+                        transition.event in self.enabled_inputs or
+                        transition.event in self.locals):
+                    continue
+                transitions.append(transition)
+        return transitions
+
     def get_enabled_transitions_by_scope(self):
         """Calculates the possible transitions that by scope that
         are not overridden by high priority transitions.
 
+        Priorities are resolved using the statechart's precomputed
+        conflict table (see pymbt.conflicts).
+
         Note: transition.scope = lowest OR-state containing source
               and destination states
         """
-        scopes = dict()
-        # for all possible transitions...
-        for transition in self.transitions:
-            if transition.event and not (
-                    transition.event in self.enabled_inputs or
-                    transition.event in self.locals):
-                continue
-            my_scope = transition.scope
-            for scope in scopes:
-                if scope.is_ancestor(my_scope, strict=True):
-                    # transition lower priority so ignore
-                    break
-                elif scope.is_descendant(my_scope, strict=True):
-                    # transition higher priority
-                    scopes.pop(scope)
-            else:
-                transitions = scopes.setdefault(my_scope, [])
-                transitions.append(transition)
-        return scopes
+        transitions = [t for t in self.get_triggered_transitions()
+                if t.may_occur(self.variables)]
+        return self.sc.conflicts.resolve(transitions)
 
     @property
     def enabled_transitions(self):
@@ -366,34 +560,181 @@ class Simulator(object):
         """Performs a small step of the statechart.
         """
         self.log.info("Stepping %r", self)
+        if self.flat_id is not None:
+            # the active states dict is shared with the flat table
+            self.states.active_states = dict(self.states.active_states)
+            self.flat_id = None
         # get enabled transitions before reseting inputs
-        scope_transitions = self.get_enabled_transitions_by_scope()
+        triggered = self.get_triggered_transitions()
+        enabled = [t for t in triggered if t.may_occur(self.variables)]
+        scope_transitions = self.sc.conflicts.resolve(enabled)
+        inputs = self.enabled_inputs
+        if self.coverage is not None and inputs:
+            self.coverage.record_inputs(inputs)
 
         # reset inputs/outputs at the start of a big step
-        if self.enabled_inputs:
+        if self.enabled_inputs or self.expired:
             self.log.info("Reseting inputs and outputs at start of big step...")
             self.enabled_inputs = set()
+            self.expired = set()
             self.outputs = set()
+            self.fired = []
         self.locals = set()
 
         # execute transitions
         # - note that each scope is non-overlapping by definition
         updates = dict()
+        fired = []
         for scope, transitions in scope_transitions.items():
             if len(transitions) > 1:  # non-determinism
-                pass
+                if not self.allow_nondeterminism:
+                    raise NonDeterminismError(
+                            "Non-deterministic transitions %r in scope %r" % (transitions, scope))
+                self.log.warn("Non-deterministic transitions %r, choosing first", transitions)
             transition = transitions[0]
             self._execute_transition(transition, updates)
+            fired.append(transition)
+        self.fired.extend(fired)
 
         # update variables
         self.variables.update(updates)
         self.log.info("Variables now %r", self.variables)
+        if self.states.entered:
+            self._update_timers()
+
+        if self.coverage is not None:
+            self.coverage.record_step(triggered, enabled, fired, self.active_states)
+        if self.recorder is not None:
+            self.recorder.record(inputs, self.states.get_active_states(only_basic=True),
+                    self.locals, self.outputs, self.variables)
+
+    def _update_timers(self):
+        """Arms the timers of timeout transitions from states entered since
+        the last update and cancels those of states exited.
+        """
+        entered = self.states.entered
+        self.states.entered = []
+        for state in entered:
+            for transition in state.transitions:
+                if transition.timeout is not None:
+                    self.timer_count += 1
+                    self.armed[transition] = self.timer_count
+                    heapq.heappush(self.timers, (self.clock + transition.timeout,
+                            self.timer_count, transition))
+        if self.armed:
+            active = set(self.active_states)
+            for transition in [t for t in self.armed if t.source not in active]:
+                del self.armed[transition]
+
+    def get_next_deadline(self):
+        """Returns the virtual time the next armed timer expires, or None.
+        """
+        timers = self.timers
+        # discard cancelled timers
+        while timers and self.armed.get(timers[0][2]) != timers[0][1]:
+            heapq.heappop(timers)
+        return timers[0][0] if timers else None
+
+    def advance(self, seconds=None):
+        """Advances the virtual clock by the given seconds, performing a big
+        step for the timers expiring in the meantime in order of their
+        deadlines, or if seconds is None to the next deadline. Returns the
+        number of timers expired.
+
+        Timers expiring at the same time expire in the same big step.
+        """
+        target = None if seconds is None else self.clock + seconds
+        count = 0
+        while True:
+            deadline = self.get_next_deadline()
+            if deadline is None or (target is not None and deadline > target):
+                break
+            self.clock = deadline
+            while self.get_next_deadline() == deadline:
+                (_, number, transition) = heapq.heappop(self.timers)
+                del self.armed[transition]
+                self.expired.add(transition)
+                count += 1
+            self.log.info("Timers of %r expired at %ss", list(self.expired), deadline)
+            self.next()
+            if target is None:
+                break
+        if target is not None:
+            self.clock = target
+        return count
+
+    @property
+    def flat(self):
+        """Returns the flattened transition table of the statechart,
+        building it on first use, or None if not flattening.
+        """
+        return get_flat_table(self.sc) if self.flatten else None
+
+    def _flat_next(self):
+        """Performs a big step for a single input by a flat table lookup,
+        returning False if the table cannot be used.
+        """
+        if (len(self.enabled_inputs) != 1 or self.coverage is not None
+                or self.recorder is not None):
+            return False
+        flat = self.flat
+        if flat is None:
+            return False
+        id = self.flat_id
+        if id is None:
+            # leftover local events may make the configuration unstable
+            if self.locals:
+                return False
+            id = flat.ids.get(self.get_configuration())
+            if id is None:
+                return False
+        (event,) = self.enabled_inputs
+        entry = flat.lookup(id, event)
+        if entry is None:
+            return False
+        (self.flat_id, (outputs, locals, fired)) = entry
+        self.states.active_states = flat.active_states[self.flat_id]
+        self.enabled_inputs = set()
+        self.outputs = set(outputs)
+        self.locals = set(locals)
+        self.fired = list(fired)
+        return True
 
     def next(self):
         """Performs a big step of the statechart.
+
+        Raises LivelockError if the big step would never end: if a small
+        step returns to the configuration and local events of an earlier
+        one, so repeating the same cycle of small steps forever, or if it
+        takes more than max_microsteps small steps.
         """
+        (inputs, expired) = (self.enabled_inputs, self.expired)
+        self.fired = []
+        if not self.flatten or not self._flat_next():
+            self._step_until_stable()
+        if self.monitors is not None:
+            self.monitors.update(self, inputs, expired)
+
+    def _step_until_stable(self):
+        # (configuration, locals) -> number of small steps taken to reach it
+        seen = dict()
+        # number of transitions fired by the big step after each small step
+        counts = []
         while not self.is_stable():
             self.step()
+            counts.append(len(self.fired))
+            if self.max_microsteps is not None and len(counts) > self.max_microsteps:
+                cycle = self.fired[counts[-11] if len(counts) > 10 else 0:]
+                raise LivelockError("Big step exceeded %d small steps, last firing %r" % (
+                        self.max_microsteps, cycle), cycle)
+            try:
+                key = (self.get_configuration(), frozenset(self.locals))
+                previous = seen.setdefault(key, len(counts))
+            except TypeError:  # unhashable variable values
+                continue
+            if previous != len(counts):
+                cycle = self.fired[counts[previous - 1]:]
+                raise LivelockError("Big step cycles forever firing %r" % (cycle,), cycle)
 
     def back(self, steps=1):
         """Backtracks the given number of big steps.
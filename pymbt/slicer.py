@@ -0,0 +1,177 @@
+"""Cone-of-influence slicing of statecharts.
+
+Given target states, output events and/or variables, the slicer computes
+the transitions, variables and events that may influence them and builds
+a reduced statechart containing only those, so exploration, translation
+and test generation can work on a smaller model.
+
+A transition is relevant when it:
+ * may change whether a relevant state is active, i.e. its scope is a
+   strict ancestor of the state
+ * produces a relevant event
+ * assigns a relevant variable
+
+and a relevant transition makes its source state, its triggering event
+and the variables read by its guard (and by its relevant assignments)
+relevant in turn. Local events (see make_statechart) pull in the
+transitions producing them.
+
+  >>> sliced = slice_statechart(sc, outputs=['start'])
+  >>> print sliced.to_string()
+"""
+
+import ast
+
+from statechart import State, StateChart, AndState, StateError
+from transition import Transition, get_names
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class ConeOfInfluence(object):
+    """The states, transitions, events and variables that may influence
+    a set of target states, events and variables of a statechart.
+    """
+
+    def __init__(self, sc, states=(), outputs=(), variables=()):
+        sc.load_all()
+        self.sc = sc
+        self.states = set(self._get_state(st) for st in states)
+        self.events = set(outputs)
+        self.variables = set(variables)
+        self.transitions = set()
+        self._compute()
+
+    def _get_state(self, state):
+        if not isinstance(state, basestring):
+            return state
+        states = [st for st in self.sc.all_states if st.label == state]
+        if len(states) != 1:
+            raise StateError("Expected one state labelled %r, found %r" % (state, states))
+        return states[0]
+
+    def _is_relevant(self, transition):
+        if self.events.intersection(transition.outputs):
+            return True
+        if self.variables.intersection(transition.get_written_variables()):
+            return True
+        scope = transition.scope
+        for state in self.states:
+            if scope.is_ancestor(state, strict=True):
+                return True
+        return False
+
+    def _compute(self):
+        inits = [st.init for st in self.sc.all_states if st.is_or() and st.init is not None]
+        size = None
+        while size != self._get_size():
+            size = self._get_size()
+            for transition in self.sc.all_transitions:
+                if transition in self.transitions or not self._is_relevant(transition):
+                    continue
+                self.transitions.add(transition)
+                self.states.add(transition.source)
+                if transition.event:
+                    self.events.add(transition.event)
+                if transition.guard_ast is not None:
+                    self.variables.update(get_names(transition.guard_ast))
+            # assignments read variables once the variable they assign is
+            # relevant, which may be after their transition became relevant
+            for transition in inits + list(self.transitions):
+                for (name, value) in self.get_assignments(transition):
+                    self.variables.update(get_names(value))
+        log.info("Cone of influence has %d/%d transitions, variables %r",
+                len(self.transitions), len(self.sc.all_transitions), sorted(self.variables))
+
+    def _get_size(self):
+        return (len(self.transitions), len(self.variables))
+
+    def get_assignments(self, transition):
+        """Returns the assignments of the transition to relevant variables.
+        """
+        return [(name, value) for (name, value) in transition.get_assignments()
+                if name in self.variables]
+
+    def get_needed_states(self):
+        """Returns the states that must be kept in the sliced statechart.
+        """
+        needed = set([self.sc])
+        for state in self.states:
+            needed.update(state.ancestors())
+        for transition in self.transitions:
+            needed.update(transition.destination.ancestors())
+        return needed
+
+
+def _slice_action(action_s, variables):
+    """Returns the statements of action_s assigning the given variables.
+    """
+    if not action_s:
+        return None
+    stmts = []
+    for stmt in action_s.split(";"):
+        stmt = stmt.strip()
+        if not stmt:
+            continue
+        names = get_names(ast.parse(stmt, "<string>", mode="exec"), ast.Store)
+        if names.intersection(variables):
+            stmts.append(stmt)
+    return "; ".join(stmts) or None
+
+
+def _slice_transition(transition, cone):
+    return Transition(transition.event,
+            guard=transition.guard_s,
+            outputs=[e for e in transition.outputs if e in cone.events],
+            action=_slice_action(transition.action_s, cone.variables),
+            name=transition.name)
+
+
+def slice_statechart(sc, states=(), outputs=(), variables=()):
+    """Returns a new statechart reduced to the cone of influence of the
+    given states (or state labels), output events and variables.
+
+    Composite states without relevant content are reduced to basic states
+    and irrelevant regions of AND-states are removed.
+    """
+    cone = ConeOfInfluence(sc, states=states, outputs=outputs, variables=variables)
+    needed = cone.get_needed_states()
+    # old state -> new state
+    copies = dict()
+
+    def copy_state(state):
+        if state not in needed or not state.states:
+            new_state = State(state.label)
+        elif state.is_or():
+            new_state = StateChart(state.label)
+            for child in state.states:
+                new_state.add_state(copy_state(child))
+            new_state.set_start_state(copies[state.start_state])
+            if state.init is not None:
+                new_state.init = _slice_transition(state.init, cone)
+        else:
+            regions = [child for child in state.states if child in needed]
+            new_state = AndState(state.label) if regions else State(state.label)
+            for child in regions:
+                new_state.add_state(copy_state(child))
+        new_state.id = state.id
+        copies[state] = new_state
+        return new_state
+
+    root = copy_state(sc)
+    inputs = set()
+    outputs = set()
+    for transition in sc.all_transitions:
+        if transition not in cone.transitions:
+            continue
+        destination = transition.destination
+        while destination not in copies:
+            destination = destination.parent
+        new_transition = _slice_transition(transition, cone)
+        copies[transition.source].add_transition(new_transition, copies[destination])
+        inputs.add(new_transition.event)
+        outputs.update(new_transition.outputs)
+    root.locals = inputs.intersection(outputs)
+    root.compile()
+    return root
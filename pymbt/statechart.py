@@ -54,8 +54,11 @@ Using statecharts:
 
 """
 
+import hashlib
+
 from yed_graphml import read_file
-from transition import make_transition
+from transition import Transition, parse_label
+from conflicts import ConflictTable
 
 import logging
 log = logging.getLogger(__name__)
@@ -71,9 +74,30 @@ class State(object):
     def __init__(self, label):
         self.label = label
         self.id = None
+        self.index = None
         self.parent = None
         self.states = []
         self.transitions = []
+        # [(source, transition arguments, destination)] of the child
+        # states, not yet created (see make_statechart lazy)
+        self.pending = None
+
+    def __getstate__(self):
+        # the transitions of the whole tree are pickled in a list by the
+        # root state, as following transitions from state to state would
+        # make the pickle recursion as deep as the number of states
+        state = self.__dict__.copy()
+        del state['transitions']
+        if self.parent is None:
+            state['_transitions'] = [t for st in self.iter_states() for t in st.transitions]
+        return state
+
+    def __setstate__(self, state):
+        transitions = state.pop('_transitions', [])
+        self.__dict__.update(state)
+        self.transitions = []
+        for transition in transitions:
+            transition.source.transitions.append(transition)
 
     def add_state(self, state):
         """Adds a child state to this state.
@@ -135,6 +159,15 @@ class State(object):
         """
         return other_state.is_descendant(self, strict=strict)
 
+    def iter_states(self):
+        """Returns an iterator of this state and all its descendants in
+        preorder.
+        """
+        yield self
+        for state in self.states:
+            for st in state.iter_states():
+                yield st
+
     def is_basic(self):
         return not (self.is_or() or self.is_and())
 
@@ -179,6 +212,16 @@ class StateChart(State):
         self.init = None
         self.start_state = None
         self.locals = None  # local variables
+        # indexed states/transitions (see make_index)
+        self.all_states = None
+        self.all_transitions = None
+        # conflict/priority tables (see compile)
+        self.conflicts = None
+        # True if load_state indexed transitions out of preorder
+        self.reindex = False
+        # flattened transition table, or False if the statechart cannot be
+        # flattened (see pymbt.flat.get_flat_table)
+        self.flat = None
 
     def set_start_state(self, state):
         """Sets the start start.
@@ -186,13 +229,108 @@ class StateChart(State):
         assert state in self.states, "%r is a child state of %r" % (state, self)
         self.start_state = state
 
+    def _create_pending(self, state):
+        """Creates the pending transitions of the children of state,
+        returning them.
+        """
+        (pending, state.pending) = (state.pending, None)
+        transitions = []
+        for (source, args, destination) in pending:
+            try:
+                transition = Transition(**args)
+            except Exception as e:
+                raise StateError("Failed to parse transition %r -> %r (%r): %s" % (
+                        source, destination, args, e))
+            source.add_transition(transition, destination)
+            transitions.append(transition)
+        return transitions
+
+    def load_state(self, state):
+        """Creates the pending transitions of the children of state, a
+        composite state of this lazily loaded statechart, on its first
+        activation.
+
+        The new transitions are indexed after the existing ones and added
+        to the conflict table.
+        """
+        transitions = self._create_pending(state)
+        log.debug("Loaded %d transitions of %r", len(transitions), state)
+        if self.all_transitions is not None:
+            for transition in transitions:
+                transition.index = len(self.all_transitions)
+                self.all_transitions.append(transition)
+            self.reindex = True
+            if self.conflicts is not None:
+                self.conflicts.add(transitions)
+
+    def load_all(self):
+        """Creates any pending transitions of a lazily loaded statechart
+        and compiles it, so transitions are indexed as if loaded eagerly.
+
+        Used where the whole statechart is needed, e.g. for coverage.
+        """
+        loaded = self.reindex
+        for state in self.iter_states():
+            if state.pending:
+                self._create_pending(state)
+                loaded = True
+        if loaded or self.conflicts is None:
+            self.compile()
+
+    def make_index(self):
+        """Numbers all states and transitions in the statechart in preorder,
+        recording them as all_states and all_transitions.
+        """
+        self.all_states = list(self.iter_states())
+        self.all_transitions = []
+        for (index, state) in enumerate(self.all_states):
+            state.index = index
+            for transition in state.transitions:
+                transition.index = len(self.all_transitions)
+                self.all_transitions.append(transition)
+
+    def compile(self):
+        """Indexes the statechart and precomputes the transition conflict
+        and priority tables used by the simulator.
+        """
+        self.make_index()
+        self.conflicts = ConflictTable(self)
+        self.reindex = False
+        self.flat = None
+
+    def get_fingerprint(self):
+        """Returns a hex digest of the states, transitions and labels of
+        the statechart, identifying it in checkpoints and the like.
+        """
+        self.load_all()
+        digest = hashlib.md5()
+        for state in self.all_states:
+            parent = state.parent.index if state.parent else None
+            kind = 'or' if state.is_or() else 'and' if state.is_and() else 'basic'
+            digest.update(repr((kind, state.label, parent)))
+            if state.is_or():
+                init = state.init.get_label() if state.init else None
+                digest.update(repr((state.start_state.index, init)))
+            for transition in state.transitions:
+                digest.update(repr((transition.destination.index, transition.get_label())))
+        return digest.hexdigest()
+
     def validate(self):
-        """Validates the statechart.
+        """Validates the statechart, returning a list of problems found.
 
         Constraints to check:
-         * 
+         * transitions with the same scope must not be enabled together,
+           i.e. have overlapping events and guards that are not provably
+           disjoint (potential non-determinism)
         """
-        raise NotImplementedError
+        self.load_all()
+        problems = []
+        for (t1, t2) in self.conflicts.nondeterministic:
+            problems.append("Potential non-determinism between %r and %r in %r" % (
+                    t1, t2, t1.scope))
+        for problem in problems:
+            log.warn(problem)
+        return problems
 
 
 class AndState(State):
@@ -248,9 +386,13 @@ def tree_walk(g, preorder=False, postorder=False):
                 todo.extendleft(children)
 
 
-def make_statechart(g):
+def make_statechart(g, lazy=False):
     """Creates a statechart from networkx graph.
 
+    :param lazy: if True the transitions within composite states are
+                 only created, i.e. their labels parsed and compiled,
+                 when the state is first activated (see
+                 StateChart.load_state)
     """
     def get_label(node_id):
         return g.node[node_id]['label']
@@ -271,7 +413,10 @@ def make_statechart(g):
                 st = states[child_id]
                 if st.label.lower() == "start":
                     start = st
-                    # TODO: complain about start nodes without exactly one successor!
+                    if g.out_degree(child_id) != 1:
+                        # see pymbt.analysis.check_start_nodes
+                        log.warn("Start node of %r has %d successors", label,
+                                g.out_degree(child_id))
                 else:
                     children.append(st)
             if start:
@@ -300,28 +445,44 @@ def make_statechart(g):
         log.debug("handling graph edge %r -> %r (data=%r)", n1, n2, data)
         (src, dest) = (states[n1], states[n2])
         try:
-            transition = make_transition(data.get('label', ''))
+            args = parse_label(data.get('label', ''))
+            if lazy and src.parent is not root and src.label.lower() != "start":
+                src.parent.pending = src.parent.pending or []
+                src.parent.pending.append((src, args, dest))
+                transition = None
+            else:
+                transition = Transition(**args)
         except Exception as e:
             raise Exception("Failed to parse transition %r -> %r (data=%r): %s" % (src, dest, data, e))
+        # record inputs/outputs
+        if src.label.lower() != "start":
+            inputs.add(args['event'])
+            outputs.update(args['outputs'])
+        if transition is None:
+            continue
         if src.label.lower() == "start":
             src.parent.set_start_state(dest)
             src.parent.init = transition
         else:
-            # record inputs/outputs
-            inputs.add(transition.event)
-            outputs.update(transition.outputs)
             # add transition to src state
             src.add_transition(transition, dest)
 
     # local variables are intersection of inputs/outputs
     root.locals = inputs.intersection(outputs)
+    root.compile()
     return root
 
 
-def read_statechart(filename):
+def read_statechart(filename, lazy=False):
     graphs = read_file(filename)
     g = graphs[0]
-    return make_statechart(g)
+    return make_statechart(g, lazy=lazy)
+
+
+def read_statecharts(filename, lazy=False):
+    """Returns statecharts of all the graphs in a file.
+    """
+    return [make_statechart(g, lazy=lazy) for g in read_file(filename)]
 
 if __name__ == "__main__":
     sc = read_statechart("../examples/cvm.graphml")
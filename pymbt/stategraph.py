@@ -0,0 +1,411 @@
+"""Compact state graphs in compressed sparse row (CSR) arrays.
+
+A networkx graph of millions of explored configurations costs hundreds
+of bytes per edge in dicts. A CSRGraph keeps the edges of node n at
+positions offsets[n] to offsets[n + 1] of two arrays, their targets and
+the numbers of their labels in a table of the distinct edge labels (the
+inputs, outputs and indexes of the transitions fired), so an edge costs
+8 bytes. The graph algorithms test generation and checking need run
+over these arrays, without recursion:
+
+ * strongly_connected_components(), by Tarjan's algorithm
+ * deadlocks(), the nodes without successors
+ * ShortestPaths, breadth first from a node
+ * get_edge_cover(), paths from a node covering every reachable edge
+
+A GraphBuilder records the graph during exploration, and build() sorts
+its edges into a CSRGraph, which can be saved to a file and loaded by
+memory mapping it, the operating system paging the arrays in as used:
+
+  >>> explorer = Explorer(sc, graph=GraphBuilder())
+  >>> graph = explorer.explore().build()
+  >>> graph.save("cvm.graph")
+  >>> graph = load_graph("cvm.graph")
+  >>> [graph.get_steps(path) for path in graph.get_edge_cover()]
+  [[(('power_on',), frozenset(['light_on'])), ...], ...]
+
+The builder numbers the nodes of the explorer by their keys in its
+visited store (see get_node), so with a hash based store and
+GraphBuilder(configurations=False) no configurations are kept at all.
+"""
+
+from array import array
+from bisect import bisect_right
+from collections import deque
+import cPickle as pickle
+import ctypes
+from itertools import izip
+import mmap
+import struct
+import sys
+
+import logging
+log = logging.getLogger(__name__)
+
+# magic, number of nodes, number of edges, offset of the pickled tables
+HEADER = struct.Struct("<8sQQQ")
+MAGIC = "PYMBTCSR"
+
+
+class StateGraphError(Exception):
+    pass
+
+
+def _zeros(typecode, n):
+    return array(typecode, [0]) * n
+
+
+def _pack(values, code):
+    """Returns the values as little endian struct code items.
+    """
+    if sys.byteorder == 'little' and getattr(values, 'itemsize', None) == struct.calcsize(code):
+        return values.tostring()
+    return struct.pack("<%d%s" % (len(values), code), *values)
+
+
+class GraphBuilder(object):
+    """Records a graph edge by edge, with the methods of a networkx graph
+    used by pymbt.explorer.Explorer, to build() a CSRGraph.
+
+    :param configurations: if True keep the configuration of each node
+    """
+
+    def __init__(self, configurations=True):
+        self.sources = array('i')
+        self.targets = array('i')
+        self.labels = array('i')
+        # label -> number, and [label] (sorted (name, value) data items)
+        self.label_numbers = dict()
+        self.label_table = []
+        self.configurations = [] if configurations else None
+        self.count = 0
+        # key -> node of the nodes added by get_node
+        self.nodes = dict()
+
+    def add_node(self, node, configuration=None):
+        """Adds node, which must be the number of nodes added before.
+        """
+        if node != self.count:
+            raise StateGraphError("Expected node %d, got %r" % (self.count, node))
+        self.count += 1
+        if self.configurations is not None:
+            self.configurations.append(configuration)
+
+    def get_node(self, key, configuration=None):
+        """Returns the node identified by key, e.g. the key of a
+        configuration in a pymbt.visited store, adding it if new.
+        """
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = self.count
+            self.add_node(node, configuration)
+        return node
+
+    def add_edge(self, source, target, **data):
+        label = tuple(sorted(data.items()))
+        number = self.label_numbers.get(label)
+        if number is None:
+            number = self.label_numbers[label] = len(self.label_table)
+            self.label_table.append(label)
+        self.sources.append(source)
+        self.targets.append(target)
+        self.labels.append(number)
+
+    def __len__(self):
+        return self.count
+
+    def number_of_edges(self):
+        return len(self.sources)
+
+    def build(self):
+        """Returns the CSRGraph of the edges, those of each node in the
+        order they were added.
+        """
+        (n, m) = (self.count, len(self.sources))
+        offsets = _zeros('l', n + 1)
+        for source in self.sources:
+            offsets[source + 1] += 1
+        for node in xrange(n):
+            offsets[node + 1] += offsets[node]
+        # counting sort of the edges by source
+        position = offsets[:-1]
+        (targets, labels) = (_zeros('i', m), _zeros('i', m))
+        for (source, target, label) in izip(self.sources, self.targets, self.labels):
+            index = position[source]
+            position[source] = index + 1
+            targets[index] = target
+            labels[index] = label
+        return CSRGraph(offsets, targets, labels, list(self.label_table),
+                self.configurations)
+
+
+def from_networkx(graph):
+    """Returns the CSRGraph of a graph with nodes numbered from 0, such as
+    one recorded by pymbt.explorer.Explorer.
+    """
+    builder = GraphBuilder()
+    for node in xrange(len(graph)):
+        builder.add_node(node, graph.node[node].get('configuration'))
+    for (source, target, data) in graph.edges(data=True):
+        builder.add_edge(source, target, **data)
+    return builder.build()
+
+
+class CSRGraph(object):
+    """Directed graph of numbered nodes in CSR arrays.
+
+    Edges are numbered by their position in the arrays, those of each
+    node being contiguous.
+
+    :param offsets: the edges of node n are offsets[n] to offsets[n + 1]
+    :param label_table: list of the data items of each label
+    :param configurations: list of the configuration of each node
+    """
+
+    def __init__(self, offsets, targets, labels, label_table, configurations=None):
+        self.offsets = offsets
+        self.targets = targets
+        self.labels = labels
+        self.label_table = label_table
+        self.configurations = configurations
+        # memory map of a loaded graph, which the arrays refer to
+        self.mmap = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def number_of_edges(self):
+        return len(self.targets)
+
+    def out_degree(self, node):
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def out_edges(self, node):
+        return xrange(self.offsets[node], self.offsets[node + 1])
+
+    def successors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def get_source(self, edge):
+        return bisect_right(self.offsets, edge) - 1
+
+    def get_target(self, edge):
+        return self.targets[edge]
+
+    def get_edge_data(self, edge):
+        return dict(self.label_table[self.labels[edge]])
+
+    def get_configuration(self, node):
+        return self.configurations[node] if self.configurations is not None else None
+
+    def get_steps(self, path):
+        """Returns the [(inputs, outputs)] steps of a path of edges.
+        """
+        steps = []
+        for edge in path:
+            data = self.get_edge_data(edge)
+            steps.append((data.get('inputs'), data.get('outputs')))
+        return steps
+
+    def deadlocks(self):
+        """Returns the nodes without successors.
+        """
+        offsets = self.offsets
+        return [node for node in xrange(len(self)) if offsets[node] == offsets[node + 1]]
+
+    def strongly_connected_components(self):
+        """Returns (number of components, array of the component of each
+        node), components being numbered in reverse topological order.
+        """
+        (offsets, targets) = (self.offsets, self.targets)
+        n = len(self)
+        index = array('l', [-1]) * n
+        low = _zeros('l', n)
+        components = array('l', [-1]) * n
+        # next edge to follow from each node on the call stack
+        position = _zeros('l', n)
+        on_stack = bytearray(n)
+        (stack, count, counter) = ([], 0, 0)
+        for root in xrange(n):
+            if index[root] >= 0:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            position[root] = offsets[root]
+            calls = [root]
+            while calls:
+                node = calls[-1]
+                (edge, end) = (position[node], offsets[node + 1])
+                while edge < end:
+                    target = targets[edge]
+                    edge += 1
+                    if index[target] < 0:
+                        position[node] = edge
+                        index[target] = low[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack[target] = 1
+                        position[target] = offsets[target]
+                        calls.append(target)
+                        break
+                    elif on_stack[target] and index[target] < low[node]:
+                        low[node] = index[target]
+                else:
+                    calls.pop()
+                    if low[node] == index[node]:
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = 0
+                            components[member] = count
+                            if member == node:
+                                break
+                        count += 1
+                    if calls and low[node] < low[calls[-1]]:
+                        low[calls[-1]] = low[node]
+        return (count, components)
+
+    def get_shortest_paths(self, source=0):
+        return ShortestPaths(self, source)
+
+    def _find_uncovered(self, start, next_uncovered):
+        """Returns the shortest path of edges from start to a node with an
+        uncovered edge, or None if there is none.
+        """
+        (offsets, targets) = (self.offsets, self.targets)
+        # node -> edge reaching it
+        parents = {start: None}
+        todo = deque([start])
+        while todo:
+            node = todo.popleft()
+            for edge in xrange(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                if target in parents:
+                    continue
+                parents[target] = edge
+                if next_uncovered(target) is not None:
+                    path = []
+                    while edge is not None:
+                        path.append(edge)
+                        edge = parents[self.get_source(edge)]
+                    path.reverse()
+                    return path
+                todo.append(target)
+        return None
+
+    def get_edge_cover(self, source=0, max_length=None):
+        """Returns paths of edges from source covering every edge reachable
+        from it, each path extended by an uncovered edge of its last node
+        or else by a shortest path to the nearest node with one.
+
+        :param max_length: start a new path after this many edges
+        """
+        (offsets, targets) = (self.offsets, self.targets)
+        covered = bytearray(len(self.targets))
+        # first edge of each node that may not be covered
+        first = offsets[:]
+
+        def next_uncovered(node):
+            (edge, end) = (first[node], offsets[node + 1])
+            while edge < end and covered[edge]:
+                edge += 1
+            first[node] = edge
+            return edge if edge < end else None
+
+        (paths, path, node) = ([], [], source)
+        while True:
+            edge = next_uncovered(node)
+            if edge is None:
+                route = self._find_uncovered(node, next_uncovered)
+                if route is None:
+                    if not path:
+                        break
+                    paths.append(path)
+                    (path, node) = ([], source)
+                    continue
+                path.extend(route)
+                node = targets[route[-1]]
+                continue
+            covered[edge] = 1
+            path.append(edge)
+            node = targets[edge]
+            if max_length is not None and len(path) >= max_length:
+                paths.append(path)
+                (path, node) = ([], source)
+        log.info("Covered %d edges with %d paths of %d edges", sum(covered), len(paths),
+                sum(len(path) for path in paths))
+        return paths
+
+    def save(self, path):
+        """Writes the graph to a file for load_graph().
+        """
+        tables = pickle.dumps((self.label_table, self.configurations), pickle.HIGHEST_PROTOCOL)
+        (n, m) = (len(self), self.number_of_edges())
+        with open(path, 'wb') as fp:
+            fp.write(HEADER.pack(MAGIC, n, m, HEADER.size + 8 * (n + 1) + 8 * m))
+            fp.write(_pack(self.offsets, 'q'))
+            fp.write(_pack(self.targets, 'i'))
+            fp.write(_pack(self.labels, 'i'))
+            fp.write(tables)
+
+
+class ShortestPaths(object):
+    """Shortest paths from a source node of a CSRGraph, found breadth
+    first.
+    """
+
+    def __init__(self, graph, source=0):
+        (offsets, targets) = (graph.offsets, graph.targets)
+        self.graph = graph
+        self.source = source
+        # number of edges from the source (-1 if unreachable), and the
+        # edge reaching each node on a shortest path
+        self.distances = array('l', [-1]) * len(graph)
+        self.parents = array('l', [-1]) * len(graph)
+        self.distances[source] = 0
+        todo = deque([source])
+        while todo:
+            node = todo.popleft()
+            distance = self.distances[node] + 1
+            for edge in xrange(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                if self.distances[target] < 0:
+                    self.distances[target] = distance
+                    self.parents[target] = edge
+                    todo.append(target)
+
+    def get_path(self, target):
+        """Returns the edges of a shortest path to target, or None if it
+        is unreachable.
+        """
+        if self.distances[target] < 0:
+            return None
+        path = []
+        while target != self.source:
+            edge = self.parents[target]
+            path.append(edge)
+            target = self.graph.get_source(edge)
+        path.reverse()
+        return path
+
+
+def load_graph(path):
+    """Returns the CSRGraph saved to a file, its arrays memory mapped.
+    """
+    with open(path, 'rb') as fp:
+        # a private copy on write mapping, as ctypes needs a writable buffer
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_COPY)
+    (magic, n, m, position) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise StateGraphError("Not a state graph file: %s" % path)
+    if sys.byteorder != 'little':
+        raise StateGraphError("Cannot map little endian arrays on this platform")
+    offsets = (ctypes.c_int64 * (n + 1)).from_buffer(data, HEADER.size)
+    targets = (ctypes.c_int32 * m).from_buffer(data, HEADER.size + 8 * (n + 1))
+    labels = (ctypes.c_int32 * m).from_buffer(data, HEADER.size + 8 * (n + 1) + 4 * m)
+    (label_table, configurations) = pickle.loads(data[position:])
+    graph = CSRGraph(offsets, targets, labels, label_table, configurations)
+    graph.mmap = data
+    log.info("Loaded graph of %d nodes, %d edges from %s", n, m, path)
+    return graph
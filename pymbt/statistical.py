@@ -0,0 +1,302 @@
+"""Statistical model checking.
+
+When a model has too many configurations to explore, the probability
+that a random run reaches a target (an active state or an output event)
+within a number of steps can be estimated by sampling random walks,
+with inputs chosen from a weighted distribution. Walks are sampled in
+batches on a pool of worker processes, and sampling stops as soon as
+the answer is known well enough. estimate() stops once a confidence
+interval of the probability is narrow enough. check() stops once a
+sequential probability ratio test (SPRT) decides between p >= theta and
+p < theta:
+
+  >>> result = estimate("models/cvm.graphml", Output("start"), steps=10,
+  ...                   weights={'inc': 3}, epsilon=0.01)
+  >>> print result
+  P = 0.4213 in [0.4113, 0.4313] (95%) from 9600 samples in 1.2s
+  >>> check("models/cvm.graphml", InState("BUSY"), 10, theta=0.3).accepted
+  True
+
+Each batch seeds its own random generator, so given a seed the result
+is the same whatever the number of processes.
+"""
+
+import itertools
+import math
+import multiprocessing
+import threading
+import time
+
+from simulator import Simulator
+from statechart import read_statechart
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class StatisticalError(Exception):
+    pass
+
+
+class InState(object):
+    """Target reached when a state with the label is active.
+    """
+
+    def __init__(self, label):
+        self.label = label
+
+    def __call__(self, sim):
+        return any(st.label == self.label for st in sim.active_states)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.label)
+
+
+class Output(object):
+    """Target reached when a big step produces the output event.
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, sim):
+        return self.event in sim.outputs
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.event)
+
+
+def choose_input(sim, weights=None):
+    """Returns an expected input chosen at random, each with probability
+    proportional to its weight (default 1), or None if none is expected.
+
+    :param weights: dict of event -> weight, 0 never choosing the event
+    """
+    events = sorted(set(sim.inputs.iterevents()))
+    if weights:
+        events = [event for event in events if weights.get(event, 1.0) > 0]
+    if not events:
+        return None
+    if not weights:
+        return sim.random.choice(events)
+    r = sim.random.random() * sum(weights.get(event, 1.0) for event in events)
+    for event in events:
+        r -= weights.get(event, 1.0)
+        if r < 0:
+            return event
+    return events[-1]
+
+
+def sample(sim, target, steps, weights=None):
+    """Performs a random walk of up to steps big steps from the current
+    configuration of sim, returning True if it reaches the target.
+
+    :param target: function of the simulator, true when reached
+    """
+    if target(sim):
+        return True
+    for _ in xrange(steps):
+        event = choose_input(sim, weights)
+        if event is None:
+            return False
+        sim.enabled_inputs.add(event)
+        sim.next()
+        if target(sim):
+            return True
+    return False
+
+
+def _get_z(confidence):
+    """Returns z such that P(-z <= Z <= z) = confidence for a standard
+    normal Z.
+    """
+    (low, high) = (0.0, 40.0)
+    for _ in xrange(100):
+        z = (low + high) / 2
+        if math.erf(z / math.sqrt(2)) < confidence:
+            low = z
+        else:
+            high = z
+    return z
+
+
+class SamplingResult(object):
+    """Counts of the samples reaching the target.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.successes = 0
+        self.elapsed = 0.0
+
+    def add(self, samples, successes):
+        self.samples += samples
+        self.successes += successes
+
+    @property
+    def estimate(self):
+        return float(self.successes) / self.samples if self.samples else 0.0
+
+    def get_interval(self, confidence=0.95):
+        """Returns the (low, high) Wilson score interval of the probability.
+        """
+        n = self.samples
+        if not n:
+            return (0.0, 1.0)
+        (p, z2) = (self.estimate, _get_z(confidence) ** 2)
+        denominator = 1 + z2 / n
+        centre = (p + z2 / (2 * n)) / denominator
+        half = math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / denominator * math.sqrt(z2)
+        return (max(0.0, centre - half), min(1.0, centre + half))
+
+    def is_done(self):
+        return False
+
+
+class Estimate(SamplingResult):
+    """Estimate of the probability, done once its confidence interval is
+    at most 2 * epsilon wide.
+
+    The interval is that of a fixed number of samples so is approximate
+    after stopping early, good enough to stop on.
+    """
+
+    def __init__(self, epsilon=0.01, confidence=0.95, min_samples=100):
+        SamplingResult.__init__(self)
+        self.epsilon = epsilon
+        self.confidence = confidence
+        self.min_samples = min_samples
+
+    def is_done(self):
+        if self.samples < self.min_samples:
+            return False
+        (low, high) = self.get_interval(self.confidence)
+        return high - low <= 2 * self.epsilon
+
+    def __str__(self):
+        return "P = %.4f in [%.4f, %.4f] (%g%%) from %d samples in %.1fs" % ((
+                self.estimate,) + self.get_interval(self.confidence) + (
+                100 * self.confidence, self.samples, self.elapsed))
+
+
+class HypothesisTest(SamplingResult):
+    """Sequential probability ratio test of p >= theta + delta against
+    p <= theta - delta, accepted being True, False, or None until decided.
+
+    :param alpha: probability of wrongly rejecting p >= theta + delta
+    :param beta: probability of wrongly accepting it
+    """
+
+    def __init__(self, theta, delta=0.01, alpha=0.05, beta=0.05):
+        SamplingResult.__init__(self)
+        (p0, p1) = (theta + delta, theta - delta)
+        if not 0 < p1 < p0 < 1:
+            raise StatisticalError("Need 0 < theta - delta < theta + delta < 1")
+        self.theta = theta
+        self.delta = delta
+        # log likelihood ratio of p1 to p0 added by each success/failure
+        self.success_llr = math.log(p1 / p0)
+        self.failure_llr = math.log((1 - p1) / (1 - p0))
+        self.accept_bound = math.log(beta / (1 - alpha))
+        self.reject_bound = math.log((1 - beta) / alpha)
+        self.accepted = None
+
+    @property
+    def llr(self):
+        return self.successes * self.success_llr + \
+                (self.samples - self.successes) * self.failure_llr
+
+    def is_done(self):
+        llr = self.llr
+        if llr <= self.accept_bound:
+            self.accepted = True
+        elif llr >= self.reject_bound:
+            self.accepted = False
+        return self.accepted is not None
+
+    def __str__(self):
+        decision = {True: "accepted", False: "rejected", None: "undecided"}[self.accepted]
+        return "P >= %g %s (estimate %.4f) from %d samples in %.1fs" % (
+                self.theta, decision, self.estimate, self.samples, self.elapsed)
+
+
+# state of each worker, set up by _init_worker
+_worker = threading.local()
+
+
+def _init_worker(model, target, steps, weights, seed):
+    sc = read_statechart(model) if isinstance(model, basestring) else model
+    _worker.sim = Simulator(sc)
+    _worker.initial = _worker.sim.get_configuration()
+    _worker.args = (target, steps, weights, seed)
+
+
+def _run_batch(item):
+    (number, size) = item
+    (sim, initial) = (_worker.sim, _worker.initial)
+    (target, steps, weights, seed) = _worker.args
+    sim.random.seed(None if seed is None else (seed, number))
+    successes = 0
+    for _ in xrange(size):
+        sim.set_configuration(initial)
+        if sample(sim, target, steps, weights):
+            successes += 1
+    return (size, successes)
+
+
+def run(model, target, steps, result, weights=None, max_samples=100000, batch=200,
+        processes=None, seed=None):
+    """Samples random walks in batches until result.is_done() or
+    max_samples, returning the result.
+
+    :param model: path of the model (or the statechart)
+    :param target: picklable function of the simulator, e.g. InState
+    :param result: SamplingResult to add the batches to
+    :param processes: number of worker processes (default: number of
+                      CPUs, 0 samples in this process)
+    """
+    items = [(number, min(batch, max_samples - start))
+            for (number, start) in enumerate(xrange(0, max_samples, batch))]
+    args = (model, target, steps, weights, seed)
+    start = time.time()
+    pool = None
+    if processes == 0:
+        _init_worker(*args)
+        batches = itertools.imap(_run_batch, items)
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, args)
+        # in order so the stopping sample does not depend on scheduling
+        batches = pool.imap(_run_batch, items)
+    try:
+        for (samples, successes) in batches:
+            result.add(samples, successes)
+            if result.is_done():
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    result.elapsed = time.time() - start
+    log.info("Sampled %r within %d steps: %s", target, steps, result)
+    return result
+
+
+def estimate(model, target, steps, epsilon=0.01, confidence=0.95, **kwargs):
+    """Returns an Estimate of the probability of reaching the target within
+    steps big steps, to within epsilon with the given confidence.
+
+    Other arguments are those of run(), max_samples defaulting to the
+    number sufficient for any probability by the Chernoff-Hoeffding bound.
+    """
+    kwargs.setdefault('max_samples',
+            int(math.ceil(math.log(2 / (1 - confidence)) / (2 * epsilon ** 2))))
+    return run(model, target, steps, Estimate(epsilon, confidence), **kwargs)
+
+
+def check(model, target, steps, theta, delta=0.01, alpha=0.05, beta=0.05, **kwargs):
+    """Tests whether the probability of reaching the target within steps
+    big steps is at least theta, returning a HypothesisTest.
+
+    Other arguments are those of run().
+    """
+    return run(model, target, steps, HypothesisTest(theta, delta, alpha, beta), **kwargs)
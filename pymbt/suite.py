@@ -0,0 +1,178 @@
+"""Test suite minimization and output.
+
+minimize_suite picks a near-minimal subset of test sequences covering
+everything the whole suite covers by greedy (weighted) set cover, and
+write_test_modules streams a suite to disk as unittest modules, which
+pytest also collects. The generated tests drive the SUT through an
+adapter (see pymbt.executor), checking it produces the outputs the model
+produced for each step:
+
+  >>> sequences = generate_random_sequences(sc, count=1000, length=20)
+  >>> suite = minimize_suite(sequences, weight='length')
+  >>> write_test_modules("tests/generated", suite, "models/cvm.graphml",
+  ...                    "cvm_sut.CoffeeMachineAdapter", ("localhost:8000",))
+
+Weighting by measured execution time needs the durations of the
+sequences, e.g. from executing them (see set_durations).
+"""
+
+import heapq
+import os
+import unittest
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class SuiteError(Exception):
+    pass
+
+
+def _get_duration(sequence):
+    if sequence.duration is None:
+        raise SuiteError("No measured duration of %r (see set_durations)" % sequence)
+    return sequence.duration
+
+
+WEIGHTS = {
+    None: lambda sequence: 1.0,
+    'length': lambda sequence: float(max(1, len(sequence))),
+    'time': _get_duration,
+}
+
+
+def set_durations(sequences, report):
+    """Sets the duration of each sequence to the time its steps took in
+    an ExecutionReport of running the sequences.
+    """
+    for result in report.results:
+        sequences[result.number].duration = sum(result.latencies)
+
+
+def minimize_suite(sequences, weight=None):
+    """Returns a subset of the sequences covering the same items, chosen
+    greedily by items newly covered per unit of cost.
+
+    :param weight: cost of a sequence: None (each costs the same),
+                   'length' (number of steps), 'time' (measured duration)
+                   or a function of the sequence
+    """
+    sequences = list(sequences)
+    weight = WEIGHTS[weight] if weight in WEIGHTS else weight
+    costs = []
+    for sequence in sequences:
+        cost = float(weight(sequence))
+        if not cost > 0:
+            raise SuiteError("Cost of %r is %r, not positive" % (sequence, cost))
+        costs.append(cost)
+    covered = set()
+    # lazy greedy: gains only decrease so stale heap entries are upper bounds
+    heap = [(-len(seq.coverage) / costs[index], index) for (index, seq) in enumerate(sequences)]
+    heapq.heapify(heap)
+    selected = []
+    while heap:
+        (ratio, index) = heapq.heappop(heap)
+        sequence = sequences[index]
+        gain = len(sequence.coverage - covered)
+        if not gain:
+            continue
+        ratio = -gain / costs[index]
+        if heap and ratio > heap[0][0]:
+            heapq.heappush(heap, (ratio, index))
+            continue
+        selected.append(index)
+        covered.update(sequence.coverage)
+    log.info("Minimized suite from %d to %d sequences covering %d items",
+            len(sequences), len(selected), len(covered))
+    return [sequences[index] for index in sorted(selected)]
+
+
+class SequenceTestCase(unittest.TestCase):
+    """Base class of generated test cases, checking that the SUT produces
+    the outputs expected by the model for each step of a sequence.
+
+    The adapter is created once for the test case class and reset before
+    each sequence.
+    """
+
+    # path of the model the sequences were generated from
+    model = None
+    # pymbt.executor.Adapter subclass driving the SUT, and its arguments
+    adapter_class = None
+    adapter_args = ()
+
+    @classmethod
+    def setUpClass(cls):
+        if cls.adapter_class is None:
+            raise SuiteError("No adapter_class to drive the SUT")
+        cls.adapter = cls.adapter_class(*cls.adapter_args)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.adapter.close()
+
+    def check_sequence(self, steps):
+        adapter = self.adapter
+        adapter.reset()
+        for (index, (inputs, outputs)) in enumerate(steps):
+            adapter.send(inputs)
+            observed = set(adapter.read_outputs())
+            self.assertEqual(set(outputs), observed,
+                    "step %d (inputs %r): expected outputs %r, got %r" % (
+                        index, inputs, sorted(outputs), sorted(observed)))
+
+
+MODULE_HEADER = '''"""Generated by pymbt.suite from %(model)s.
+"""
+
+from pymbt.suite import SequenceTestCase
+from %(adapter_module)s import %(adapter_name)s
+
+
+class %(class_name)s(SequenceTestCase):
+
+    model = %(model)r
+    adapter_class = %(adapter_name)s
+    adapter_args = %(adapter_args)r
+'''
+
+TEST_METHOD = '''
+    def test_%(number)06d(self):
+        self.check_sequence(%(steps)r)
+'''
+
+
+def write_test_modules(directory, sequences, model, adapter, adapter_args=(),
+        tests_per_module=1000, prefix="test_generated", class_name="GeneratedTestCase"):
+    """Writes test sequences as unittest modules in directory, at most
+    tests_per_module per module, returning the paths written.
+
+    Sequences are written as they are iterated so a suite need not be
+    held in memory.
+
+    :param adapter: import path of the adapter class, e.g.
+                    "cvm_sut.CoffeeMachineAdapter"
+    :param adapter_args: arguments of the adapter class, written by repr
+    """
+    (adapter_module, _, adapter_name) = adapter.rpartition(".")
+    if not adapter_module:
+        raise SuiteError("Expected the adapter as module.Class, got %r" % adapter)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    paths = []
+    fp = None
+    for (number, sequence) in enumerate(sequences):
+        if number % tests_per_module == 0:
+            if fp:
+                fp.close()
+            path = os.path.join(directory, "%s_%04d.py" % (prefix, len(paths)))
+            paths.append(path)
+            fp = open(path, 'w')
+            fp.write(MODULE_HEADER % dict(model=model, class_name=class_name,
+                    adapter_module=adapter_module, adapter_name=adapter_name,
+                    adapter_args=tuple(adapter_args)))
+        steps = [(tuple(inputs), tuple(sorted(outputs))) for (inputs, outputs) in sequence.steps]
+        fp.write(TEST_METHOD % dict(number=number, steps=steps))
+    if fp:
+        fp.close()
+    return paths
@@ -0,0 +1,315 @@
+"""Compact binary simulation traces.
+
+A trace records, for each small step of a simulation, the active basic
+states, the input/local/output events and the variable values. States,
+events, variable names and variable values are interned to small integers
+and the steps are written as columns of unsigned ints in chunks appended
+to the trace file:
+
+  header:  MAGIC byteorder
+  chunk:   CHUNK_HEADER(first_step, nsteps, ncolumns, delta_len)
+           pickled intern table entries added since the previous chunk
+           ncolumns * (COLUMN_HEADER(column, nbytes), column data)
+  ...
+  footer:  chunk index as arrays of chunk offsets and first steps
+  trailer: TRAILER(footer_offset, nchunks) MAGIC
+
+Since every chunk carries its own intern table entries a trace without
+a footer (e.g. after a crash) can still be read by scanning the chunk
+headers. The reader memory maps the file and looks up a step by bisecting
+the chunk index then reading one value per column directly from the map,
+so any step of a long trace can be inspected without replaying it.
+
+  >>> sim.recorder = TraceWriter("soak.trace")
+  >>> ... run simulation ...
+  >>> sim.recorder.close()
+  >>> trace = TraceReader("soak.trace")
+  >>> trace[73000000]
+  TraceStep(step=73000000, states=('IDLE', 'EMPTY'), ...)
+"""
+
+import bisect
+import cPickle as pickle
+import mmap
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+import logging
+log = logging.getLogger(__name__)
+
+MAGIC = "PYMBTTR1"
+BYTEORDER = {'little': 'L', 'big': 'B'}
+CHUNK_HEADER = struct.Struct("<QIII")
+COLUMN_HEADER = struct.Struct("<II")
+TRAILER = struct.Struct("<QQ")
+
+# columns; variable values are in columns VARIABLES + variable id
+(STATES, INPUTS, LOCALS, OUTPUTS, VARIABLES) = range(5)
+
+# value of a variable column when the variable is unset
+MISSING = 0xffffffff
+
+TraceStep = namedtuple("TraceStep", "step states inputs locals outputs variables")
+
+
+class TraceError(Exception):
+    pass
+
+
+def _new_column():
+    column = array('I')
+    assert column.itemsize == 4, "array('I') must be 32 bit"
+    return column
+
+
+class Interner(object):
+    """Maps hashable values to consecutive integer ids.
+    """
+
+    def __init__(self):
+        self.ids = dict()
+        self.values = []
+
+    def intern(self, value):
+        try:
+            return self.ids[value]
+        except KeyError:
+            id = self.ids[value] = len(self.values)
+            self.values.append(value)
+            return id
+
+    def __len__(self):
+        return len(self.values)
+
+
+class TraceWriter(object):
+    """Writes a trace of simulation steps to a file.
+
+    Steps are buffered in array columns and appended to the file as a
+    chunk every chunk_size steps.
+    """
+
+    # names of the intern tables, in the order they are written
+    tables = ('states', 'configurations', 'events', 'event_sets', 'names', 'values')
+
+    def __init__(self, path, chunk_size=1 << 16):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.fp = open(path, 'wb')
+        self.fp.write(MAGIC + BYTEORDER[sys.byteorder])
+        # intern tables, and the number of entries of each already written
+        self.states = Interner()  # (state.index, state.label)
+        self.configurations = Interner()  # tuple of state ids
+        self.events = Interner()  # event name
+        self.event_sets = Interner()  # sorted tuple of event ids
+        self.names = Interner()  # variable name
+        self.values = Interner()  # variable value
+        self.written = dict((table, 0) for table in self.tables)
+        # chunk index
+        self.offsets = array('L')
+        self.first_steps = array('L')
+        # current chunk
+        self.steps = 0
+        self.first_step = 0
+        self.columns = dict()
+        self._new_chunk()
+
+    def _new_chunk(self):
+        self.first_step = self.steps
+        self.columns = dict((column, _new_column())
+                for column in range(VARIABLES + len(self.names)))
+
+    def _intern_events(self, events):
+        ids = [self.events.intern(event) for event in events]
+        return self.event_sets.intern(tuple(sorted(ids)))
+
+    def record(self, inputs, states, local_events, outputs, variables):
+        """Records a step.
+
+        :param inputs: input events present at the start of the step
+        :param states: active basic states after the step
+        :param local_events: local events produced by the step
+        :param outputs: outputs of the current big step
+        :param variables: dict of variable values after the step
+        """
+        columns = self.columns
+        config = tuple(self.states.intern((st.index, st.label))
+                for st in sorted(states, key=lambda st: st.index))
+        columns[STATES].append(self.configurations.intern(config))
+        columns[INPUTS].append(self._intern_events(inputs))
+        columns[LOCALS].append(self._intern_events(local_events))
+        columns[OUTPUTS].append(self._intern_events(outputs))
+        n = len(columns[STATES])
+        for (name, value) in variables.iteritems():
+            column_id = VARIABLES + self.names.intern(name)
+            column = columns.get(column_id)
+            if column is None:
+                # new variable: unset for earlier steps of the chunk
+                column = columns[column_id] = _new_column()
+                column.extend([MISSING] * (n - 1))
+            column.append(self.values.intern(value))
+        for column in columns.itervalues():
+            if len(column) < n:  # variable not set in this step
+                column.append(MISSING)
+        self.steps += 1
+        if n >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Appends the current chunk to the trace file.
+        """
+        nsteps = self.steps - self.first_step
+        if not nsteps:
+            return
+        delta = []
+        for table in self.tables:
+            values = getattr(self, table).values
+            delta.append(values[self.written[table]:])
+            self.written[table] = len(values)
+        delta = pickle.dumps(delta, pickle.HIGHEST_PROTOCOL)
+        self.offsets.append(self.fp.tell())
+        self.first_steps.append(self.first_step)
+        self.fp.write(CHUNK_HEADER.pack(self.first_step, nsteps, len(self.columns), len(delta)))
+        self.fp.write(delta)
+        for (column_id, column) in sorted(self.columns.iteritems()):
+            data = column.tostring()
+            self.fp.write(COLUMN_HEADER.pack(column_id, len(data)))
+            self.fp.write(data)
+        log.debug("Wrote trace chunk of %d steps at offset %d", nsteps, self.offsets[-1])
+        self._new_chunk()
+
+    def close(self):
+        """Flushes the current chunk and writes the chunk index.
+        """
+        if self.fp is None:
+            return
+        self.flush()
+        footer_offset = self.fp.tell()
+        index_format = "<%dQ" % len(self.offsets)
+        self.fp.write(struct.pack(index_format, *self.offsets))
+        self.fp.write(struct.pack(index_format, *self.first_steps))
+        self.fp.write(TRAILER.pack(footer_offset, len(self.offsets)) + MAGIC)
+        self.fp.close()
+        self.fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TraceReader(object):
+    """Random access reader for trace files written by TraceWriter.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fp = open(path, 'rb')
+        self.map = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise TraceError("%s is not a trace file" % path)
+        byteorder = '<' if self.map[len(MAGIC)] == BYTEORDER['little'] else '>'
+        self.value = struct.Struct(byteorder + "I")
+        self.tables = dict((table, []) for table in TraceWriter.tables)
+        self._read_index()
+        # chunk -> {column -> offset}, read lazily
+        self.column_offsets = dict()
+
+    def _read_index(self):
+        size = len(self.map)
+        trailer_size = TRAILER.size + len(MAGIC)
+        self.offsets = array('L')
+        self.first_steps = array('L')
+        if size >= trailer_size and self.map[size - len(MAGIC):] == MAGIC:
+            (footer_offset, nchunks) = TRAILER.unpack_from(self.map, size - trailer_size)
+            index_format = struct.Struct("<%dQ" % nchunks)
+            self.offsets.extend(index_format.unpack_from(self.map, footer_offset))
+            self.first_steps.extend(
+                    index_format.unpack_from(self.map, footer_offset + index_format.size))
+            end = footer_offset
+        else:
+            log.warn("Trace %s has no index, scanning chunks", self.path)
+            end = None
+        # scan chunks for intern tables (and offsets when there is no index)
+        offset = len(MAGIC) + 1
+        self.steps = 0
+        while offset + CHUNK_HEADER.size <= (end or size):
+            (first_step, nsteps, ncolumns, delta_len) = CHUNK_HEADER.unpack_from(self.map, offset)
+            chunk_end = self._skip_columns(offset + CHUNK_HEADER.size + delta_len, ncolumns)
+            if chunk_end > size:
+                log.warn("Ignoring truncated trace chunk at offset %d", offset)
+                break
+            if end is None:
+                self.offsets.append(offset)
+                self.first_steps.append(first_step)
+            start = offset + CHUNK_HEADER.size
+            delta = pickle.loads(self.map[start:start + delta_len])
+            for (table, values) in zip(TraceWriter.tables, delta):
+                self.tables[table].extend(values)
+            self.steps = first_step + nsteps
+            offset = chunk_end
+
+    def _skip_columns(self, offset, ncolumns):
+        for _ in range(ncolumns):
+            (column_id, nbytes) = COLUMN_HEADER.unpack_from(self.map, offset)
+            offset += COLUMN_HEADER.size + nbytes
+        return offset
+
+    def _get_columns(self, chunk):
+        """Returns {column -> (offset, nsteps)} for the given chunk.
+        """
+        if chunk not in self.column_offsets:
+            offset = self.offsets[chunk]
+            (first_step, nsteps, ncolumns, delta_len) = CHUNK_HEADER.unpack_from(self.map, offset)
+            offset += CHUNK_HEADER.size + delta_len
+            columns = dict()
+            for _ in range(ncolumns):
+                (column_id, nbytes) = COLUMN_HEADER.unpack_from(self.map, offset)
+                offset += COLUMN_HEADER.size
+                columns[column_id] = offset
+                offset += nbytes
+            self.column_offsets[chunk] = columns
+        return self.column_offsets[chunk]
+
+    def _get_events(self, event_set):
+        events = self.tables['events']
+        return frozenset(events[id] for id in self.tables['event_sets'][event_set])
+
+    def __len__(self):
+        return self.steps
+
+    def __getitem__(self, step):
+        """Returns the TraceStep for the given step number.
+        """
+        if step < 0:
+            step += self.steps
+        if not 0 <= step < self.steps:
+            raise IndexError("step %r not in trace of %d steps" % (step, self.steps))
+        chunk = bisect.bisect_right(self.first_steps, step) - 1
+        pos = 4 * (step - self.first_steps[chunk])
+        values = dict((column_id, self.value.unpack_from(self.map, offset + pos)[0])
+                for (column_id, offset) in self._get_columns(chunk).iteritems())
+        states = self.tables['states']
+        config = self.tables['configurations'][values[STATES]]
+        variables = dict()
+        for (column_id, value) in values.iteritems():
+            if column_id >= VARIABLES and value != MISSING:
+                name = self.tables['names'][column_id - VARIABLES]
+                variables[name] = self.tables['values'][value]
+        return TraceStep(step,
+                tuple(states[id][1] for id in config),
+                self._get_events(values[INPUTS]),
+                self._get_events(values[LOCALS]),
+                self._get_events(values[OUTPUTS]),
+                variables)
+
+    def __iter__(self):
+        for step in xrange(self.steps):
+            yield self[step]
+
+    def close(self):
+        self.map.close()
+        self.fp.close()
@@ -9,18 +9,46 @@ log = logging.getLogger("transition")
 
 # <name>:<event>[<guard>]/<output>[;<output>]*;<actions>
 # e.g. t1: power_on [m>0] / lights_on ;  m=m+1
+# where the event may be a timeout, e.g. after(30s)
 re_label = re.compile(r"""
     ((?P<name>\w+)\s*:)?\s*
-    (?P<event>\w+)?\s*
+    (?P<event>after\s*\([^)]*\)|\w+)?\s*
     (\[\s*(?P<guard>[^]]+)\s*\])?\s*
     (/\s*(?P<output_actions>.*))?\s*$
 """, re.M | re.VERBOSE)
 
 
+re_after = re.compile(r"^after\s*\(\s*(?P<value>\d+(\.\d*)?)\s*(?P<unit>ms|s|min|h)?\s*\)$")
+
+# seconds per duration unit
+UNITS = {'ms': 0.001, 's': 1.0, 'min': 60.0, 'h': 3600.0, None: 1.0}
+
+
 class ParseError(Exception):
     pass
 
 
+def parse_timeout(event):
+    """Returns the seconds of a timeout event such as "after(30s)", or
+    None if event is not a timeout.
+    """
+    if not event or not re.match(r"after\s*\(", event):
+        return None
+    m = re_after.match(event)
+    if m is None:
+        raise ParseError("Could not parse timeout %r (e.g. after(30s))" % event)
+    return float(m.group('value')) * UNITS[m.group('unit')]
+
+
+def get_names(node, ctx=ast.Load):
+    """Returns the set of variable names in the given AST node used in the
+    given context (ast.Load or ast.Store).
+    """
+    return set(n.id for n in ast.walk(node)
+            if isinstance(n, ast.Name) and isinstance(n.ctx, ctx)
+            and n.id not in ('True', 'False', 'None'))
+
+
 class Transition(object):
     """Represents a statechart transition.
     """
@@ -29,9 +57,13 @@ class Transition(object):
     source = None
     destination = None
     _scope = None
+    # index within the statechart (see StateChart.make_index)
+    index = None
 
     def __init__(self, event, guard=None, outputs=None, action=None, name=None):
         self.event = event
+        # seconds after entering the source state a timeout event occurs
+        self.timeout = parse_timeout(event)
         self.outputs = outputs or []
         self.name = name
         self.defines = []
@@ -55,15 +87,58 @@ class Transition(object):
         else:
             (self.action_ast, self.action) = (None, None)
 
-    def _analyse_action_ast(self):
-        # this should split the action into separate assignments
-        pass
+    def __getstate__(self):
+        # code objects cannot be pickled, and the guard and action are
+        # compiled again from their strings when unpickled
+        state = self.__dict__.copy()
+        for name in ('guard_ast', 'guard', 'action_ast', 'action'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        (self.guard_ast, self.guard) = self._compile(self.guard_s, "eval")
+        (self.action_ast, self.action) = self._compile(self.action_s, "exec")
+
+    @staticmethod
+    def _compile(source, mode):
+        if not source:
+            return (None, None)
+        node = ast.parse(source, "<string>", mode=mode)
+        return (node, compile(node, "<string>", mode=mode))
 
     def get_assignments(self):
         """Returns assignments as [(name,ast_value)]
+
+        Augmented assignments such as "m += 1" are given as "m = m + 1".
         """
         if not self.action:
             return []
+        assignments = []
+        for stmt in self.action_ast.body:
+            if isinstance(stmt, ast.Assign):
+                for target in stmt.targets:
+                    for name in get_names(target, ast.Store):
+                        assignments.append((name, stmt.value))
+            elif isinstance(stmt, ast.AugAssign):
+                for name in get_names(stmt.target, ast.Store):
+                    value = ast.BinOp(ast.Name(name, ast.Load()), stmt.op, stmt.value)
+                    assignments.append((name, value))
+        return assignments
+
+    def get_read_variables(self):
+        """Returns the set of variables read by the guard and action.
+        """
+        names = set()
+        for node in (self.guard_ast, self.action_ast):
+            if node is not None:
+                names.update(get_names(node, ast.Load))
+        return names
+
+    def get_written_variables(self):
+        """Returns the set of variables assigned by the action.
+        """
+        return set(name for (name, value) in self.get_assignments())
 
     def eval_guard(self, variables):
         if self.guard:
@@ -121,18 +196,23 @@ class Transition(object):
                 (self.get_label(), self.destination))
 
 
-def make_transition(label):
-    """Parses a transition label of the form:
+def parse_label(label):
+    """Splits a transition label of the form:
 
     [<name> :] <event> [[<guard>]] [/ [<outputs>] ; [<action>] ]
 
     e.g. t1: power_on [m>0] / lights_on ;  m=m+1
+
+    into a dict of Transition arguments, without parsing the guard and
+    action.
     """
     m = re_label.match(label)
     if m is None:
         raise ParseError("Could not regex label %r (pattern=%s)" % (label, re_label.pattern))
     name = m.group('name')
     event = m.group('event')
+    if parse_timeout(event) is not None:
+        event = re.sub(r"\s+", "", event)
     guard = m.group('guard')
     output_actions = m.group('output_actions') or ""
     stmts = re.split("\s*;\s*", output_actions.strip())
@@ -141,7 +221,13 @@ def make_transition(label):
     while stmts and re_word.match(stmts[0]):
         outputs.append(stmts.pop())
     action = "; ".join(stmts)
-    return Transition(event, guard=guard, outputs=outputs, action=action, name=name)
+    return dict(event=event, guard=guard, outputs=outputs, action=action, name=name)
+
+
+def make_transition(label):
+    """Parses a transition label (see parse_label).
+    """
+    return Transition(**parse_label(label))
 
 if __name__ == "__main__":
     label = "t1: power_on [m>0] / lights_on ;  m=m+1"
@@ -0,0 +1,298 @@
+"""Visited configuration stores for the explorer.
+
+ExactStore keeps every configuration. For state spaces too large for
+that the probabilistic stores keep only fixed-width hashes of the
+configurations in a fixed amount of memory, at the risk of wrongly
+treating a new configuration as visited (and so omitting it and its
+successors from the search):
+
+ * HashCompactStore keeps a 64 bit hash per configuration in an open
+   addressing table of a fixed capacity
+ * BitStateStore sets k bits per configuration in a bit array of a fixed
+   size (i.e. a Bloom filter, as in SPIN's bitstate hashing)
+
+Both estimate the probability that some configuration was omitted.
+
+DiskVisitedStore keeps 128 bit hashes in a sorted file on disk. Lookups
+are delayed: the explorer adds candidate configurations, and the store
+detects duplicates in sorted batches by merging them with the file.
+
+  >>> explorer = Explorer(sc, visited=BitStateStore(size=2 ** 33, hashes=3),
+  ...                     record_graph=False)
+  >>> explorer.explore()
+  >>> explorer.visited.omission_probability()
+  1.2e-07
+"""
+
+import hashlib
+import marshal
+import math
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+
+import logging
+log = logging.getLogger(__name__)
+
+HASH = struct.Struct("<QQ")
+
+
+class StoreFullError(Exception):
+    pass
+
+
+def digest_configuration(configuration):
+    """Returns a 128 bit digest of a configuration as a string.
+
+    Unlike hash() this is the same in every process.
+    """
+    try:
+        data = marshal.dumps(configuration)
+    except ValueError:  # unmarshallable variable value
+        data = repr(configuration)
+    return hashlib.md5(data).digest()
+
+
+def hash_configuration(configuration):
+    """Returns a pair of 64 bit hashes of a configuration.
+    """
+    return HASH.unpack(digest_configuration(configuration))
+
+
+class ExactStore(object):
+    """Stores configurations exactly.
+    """
+
+    def __init__(self):
+        self.keys = set()
+
+    def get_key(self, configuration):
+        return configuration
+
+    def add(self, key):
+        self.keys.add(key)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def omission_probability(self):
+        return 0.0
+
+
+class HashCompactStore(object):
+    """Stores 64 bit hashes of configurations in a fixed size table.
+
+    :param capacity: maximum number of configurations (8 bytes each)
+    """
+
+    def __init__(self, capacity=1 << 20):
+        self.capacity = capacity
+        # open addressing table of hashes, 0 means empty
+        self.table = array('L', [0]) * capacity
+        assert self.table.itemsize == 8, "array('L') must be 64 bit"
+        self.count = 0
+        self.expected_omissions = 0.0
+
+    def get_key(self, configuration):
+        (h1, h2) = hash_configuration(configuration)
+        return (h1 or 1, h2 % self.capacity)
+
+    def _find(self, key):
+        """Returns the slot of key, or the empty slot it belongs in.
+        """
+        (h, slot) = key
+        table = self.table
+        while table[slot] and table[slot] != h:
+            slot += 1
+            if slot == self.capacity:
+                slot = 0
+        return slot
+
+    def add(self, key):
+        if self.count >= self.capacity - 1:
+            raise StoreFullError("Hash compaction table of %d entries is full" % self.capacity)
+        # chance this new configuration matched a stored hash
+        self.expected_omissions += self.count / 2.0 ** 64
+        self.table[self._find(key)] = key[0]
+        self.count += 1
+
+    def __contains__(self, key):
+        return self.table[self._find(key)] == key[0]
+
+    def __len__(self):
+        return self.count
+
+    def omission_probability(self):
+        """Returns the estimated probability that some configuration was
+        wrongly treated as visited.
+        """
+        return 1.0 - math.exp(-self.expected_omissions)
+
+
+class BitStateStore(object):
+    """Stores configurations as k bits set in a bit array.
+
+    :param size: number of bits in the array
+    :param hashes: number of bits set per configuration
+    """
+
+    def __init__(self, size=1 << 30, hashes=3):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray((size + 7) // 8)
+        self.bits_set = 0
+        self.count = 0
+        self.expected_omissions = 0.0
+
+    def get_key(self, configuration):
+        (h1, h2) = hash_configuration(configuration)
+        # double hashing gives the k bit positions
+        return tuple((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        # chance this new configuration's bits were all set already
+        self.expected_omissions += (float(self.bits_set) / self.size) ** self.hashes
+        bits = self.bits
+        for position in key:
+            (byte, mask) = (position >> 3, 1 << (position & 7))
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                self.bits_set += 1
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in key:
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def omission_probability(self):
+        """Returns the estimated probability that some configuration was
+        wrongly treated as visited.
+        """
+        return 1.0 - math.exp(-self.expected_omissions)
+
+
+class DiskVisitedStore(object):
+    """Stores 128 bit hashes of configurations in a sorted file, detecting
+    duplicates in batches.
+
+    :param directory: directory for the store (default: a temporary
+                      directory, removed by close())
+    :param batch_size: number of candidates to collect before merging
+    """
+
+    # candidates are added with add_candidate() and checked by flush()
+    delayed = True
+    record_size = 16
+    read_size = 1 << 16  # records
+
+    def __init__(self, directory=None, batch_size=1 << 20):
+        self.own_directory = directory is None
+        self.directory = tempfile.mkdtemp(prefix="pymbt-visited-") \
+                if directory is None else directory
+        open(self.path, 'wb').close()
+        self.batch_size = batch_size
+        self.count = 0
+        # key -> item of configurations not yet checked
+        self.candidates = dict()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, "visited")
+
+    def get_key(self, configuration):
+        return digest_configuration(configuration)
+
+    def add_candidate(self, key, item):
+        """Adds a configuration to be checked by the next flush().
+        """
+        self.candidates.setdefault(key, item)
+
+    def is_full(self):
+        return len(self.candidates) >= self.batch_size
+
+    def _iter_records(self, fp):
+        size = self.record_size
+        while True:
+            data = fp.read(size * self.read_size)
+            if not data:
+                return
+            for offset in xrange(0, len(data), size):
+                yield data[offset:offset + size]
+
+    def flush(self):
+        """Merges the candidates into the store, returning the items of the
+        candidates not visited before.
+        """
+        new_items = []
+        if not self.candidates:
+            return new_items
+        tmp_path = self.path + ".tmp"
+        with open(self.path, 'rb') as old, open(tmp_path, 'wb') as out:
+            records = self._iter_records(old)
+            buf = []
+            record = next(records, None)
+            for key in sorted(self.candidates):
+                while record is not None and record < key:
+                    buf.append(record)
+                    record = next(records, None)
+                if record != key:
+                    buf.append(key)
+                    new_items.append(self.candidates[key])
+                if len(buf) >= self.read_size:
+                    out.write("".join(buf))
+                    buf = []
+            while record is not None:
+                buf.append(record)
+                record = next(records, None)
+            out.write("".join(buf))
+        os.rename(tmp_path, self.path)
+        log.debug("Merged %d candidates into visited store, %d new",
+                len(self.candidates), len(new_items))
+        self.count += len(new_items)
+        self.candidates = dict()
+        return new_items
+
+    def __len__(self):
+        return self.count
+
+    def omission_probability(self):
+        """Returns the estimated probability that two configurations had
+        the same hash.
+        """
+        return 1.0 - math.exp(-self.count ** 2 / 2.0 ** 129)
+
+    def _get_files(self):
+        return [os.path.basename(self.path)]
+
+    def save_files(self, directory):
+        """Links the store files into a checkpoint directory.
+        """
+        for name in self._get_files():
+            os.link(os.path.join(self.directory, name), os.path.join(directory, name))
+
+    def load_files(self, directory):
+        """Links the store files from a checkpoint directory into a new
+        temporary directory, or into the directory given when created.
+        """
+        if self.own_directory:
+            self.directory = tempfile.mkdtemp(prefix="pymbt-visited-")
+        for name in self._get_files():
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+            os.link(os.path.join(directory, name), path)
+
+    def close(self):
+        if self.own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
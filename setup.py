@@ -21,6 +21,8 @@ setup(name='pymbt',
       ],
       entry_points="""
       # -*- Entry points: -*-
+      [console_scripts]
+      pymbt = pymbt.cli:main
       """,
       scripts=[],
       )
@@ -0,0 +1,84 @@
+
+import os
+import unittest
+
+import networkx as nx
+
+from pymbt.analysis import StaticAnalysis, analyse, check_start_nodes
+from pymbt.statechart import StateChart, State, read_statechart
+from pymbt.transition import Transition, make_transition
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+def create_broken_statechart():
+    """Returns a statechart with dead transitions, an unreachable state
+    and an OR-state without a start state.
+    """
+    root = StateChart("root")
+    (a, b, c, lost) = (State("A"), State("B"), State("C"), State("LOST"))
+    empty = StateChart("EMPTY")
+    for state in (a, b, c, lost, empty):
+        root.add_state(state)
+    empty.add_state(State("NOSTART"))
+    root.set_start_state(a)
+    root.init = make_transition("/ x = 0")
+    a.add_transition(Transition("go", action="x = 1"), b)
+    b.add_transition(Transition("back", outputs=["ping"], action="x = 0"), a)
+    b.add_transition(make_transition("jump [x > 5]"), lost)
+    b.add_transition(make_transition("jump [x > 1 and x < 1]"), lost)
+    a.add_transition(make_transition("ping"), c)
+    a.add_transition(make_transition("pong"), lost)
+    c.add_transition(make_transition("go [False]"), empty)
+    root.locals = set(["ping", "pong"])
+    root.compile()
+    return root
+
+
+class StaticAnalysisTestCase(unittest.TestCase):
+
+    def test_cvm(self):
+        sc = read_statechart(CVM)
+        self.assertEqual([], analyse(sc))
+        self.assertEqual({'m': None}, StaticAnalysis(sc).values)
+        # every guard on m may be true for some m in 0..10
+        analysis = StaticAnalysis(sc, ranges={'m': (0, 10)})
+        self.assertEqual([], analysis.false_guards)
+
+    def test_broken(self):
+        analysis = StaticAnalysis(create_broken_statechart())
+        self.assertEqual({'x': frozenset([0, 1])}, analysis.values)
+        self.assertEqual(["jump [x > 5]", "jump [x > 1 and x < 1]", "go [False]"],
+                [t.get_label() for t in analysis.false_guards])
+        self.assertEqual(set(["pong"]), analysis.dead_events)
+        self.assertEqual(["LOST", "EMPTY", "NOSTART"],
+                [st.label for st in analysis.unreachable_states])
+        problems = analysis.get_problems()
+        self.assertTrue("No start state in StateChart('EMPTY')" in problems)
+        self.assertTrue("Dead transition 'pong' from State('A'): event pong never occurs"
+                in problems)
+        self.assertEqual(8, len(problems))
+
+    def test_inputs(self):
+        analysis = StaticAnalysis(create_broken_statechart(), inputs=["go"])
+        self.assertEqual(set(["back", "jump", "ping", "pong"]), analysis.dead_events)
+        self.assertEqual(["A", "B"], sorted(st.label for st in analysis.reachable
+                if st.is_basic()))
+
+    def test_ranges(self):
+        analysis = StaticAnalysis(create_broken_statechart(), ranges={'x': (0, 10)})
+        self.assertEqual(["jump [x > 1 and x < 1]", "go [False]"],
+                [t.get_label() for t in analysis.false_guards])
+
+    def test_start_nodes(self):
+        g = nx.MultiDiGraph(name="root")
+        g.add_node("n0", label="start")
+        g.add_node("n1", label="A")
+        g.add_node("n2", label="B", children=["n3", "n4"])
+        g.add_node("n3", label="start", parent="n2")
+        g.add_node("n4", label="C", parent="n2")
+        g.add_edge("n0", "n1")
+        self.assertEqual(["Start node 'n3' in 'B' has 0 successors"], check_start_nodes(g))
+        g.add_edge("n0", "n2")
+        g.add_edge("n3", "n4")
+        self.assertEqual(["Start node 'n0' in 'root' has 2 successors"], check_start_nodes(g))
@@ -0,0 +1,96 @@
+
+import os
+import unittest
+
+import networkx as nx
+
+from pymbt.bisimulation import BisimulationError, minimize
+from pymbt.explorer import Explorer
+from pymbt.statechart import StateChart, AndState, State, read_statechart
+from pymbt.transition import make_transition
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+def create_graph(edges):
+    """Returns an explored graph of (source, target, inputs, outputs)
+    edges, configurations being the node numbers.
+    """
+    graph = nx.MultiDiGraph()
+    for (source, target, inputs, outputs) in edges:
+        for node in (source, target):
+            graph.add_node(node, configuration=node)
+        graph.add_edge(source, target, inputs=(inputs,), outputs=frozenset(outputs),
+                transitions=(source,))
+    return graph
+
+
+class BisimulationTestCase(unittest.TestCase):
+
+    def test_counter(self):
+        # a counter 0..3 where only reaching 3 is observable: 0 and 1 are
+        # not bisimilar as 1 is nearer 3
+        graph = create_graph([(0, 1, "inc", []), (1, 2, "inc", []), (2, 3, "inc", ["full"]),
+                (3, 3, "inc", []), (0, 4, "off", []), (1, 4, "off", []), (4, 4, "on", [])])
+        quotient = minimize(graph)
+        self.assertEqual([[0], [1], [2], [3], [4]], quotient.blocks)
+
+    def test_merge(self):
+        # 1 and 2 differ only in configuration
+        graph = create_graph([(0, 1, "a", []), (0, 2, "b", []), (1, 3, "c", ["x"]),
+                (2, 3, "c", ["x"]), (3, 0, "d", [])])
+        quotient = minimize(graph)
+        self.assertEqual([[0], [1, 2], [3]], quotient.blocks)
+        self.assertEqual(0, quotient.initial)
+        self.assertEqual(1, quotient.get_block(2))
+        self.assertEqual([1, 2], quotient.get_configurations(1))
+        edges = sorted((u, v, d['inputs'], d['transitions'])
+                for (u, v, d) in quotient.graph.edges(data=True))
+        self.assertEqual([(0, 1, ("a",), (0,)), (0, 1, ("b",), (0,)),
+                (1, 2, ("c",), (1, 2)), (2, 0, ("d",), (3,))], edges)
+        # keeping configurations apart
+        self.assertEqual(4, len(minimize(graph, key=lambda c: c == 2).blocks))
+
+    def test_nondeterministic(self):
+        graph = create_graph([(0, 1, "a", []), (0, 2, "a", [])])
+        self.assertRaises(BisimulationError, minimize, graph)
+
+    def test_cvm(self):
+        sc = read_statechart(CVM)
+        graph = Explorer(sc, reduce=False).explore()
+        quotient = minimize(graph)
+        self.assertEqual(53, len(graph))
+        self.assertEqual(26, len(quotient.graph))
+        self.assertEqual(sorted(graph.nodes()),
+                sorted(node for block in quotient.blocks for node in block))
+        # every original edge maps to a quotient edge with the same label
+        labels = set((u, v, d['inputs'], d['outputs'])
+                for (u, v, d) in quotient.graph.edges(data=True))
+        for (u, v, d) in graph.edges(data=True):
+            self.assertTrue((quotient.block_of[u], quotient.block_of[v], d['inputs'],
+                    d['outputs']) in labels)
+        self.assertEqual(0, quotient.get_block(graph.node[0]['configuration']))
+
+    def test_orthogonal_regions(self):
+        # two independent regions toggling on x and y are all bisimilar
+        root = StateChart("root")
+        both = AndState("P")
+        root.add_state(both)
+        root.set_start_state(both)
+        root.init = make_transition("")
+        for event in ("x", "y"):
+            region = StateChart(event.upper())
+            both.add_state(region)
+            states = [State(event + "0"), State(event + "1")]
+            for state in states:
+                region.add_state(state)
+            region.set_start_state(states[0])
+            region.init = make_transition("")
+            states[0].add_transition(make_transition(event), states[1])
+            states[1].add_transition(make_transition(event), states[0])
+        root.compile()
+        graph = Explorer(root, reduce=False).explore()
+        self.assertEqual((4, 8), (len(graph), graph.number_of_edges()))
+        self.assertEqual([[0, 1, 2, 3]], minimize(graph).blocks)
+        # sleep sets omit edges
+        self.assertRaises(BisimulationError, minimize, Explorer(root).explore())
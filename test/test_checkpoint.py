@@ -0,0 +1,87 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pymbt.checkpoint import Checkpointer, CheckpointError
+from pymbt.explorer import Explorer
+from pymbt.frontier import DiskFrontier
+from pymbt.monitor import MonitorSet, PropertyViolation
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+from pymbt.visited import DiskVisitedStore
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class CheckpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+        self.directory = tempfile.mkdtemp()
+        self.checkpointer = Checkpointer(self.directory, interval=0, keep=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_simulator(self):
+        sim = Simulator(self.sc, seed=1)
+        coverage = sim.enable_coverage()
+        for _ in range(10):
+            sim.random_step()
+        self.checkpointer.save(sim)
+        events = [sim.random_step() for _ in range(10)]
+        sim2 = Simulator(read_statechart(CVM))
+        self.assertTrue(self.checkpointer.resume(sim2))
+        self.assertEqual(events, [sim2.random_step() for _ in range(10)])
+        self.assertEqual(sim.get_configuration(), sim2.get_configuration())
+        self.assertEqual(coverage.transitions, sim2.coverage.transitions)
+
+    def test_monitors(self):
+        properties = ["not once(event('inc'))"]
+        sim = Simulator(self.sc)
+        sim.enable_monitors(MonitorSet(self.sc, properties, raise_violations=False))
+        for event in ("power_on", "inc"):
+            sim.enabled_inputs.add(event)
+            sim.next()
+        self.checkpointer.save(sim)
+        sim2 = Simulator(read_statechart(CVM))
+        monitors = sim2.enable_monitors(MonitorSet(sim2.sc, properties))
+        self.checkpointer.resume(sim2)
+        self.assertEqual((2, [True]), (monitors.step, monitors.bits))
+        sim2.enabled_inputs.add("power_off")
+        try:
+            sim2.next()
+        except PropertyViolation as e:
+            self.assertEqual(3, e.step)
+        else:
+            self.fail("once() restarted")
+
+    def test_keep(self):
+        sim = Simulator(self.sc)
+        for _ in range(3):
+            self.checkpointer.maybe_save(sim)
+        self.assertEqual([1, 2], self.checkpointer.get_checkpoints())
+
+    def test_wrong_statechart(self):
+        self.checkpointer.save(Simulator(self.sc))
+        sc = read_statechart(CVM)
+        sc.all_transitions[0].destination = sc.all_states[1]
+        self.assertRaises(CheckpointError, self.checkpointer.resume, Simulator(sc))
+
+    def test_explorer(self):
+        frontier = DiskFrontier(max_items=4, batch_size=2)
+        explorer = Explorer(self.sc, max_inputs=2, frontier=frontier,
+                visited=DiskVisitedStore(batch_size=8))
+        explorer.explore(max_states=25)
+        self.assertTrue(frontier.batches)
+        self.checkpointer.save(explorer)
+        explorer.visited.close()
+        frontier.close()
+        explorer2 = Explorer(read_statechart(CVM), max_inputs=2)
+        self.assertTrue(self.checkpointer.resume(explorer2))
+        explorer2.explore()
+        self.assertEqual(53, explorer2.stats['states'])
+        explorer2.visited.close()
+        explorer2.frontier.close()
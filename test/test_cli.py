@@ -0,0 +1,99 @@
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+
+from pymbt.cli import ModelCache, create_server, main
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+def run(argv):
+    out = StringIO()
+    status = main(argv, out)
+    return (status, out.getvalue())
+
+
+class CLITestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lazy_imports(self):
+        code = "import sys, pymbt.cli; print 'networkx' in sys.modules"
+        output = subprocess.check_output([sys.executable, "-c", code],
+                cwd=os.path.join(os.path.dirname(__file__), ".."))
+        self.assertEqual("False", output.strip())
+
+    def test_simulate(self):
+        (status, output) = run(["simulate", CVM, "power_on", "inc", "coffee,inc"])
+        self.assertEqual(0, status)
+        lines = output.splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[0].startswith("1: power_on -> light_on states "))
+        self.assertTrue(lines[2].startswith("3: coffee,inc -> start states BUSY"))
+
+    def test_explore(self):
+        (status, output) = run(["explore", CVM, "--no-reduce"])
+        self.assertEqual(0, status)
+        self.assertTrue("states: 53" in output.splitlines())
+
+    def test_generate(self):
+        (status, output) = run(["generate", CVM, "--count", "3", "--length", "4",
+                "--seed", "1"])
+        self.assertEqual(3, len(output.splitlines()))
+        (status, output) = run(["generate", CVM, "--count", "3", "--seed", "1",
+                "-o", self.directory])
+        self.assertEqual(1, status)
+        (status, output) = run(["generate", CVM, "--count", "3", "--seed", "1",
+                "-o", self.directory, "--adapter", "pymbt.executor.FakeAdapter",
+                "--adapter-arg", os.path.abspath(CVM)])
+        self.assertEqual([os.path.join(self.directory, "test_generated_0000.py")],
+                output.splitlines())
+
+    def test_translate(self):
+        path = os.path.join(self.directory, "cvm.smv")
+        cache = os.path.join(self.directory, "cvm.cache")
+        (status, output) = run(["translate", CVM, "--range", "m=0..11", "--cache", cache,
+                "-o", path])
+        self.assertEqual((0, ""), (status, output))
+        self.assertTrue(os.path.exists(cache))
+        (status, output) = run(["translate", CVM, "--range", "m=0..11"])
+        with open(path) as fp:
+            self.assertEqual(fp.read(), output)
+        (status, output) = run(["translate", CVM, "--range", "m"])
+        self.assertEqual(1, status)
+        self.assertTrue(output.startswith("error: CLIError"))
+
+    def test_analyse(self):
+        self.assertEqual((0, ""), run(["analyse", CVM]))
+        (status, output) = run(["analyse", CVM, "--input", "power_on"])
+        self.assertEqual(1, status)
+        self.assertTrue("Unreachable state State('BUSY')" in output)
+
+    def test_server(self):
+        path = os.path.join(self.directory, "pymbt.sock")
+        models = ModelCache(freeze=True)
+        server = create_server(path, models)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            for argv in (["simulate", CVM, "power_on", "inc"], ["explore", CVM],
+                    ["analyse", CVM, "--input", "power_on"]):
+                self.assertEqual(run(argv), run(["--server", path] + argv))
+            self.assertEqual(1, models.loads)
+            (status, output) = run(["--server", path, "simulate", "missing.graphml"])
+            self.assertEqual(1, status)
+            self.assertTrue(output.startswith("error: OSError"))
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
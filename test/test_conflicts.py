@@ -0,0 +1,90 @@
+
+import os
+import unittest
+
+from pymbt.conflicts import INF, get_guard_bounds, guards_disjoint
+from pymbt.simulator import Simulator, NonDeterminismError
+from pymbt.statechart import StateChart, State, read_statechart
+from pymbt.transition import make_transition
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+def guard(s):
+    return make_transition("e [%s]" % s).guard_ast
+
+
+class GuardTestCase(unittest.TestCase):
+
+    def test_bounds(self):
+        self.assertEqual({'m': ((0, True), (10, False))},
+                get_guard_bounds(guard("m > 0 and m <= 10")))
+        self.assertEqual({'m': ((0, True), (10, True))}, get_guard_bounds(guard("0 < m < 10")))
+        self.assertEqual({'m': ((1, False), (9, False))},
+                get_guard_bounds(guard("0 < m < 10"), integers=['m']))
+        self.assertEqual({'m': ((0.5, True), (INF, False))},
+                get_guard_bounds(guard("m > 0.5"), integers=['m']))
+        self.assertEqual({}, get_guard_bounds(guard("m > 0 or m < -1")))
+
+    def test_disjoint(self):
+        self.assertTrue(guards_disjoint(guard("m > 1"), guard("m == 1")))
+        self.assertTrue(guards_disjoint(guard("x"), guard("not x")))
+        self.assertFalse(guards_disjoint(guard("m > 1"), guard("m < 3")))
+        self.assertFalse(guards_disjoint(guard("m > 1"), None))
+        # m = 0.5 satisfies both
+        self.assertFalse(guards_disjoint(guard("m < 1"), guard("m > 0")))
+        self.assertTrue(guards_disjoint(guard("m < 1"), guard("m >= 1")))
+        self.assertTrue(guards_disjoint(guard("m < 1 and m > 1"), guard("x")))
+
+
+class ConflictTableTestCase(unittest.TestCase):
+
+    def create_statechart(self):
+        # root: A -e-> B, A -e[x > 0]-> C
+        sc = StateChart("root")
+        (a, b, c) = (State("A"), State("B"), State("C"))
+        for st in (a, b, c):
+            sc.add_state(st)
+        sc.set_start_state(a)
+        sc.init = make_transition("/ x = 1")
+        a.add_transition(make_transition("t1: e"), b)
+        a.add_transition(make_transition("t2: e [x > 0]"), c)
+        return sc
+
+    def test_cvm_deterministic(self):
+        sc = read_statechart(CVM)
+        self.assertEqual([], sc.validate())
+        self.assertEqual(range(len(sc.all_transitions)),
+                [t.index for t in sc.all_transitions])
+
+    def test_cvm_priority(self):
+        sc = read_statechart(CVM)
+        by_name = dict((t.name, t) for t in sc.all_transitions)
+        (t2, t4) = (by_name['t2'], by_name['t4'])
+        self.assertTrue(sc.conflicts.is_conflict(t2, t4))
+        self.assertTrue(sc.conflicts.has_priority(t2, t4))
+        self.assertFalse(sc.conflicts.has_priority(t4, t2))
+        self.assertFalse(sc.conflicts.is_conflict(by_name['t4'], by_name['t5']))
+        self.assertEqual({t2.scope: [t2]}, sc.conflicts.resolve([t4, t2]))
+
+    def test_nondeterminism(self):
+        sc = self.create_statechart()
+        self.assertEqual(1, len(sc.validate()))
+        sim = Simulator(sc)
+        sim.enabled_inputs.add("e")
+        self.assertRaises(NonDeterminismError, sim.step)
+
+    def test_strict_guards_overlap(self):
+        # x = 0.5 enables both
+        sc = StateChart("root")
+        (a, b, c) = (State("A"), State("B"), State("C"))
+        for st in (a, b, c):
+            sc.add_state(st)
+        sc.set_start_state(a)
+        sc.init = make_transition("/ x = 0.5")
+        a.add_transition(make_transition("t1: e [x < 1]"), b)
+        a.add_transition(make_transition("t2: e [x > 0]"), c)
+        self.assertEqual(1, len(sc.validate()))
+        sim = Simulator(sc, flatten=False)
+        sim.enabled_inputs.add("e")
+        self.assertRaises(NonDeterminismError, sim.step)
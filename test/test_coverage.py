@@ -0,0 +1,45 @@
+
+import cPickle as pickle
+import os
+import unittest
+
+from pymbt.coverage import Coverage
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class CoverageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+        self.by_name = dict((t.name, t) for t in self.sc.all_transitions)
+
+    def run_simulator(self, inputs):
+        sim = Simulator(self.sc)
+        coverage = sim.enable_coverage()
+        for event in inputs:
+            sim.enabled_inputs.add(event)
+            sim.next()
+        return coverage
+
+    def test_counts(self):
+        coverage = self.run_simulator(["power_on", "inc", "coffee", "power_off"])
+        t3 = self.by_name['t3']
+        self.assertEqual(1, coverage.transitions[t3.index])
+        self.assertEqual(0, coverage.transitions[self.by_name['t4'].index])
+        self.assertEqual([0, 1], list(coverage.guards[2 * t3.index:2 * t3.index + 2]))
+        off = self.by_name['t1'].source
+        self.assertEqual(2, coverage.states[off.index])
+        summary = coverage.get_summary()
+        self.assertEqual((5, 10), summary['transitions'])
+        self.assertEqual(4, summary['event pairs'][0])
+
+    def test_merge(self):
+        coverage = self.run_simulator(["power_on", "inc", "coffee"])
+        other = pickle.loads(pickle.dumps(self.run_simulator(["power_on", "inc", "inc"])))
+        coverage += other
+        self.assertEqual(2, coverage.transitions[self.by_name['t5'].index])
+        self.assertEqual(1, coverage.transitions[self.by_name['t6'].index])
+        self.assertTrue("StateChart('MONEY'):" in coverage.report(self.sc))
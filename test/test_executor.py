@@ -0,0 +1,115 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pymbt.executor import Executor, FakeAdapter, Adapter
+from pymbt.generator import generate_random_sequences
+from pymbt.simulator import Simulator
+from pymbt.statechart import StateChart, State, read_statechart
+from pymbt.transition import make_transition
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class BrokenAdapter(Adapter):
+
+    def reset(self):
+        raise IOError("SUT not responding")
+
+
+class ClosedAdapter(FakeAdapter):
+    """Adapter creating a file in directory when closed, also from worker
+    processes.
+    """
+
+    def __init__(self, directory, *args):
+        FakeAdapter.__init__(self, *args)
+        self.directory = directory
+
+    def close(self):
+        os.close(tempfile.mkstemp(dir=self.directory)[0])
+
+
+class ExecutorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+        self.sequences = list(generate_random_sequences(self.sc, 20, 10, seed=3))
+
+    def get_fault(self):
+        """Returns a fault at the fifth step of the second sequence.
+        """
+        sim = Simulator(self.sc)
+        for (inputs, outputs) in self.sequences[1].steps[:4]:
+            sim.enabled_inputs.update(inputs)
+            sim.next()
+        inputs = self.sequences[1].steps[4][0]
+        return {(sim.get_configuration(), frozenset(inputs)): set(["bogus"])}
+
+    def test_pass(self):
+        for (workers, use_threads) in [(0, False), (2, True), (2, False)]:
+            executor = Executor(CVM, FakeAdapter, (CVM,), workers=workers,
+                    use_threads=use_threads)
+            report = executor.run(self.sequences)
+            self.assertTrue(report.passed, str(report))
+            self.assertEqual(range(20), [result.number for result in report.results])
+            self.assertEqual(sum(len(seq) for seq in self.sequences), report.steps)
+            self.assertTrue(report.throughput > 0)
+
+    def test_divergence(self):
+        executor = Executor(CVM, FakeAdapter, (CVM, 0.0, self.get_fault()), workers=0)
+        report = executor.run(self.sequences)
+        self.assertFalse(report.passed)
+        self.assertEqual(2, len(report.results))
+        [failure] = report.failures
+        self.assertEqual(1, failure.number)
+        self.assertEqual(5, failure.steps)
+        self.assertEqual(["bogus"], failure.divergence[3])
+        self.assertTrue("FAILED" in str(report))
+
+    def test_no_fail_fast(self):
+        executor = Executor(self.sc, FakeAdapter, (self.sc, 0.0, self.get_fault()),
+                workers=2, use_threads=True, fail_fast=False)
+        report = executor.run(self.sequences)
+        self.assertEqual(20, len(report.results))
+        self.assertTrue(len(report.failures) >= 1)
+
+    def test_adapter_error(self):
+        report = Executor(CVM, BrokenAdapter, workers=0).run(self.sequences)
+        [failure] = report.failures
+        self.assertTrue("SUT not responding" in failure.error)
+        self.assertTrue(failure.error.startswith("adapter IOError"))
+
+    def test_model_error(self):
+        # A -e-> B and A -e[x > 0]-> C are both enabled
+        sc = StateChart("root")
+        (a, b, c) = (State("A"), State("B"), State("C"))
+        for st in (a, b, c):
+            sc.add_state(st)
+        sc.set_start_state(a)
+        sc.init = make_transition("/ x = 1")
+        a.add_transition(make_transition("e"), b)
+        a.add_transition(make_transition("e [x > 0]"), c)
+        for schedule in (False, True):
+            executor = Executor(sc, FakeAdapter, (CVM,), workers=0, schedule=schedule)
+            [failure] = executor.run([[(["e"], [])]]).failures
+            self.assertTrue(failure.error.startswith("model NonDeterminismError"),
+                    failure.error)
+
+    def test_close_adapters(self):
+        # stopping at the failing sequence
+        for (workers, use_threads) in [(0, False), (2, True), (2, False)]:
+            directory = tempfile.mkdtemp()
+            try:
+                report = Executor(CVM, ClosedAdapter, (directory, CVM, 0.0, self.get_fault()),
+                        workers=workers, use_threads=use_threads).run(self.sequences)
+                self.assertFalse(report.passed)
+                self.assertEqual(max(workers, 1), len(os.listdir(directory)))
+            finally:
+                shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
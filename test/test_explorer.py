@@ -0,0 +1,91 @@
+
+import os
+import unittest
+
+from pymbt.explorer import Explorer, Independence
+from pymbt.statechart import StateChart, AndState, State, read_statechart
+from pymbt.transition import make_transition
+from pymbt.frontier import DiskFrontier
+from pymbt.visited import HashCompactStore, BitStateStore, DiskVisitedStore
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+def create_regions_statechart(nregions, nstates=3):
+    """Returns a statechart with an AND-state of nregions independent
+    regions, each a cycle of nstates states on event a<region>.
+    """
+    root = StateChart("root")
+    and_state = AndState("P")
+    root.add_state(and_state)
+    root.set_start_state(and_state)
+    root.init = make_transition("/ x = 0")
+    for i in range(nregions):
+        region = StateChart("R%d" % i)
+        and_state.add_state(region)
+        states = [State("S%d_%d" % (i, j)) for j in range(nstates)]
+        for state in states:
+            region.add_state(state)
+        region.set_start_state(states[0])
+        region.init = make_transition("")
+        for j in range(nstates):
+            states[j].add_transition(make_transition("a%d" % i), states[(j + 1) % nstates])
+    root.compile()
+    return root
+
+
+class ExplorerTestCase(unittest.TestCase):
+
+    def explore(self, sc, **kwargs):
+        explorer = Explorer(sc, **kwargs)
+        explorer.explore()
+        return explorer
+
+    def test_independence(self):
+        independence = Independence(read_statechart(CVM))
+        self.assertTrue(independence.is_independent("done", "inc"))
+        self.assertFalse(independence.is_independent("coffee", "inc"))  # via dec/m
+        self.assertFalse(independence.is_independent("power_off", "inc"))
+
+    def test_cvm(self):
+        explorer = self.explore(read_statechart(CVM), reduce=False)
+        self.assertEqual(len(explorer.nodes), explorer.stats['states'])
+        off = explorer.initial
+        self.assertEqual(["power_on"], [data['inputs'][0] for (_, _, data) in
+                explorer.graph.out_edges(explorer.nodes[off], data=True)])
+
+    def test_partial_order_reduction(self):
+        full = self.explore(create_regions_statechart(4), max_inputs=2, reduce=False)
+        reduced = self.explore(create_regions_statechart(4), max_inputs=2)
+        self.assertEqual(81, full.stats['states'])
+        self.assertEqual(set(full.nodes), set(reduced.nodes))
+        self.assertTrue(reduced.stats['edges'] < full.stats['edges'] / 5)
+
+    def test_probabilistic_stores(self):
+        for visited in (HashCompactStore(capacity=1000), BitStateStore(size=1 << 16)):
+            explorer = self.explore(create_regions_statechart(4), visited=visited,
+                    record_graph=False)
+            self.assertEqual(81, explorer.stats['states'])
+            self.assertEqual(81, len(visited))
+            self.assertTrue(0 <= explorer.stats['omission_probability'] < 1e-3)
+
+    def test_disk_frontier(self):
+        frontier = DiskFrontier(max_items=4, batch_size=3)
+        for item in range(20):
+            frontier.append(item)
+        self.assertEqual(20, len(frontier))
+        self.assertTrue(frontier.batches)
+        self.assertEqual(range(20), [frontier.popleft() for _ in range(20)])
+        frontier.close()
+
+    def test_out_of_core(self):
+        frontier = DiskFrontier(max_items=8, batch_size=4)
+        visited = DiskVisitedStore(batch_size=16)
+        explorer = self.explore(create_regions_statechart(4), max_inputs=2,
+                frontier=frontier, visited=visited)
+        self.assertEqual(81, explorer.stats['states'])
+        self.assertEqual(81, len(visited))
+        self.assertEqual(81, len(explorer.nodes))
+        self.assertTrue(frontier.spilled)
+        frontier.close()
+        visited.close()
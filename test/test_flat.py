@@ -0,0 +1,85 @@
+
+import os
+import unittest
+
+from pymbt.flat import can_flatten, get_flat_table
+from pymbt.simulator import Simulator
+from pymbt.statechart import StateChart, AndState, State, read_statechart
+from pymbt.transition import make_transition
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+def create_lamp_statechart():
+    """Returns a statechart without variables: OFF and an AND-state ON of
+    a light region and a timer region linked by a local event.
+    """
+    root = StateChart("root")
+    (off, on) = (State("OFF"), AndState("ON"))
+    (light, timer) = (StateChart("LIGHT"), StateChart("TIMER"))
+    (dim, bright, idle, running) = (State("DIM"), State("BRIGHT"), State("IDLE"),
+            State("RUNNING"))
+    for (parent, children) in ((root, [off, on]), (on, [light, timer]),
+            (light, [dim, bright]), (timer, [idle, running])):
+        for child in children:
+            parent.add_state(child)
+    for (chart, start) in ((root, off), (light, dim), (timer, idle)):
+        chart.set_start_state(start)
+        chart.init = make_transition("")
+    off.add_transition(make_transition("power / light_on"), on)
+    on.add_transition(make_transition("power / light_off"), off)
+    dim.add_transition(make_transition("press / up"), bright)
+    bright.add_transition(make_transition("press / down"), dim)
+    idle.add_transition(make_transition("up / started"), running)
+    running.add_transition(make_transition("tick / expired; down"), idle)
+    root.locals = set(["up", "down"])
+    root.compile()
+    return root
+
+
+class FlatTableTestCase(unittest.TestCase):
+
+    def test_can_flatten(self):
+        self.assertFalse(can_flatten(read_statechart(CVM)))
+        self.assertEqual(None, Simulator(read_statechart(CVM)).flat)
+        sc = create_lamp_statechart()
+        self.assertTrue(can_flatten(sc))
+        # built on the first big step, not by the simulator
+        sim = Simulator(sc)
+        self.assertEqual(None, sc.flat)
+        sim.inputs.power.fire()
+        self.assertTrue(sc.flat is not None)
+        table = get_flat_table(sc)
+        self.assertEqual(["power", "press", "tick"], table.events)
+        # OFF plus ON x {DIM, BRIGHT} x {IDLE, RUNNING}
+        self.assertEqual(5, len(table.configurations))
+        self.assertEqual(15, len(table.next_ids))
+
+    def test_same_as_hierarchical(self):
+        (sc1, sc2) = (create_lamp_statechart(), create_lamp_statechart())
+        (flat, sim) = (Simulator(sc1, seed=2), Simulator(sc2, seed=2, flatten=False))
+        self.assertTrue(flat.flat is not None)
+        for _ in range(100):
+            self.assertEqual(sim.random_step(), flat.random_step())
+            self.assertEqual(sim.outputs, flat.outputs)
+            self.assertEqual(sim.get_configuration(), flat.get_configuration())
+            self.assertEqual(sorted(st.label for st in sim.active_states),
+                    sorted(st.label for st in flat.active_states))
+            self.assertEqual([t.get_label() for t in sim.fired],
+                    [t.get_label() for t in flat.fired])
+        self.assertTrue(flat.flat_id is not None)
+
+    def test_fall_back(self):
+        sim = Simulator(create_lamp_statechart())
+        sim.enabled_inputs.update(["power", "press"])
+        sim.next()
+        self.assertEqual(None, sim.flat_id)
+        sim.inputs.press.fire()
+        self.assertEqual(set(["started"]), sim.outputs)
+        # stepping by hand leaves the table untouched
+        on = sim.flat.active_states[sim.flat_id]
+        copy = dict(on)
+        sim.inputs.power.enable()
+        sim.step()
+        self.assertEqual(["OFF"], [st.label for st in sim.active_states])
+        self.assertEqual(copy, on)
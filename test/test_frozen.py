@@ -0,0 +1,53 @@
+
+import os
+import threading
+import unittest
+
+from pymbt.explorer import Explorer
+from pymbt.frozen import freeze, FrozenError
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class FreezeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+        self.frozen = freeze(read_statechart(CVM))
+
+    def test_immutable(self):
+        frozen = self.frozen
+        self.assertRaises(FrozenError, setattr, frozen, 'label', 'x')
+        self.assertRaises(FrozenError, setattr, frozen.all_transitions[0], 'event', 'x')
+        self.assertRaises(AttributeError, getattr, frozen.states[0], '__dict__')
+        self.assertTrue(isinstance(frozen.states, tuple))
+        self.assertEqual(self.sc.get_fingerprint(), frozen.get_fingerprint())
+        self.assertEqual(self.sc.to_string(), frozen.to_string())
+        self.assertEqual(repr(self.sc.all_transitions[0]), repr(frozen.all_transitions[0]))
+
+    def test_simulate(self):
+        (sim1, sim2) = (Simulator(self.sc, seed=4), Simulator(self.frozen, seed=4))
+        for _ in range(50):
+            self.assertEqual(sim1.random_step(), sim2.random_step())
+            self.assertEqual(sim1.outputs, sim2.outputs)
+            self.assertEqual(sim1.get_configuration(), sim2.get_configuration())
+        self.assertEqual(Explorer(self.sc).explore().number_of_edges(),
+                Explorer(self.frozen).explore().number_of_edges())
+
+    def test_shared(self):
+        results = dict()
+
+        def run(seed):
+            sim = Simulator(self.frozen, seed=seed)
+            results[seed] = [(sim.random_step(), sim.get_configuration()) for _ in range(200)]
+        threads = [threading.Thread(target=run, args=(seed,)) for seed in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for seed in range(4):
+            sim = Simulator(self.sc, seed=seed)
+            self.assertEqual([(sim.random_step(), sim.get_configuration()) for _ in range(200)],
+                    results[seed])
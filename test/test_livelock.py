@@ -0,0 +1,75 @@
+
+import unittest
+
+from pymbt.simulator import Simulator, LivelockError
+from pymbt.statechart import StateChart, State
+from pymbt.transition import Transition, make_transition
+
+
+def create_pingpong_statechart():
+    """Returns a statechart which, after go, passes the local events ping
+    and pong back and forth forever.
+    """
+    root = StateChart("root")
+    (a, b) = (State("A"), State("B"))
+    root.add_state(a)
+    root.add_state(b)
+    root.set_start_state(a)
+    root.init = make_transition("")
+    a.add_transition(make_transition("go / ping"), b)
+    b.add_transition(make_transition("ping / pong"), a)
+    a.add_transition(make_transition("pong / ping"), b)
+    b.add_transition(make_transition("stop"), a)
+    root.locals = set(["ping", "pong"])
+    root.compile()
+    return root
+
+
+def create_counter_statechart():
+    """Returns a statechart which, after go, counts up forever.
+    """
+    root = StateChart("root")
+    counting = State("COUNTING")
+    root.add_state(counting)
+    root.set_start_state(counting)
+    root.init = make_transition("/ n = 0")
+    counting.add_transition(Transition("go", outputs=["tick"]), counting)
+    counting.add_transition(Transition("tick", outputs=["tick"], action="n = n + 1"), counting)
+    root.locals = set(["tick"])
+    root.compile()
+    return root
+
+
+class LivelockTestCase(unittest.TestCase):
+
+    def test_cycle(self):
+        sim = Simulator(create_pingpong_statechart())
+        self.assertEqual(None, sim.flat)
+        sim.enabled_inputs.add("go")
+        try:
+            sim.next()
+        except LivelockError as e:
+            self.assertEqual(["ping / pong", "pong / ping"],
+                    [t.get_label() for t in e.cycle])
+        else:
+            self.fail("LivelockError not raised")
+
+    def test_terminating(self):
+        sim = Simulator(create_pingpong_statechart())
+        sim.enabled_inputs.add("stop")
+        sim.next()
+        self.assertEqual(["A"], [st.label for st in sim.active_states if st.is_basic()])
+
+    def test_budget(self):
+        sim = Simulator(create_counter_statechart())
+        sim.max_microsteps = 100
+        sim.enabled_inputs.add("go")
+        try:
+            sim.next()
+        except LivelockError as e:
+            self.assertEqual(10, len(e.cycle))
+            self.assertEqual(set(["tick"]), set(t.event for t in e.cycle))
+        else:
+            self.fail("LivelockError not raised")
+        self.assertEqual(100, sim.variables['n'])
+
@@ -0,0 +1,62 @@
+
+import cPickle as pickle
+import os
+import shutil
+import tempfile
+import unittest
+
+from pymbt.loader import find_files, load_statecharts
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class LoaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(CVM) as fp:
+            lines = fp.read().splitlines(True)
+        # lines 15-479 are the top level graph
+        graph = "".join(lines[14:479])
+        os.mkdir(os.path.join(self.directory, "sub"))
+        self.write("cvm.graphml", "".join(lines))
+        self.write("sub/two.graphml", "".join(lines[:479]) + graph + "".join(lines[479:]))
+        self.write("broken.graphml", "".join(lines[:100]))
+        self.write("notes.txt", "")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        with open(os.path.join(self.directory, name), 'w') as fp:
+            fp.write(data)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_find_files(self):
+        expected = [self.path("broken.graphml"), self.path("cvm.graphml"),
+                self.path("sub/two.graphml")]
+        self.assertEqual(expected, find_files(self.directory))
+        self.assertEqual(expected[:2], find_files(self.path("*.graphml")))
+
+    def test_load(self):
+        fingerprint = read_statechart(CVM).get_fingerprint()
+        for processes in (0, 2):
+            (statecharts, errors) = load_statecharts(self.directory, processes=processes)
+            self.assertEqual([(self.path("cvm.graphml"), 0), (self.path("sub/two.graphml"), 0),
+                    (self.path("sub/two.graphml"), 1)], sorted(statecharts))
+            self.assertEqual([self.path("broken.graphml")], errors.keys())
+            for sc in statecharts.values():
+                self.assertEqual(fingerprint, sc.get_fingerprint())
+
+    def test_pickle(self):
+        sc = read_statechart(CVM)
+        sc2 = pickle.loads(pickle.dumps(sc, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(sc.get_fingerprint(), sc2.get_fingerprint())
+        (sim1, sim2) = (Simulator(sc, seed=1), Simulator(sc2, seed=1))
+        for _ in range(30):
+            self.assertEqual(sim1.random_step(), sim2.random_step())
+            self.assertEqual(sim1.get_configuration(), sim2.get_configuration())
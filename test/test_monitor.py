@@ -0,0 +1,129 @@
+
+import os
+import unittest
+
+from pymbt.monitor import MonitorError, MonitorSet, PropertyViolation
+from pymbt.simulator import Simulator
+from pymbt.statechart import StateChart, State, read_statechart
+from pymbt.transition import ParseError, make_transition
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class MonitorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+
+    def run_steps(self, properties, steps, flatten=True, **kwargs):
+        sim = Simulator(self.sc, flatten=flatten)
+        monitors = sim.enable_monitors(MonitorSet(self.sc, properties, **kwargs))
+        for inputs in steps:
+            sim.enabled_inputs.update(inputs)
+            sim.next()
+        return monitors
+
+    def test_holds(self):
+        monitors = self.run_steps([
+                "m <= 10",
+                "implies(event('start'), once(event('inc')))",
+                "implies(active('BUSY'), previous(active('IDLE')))",
+                "implies(active('BUSY'), since(not event('done'), event('start')))",
+                "implies(event('dec'), previous(m) == m + 1 or m == 0)",
+                "historically(active('OFF') or active('ON'))",
+        ], [["power_on"], ["inc"], ["inc"], ["coffee"], ["done"], ["coffee"], ["power_off"]])
+        self.assertEqual(7, monitors.step)
+        self.assertEqual([], monitors.violations)
+
+    def test_violation_step(self):
+        for flatten in (True, False):
+            try:
+                self.run_steps({'never busy': "historically(not active('BUSY'))"},
+                        [["power_on"], ["inc"], ["coffee"], ["done"]], flatten=flatten)
+            except PropertyViolation as e:
+                self.assertEqual(('never busy', 3), (e.name, e.step))
+            else:
+                self.fail("No violation")
+
+    def test_collect_violations(self):
+        monitors = self.run_steps({'low': "m < 2", 'empty': "active('EMPTY')"},
+                [["power_on"], ["inc"], ["inc"], ["inc"]], raise_violations=False)
+        self.assertEqual([('empty', 2), ('empty', 3), ('empty', 4), ('low', 3), ('low', 4)],
+                sorted(monitors.violations))
+
+    def test_previous_first_step(self):
+        monitors = self.run_steps(["not previous(True)"], [["power_on"]])
+        self.assertEqual([], monitors.violations)
+        self.assertRaises(PropertyViolation, self.run_steps, ["not previous(True)"],
+                [["power_on"], ["inc"]])
+
+    def test_reset(self):
+        sim = Simulator(self.sc)
+        initial = sim.get_configuration()
+        monitors = sim.enable_monitors(MonitorSet(self.sc, ["not once(event('inc'))"],
+                raise_violations=False))
+        for inputs in (["power_on"], ["inc"]):
+            sim.enabled_inputs.update(inputs)
+            sim.next()
+        self.assertEqual([("not once(event('inc'))", 2)], monitors.violations)
+        sim.set_configuration(initial)
+        sim.enable_monitors(monitors)
+        sim.enabled_inputs.add("power_on")
+        sim.next()
+        self.assertEqual((1, []), (monitors.step, monitors.violations))
+
+    def test_many(self):
+        properties = ["m <= %d" % i for i in range(100, 300)]
+        monitors = self.run_steps(properties, [["power_on"]] + [["inc"]] * 10)
+        self.assertEqual(([], 11), (monitors.violations, monitors.step))
+
+    def test_operands_always_evaluated(self):
+        sim = Simulator(self.sc)
+        monitors = sim.enable_monitors(MonitorSet(self.sc, ["m == 0 or once(10 / m > 1)"]))
+        sim.enabled_inputs.add("power_on")
+        self.assertRaises(MonitorError, sim.next)
+        self.assertEqual([False], monitors.bits)
+        monitors = self.run_steps(["m == 0 or once(m != 0 and 10 / m > 1)"],
+                [["power_on"], ["inc"]])
+        self.assertEqual([True], monitors.bits)
+
+    def test_failure_keeps_bits(self):
+        sim = Simulator(self.sc)
+        monitors = sim.enable_monitors(MonitorSet(self.sc,
+                ["once(event('inc'))", "previous(1 / (m - 1) > 0) or True"],
+                raise_violations=False))
+        sim.enabled_inputs.add("power_on")
+        sim.next()
+        sim.enabled_inputs.add("inc")
+        self.assertRaises(MonitorError, sim.next)  # 1 / 0
+        self.assertEqual([False, False], monitors.bits)
+
+    def test_timeout_events(self):
+        sc = StateChart("root")
+        (idle, busy) = (State("IDLE"), State("BUSY"))
+        for st in (idle, busy):
+            sc.add_state(st)
+        sc.set_start_state(idle)
+        sc.init = make_transition("")
+        idle.add_transition(make_transition("start"), busy)
+        busy.add_transition(make_transition("after(30s) / timeout"), idle)
+        sc.compile()
+        sim = Simulator(sc)
+        monitors = sim.enable_monitors(MonitorSet(sc, {
+                'timeout': "implies(event('after(30s)'), event('timeout'))",
+                'no timeout': "not event('after(30s)')"}, raise_violations=False))
+        sim.inputs.start.fire()
+        sim.advance()
+        self.assertEqual([('no timeout', 2)], monitors.violations)
+
+    def test_errors(self):
+        self.assertRaises(ParseError, MonitorSet, self.sc, ["m >"])
+        self.assertRaises(MonitorError, MonitorSet, self.sc, ["n > 0"])
+        self.assertRaises(MonitorError, MonitorSet, self.sc, ["active('NONE')"])
+        self.assertRaises(MonitorError, MonitorSet, self.sc, ["active(m)"])
+        self.assertRaises(MonitorError, MonitorSet, self.sc, ["since(m > 0)"])
+        self.assertRaises(MonitorError, MonitorSet, self.sc, ["once(p=m)"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+
+import os
+import unittest
+
+from pymbt.conflicts import ConflictTable
+from pymbt.generator import generate_random_sequences
+from pymbt.mutation import (MutationError, generate_mutants, run_mutant, analyse_mutants)
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class MutationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+        self.sequences = list(generate_random_sequences(self.sc, 30, 15, seed=5))
+        self.suite = [seq.steps for seq in self.sequences]
+
+    def get_mutant(self, operator, description):
+        mutants = [mutant for mutant in generate_mutants(self.sc, [operator])
+                if mutant.description == description]
+        self.assertEqual(1, len(mutants), description)
+        return mutants[0]
+
+    def test_generate(self):
+        mutants = generate_mutants(self.sc)
+        self.assertEqual(set(['destination', 'event', 'guard', 'action', 'output']),
+                set(mutant.operator for mutant in mutants))
+        # 4 guard comparisons each replaced by 5 others
+        self.assertEqual(20, len(generate_mutants(self.sc, ["guard"])))
+        self.assertRaises(MutationError, generate_mutants, self.sc, ['bogus'])
+
+    def get_tables(self):
+        table = self.sc.conflicts
+        return [(name, getattr(table, name)) for name in ('rank', 'conflicts', 'lower',
+                'nondeterministic')]
+
+    def test_apply_revert(self):
+        fingerprint = self.sc.get_fingerprint()
+        tables = self.get_tables()
+        for description in ["t5 : inc / m =1: destination NOTEMPTY -> EMPTY",
+                "t1 : power_on / light_on: destination ON -> OFF"]:
+            mutant = self.get_mutant('destination', description)
+            saved = mutant.apply(self.sc)
+            self.assertNotEqual(fingerprint, self.sc.get_fingerprint())
+            # updated in place as if built for the mutant
+            updated = self.get_tables()
+            self.sc.conflicts = ConflictTable(self.sc)
+            self.assertEqual(self.get_tables(), updated)
+            mutant.revert(self.sc, saved)
+            self.assertEqual(fingerprint, self.sc.get_fingerprint())
+            self.assertEqual(tables, self.get_tables())
+
+    def test_run_mutant(self):
+        mutant = self.get_mutant('output', "t1 : power_on / light_on: output light_on removed")
+        order = range(len(self.suite))
+        (number, reason) = run_mutant(self.sc, mutant, self.suite, order)
+        self.assertEqual(number, order[0])
+        self.assertTrue("outputs []" in reason)
+        mutant = self.get_mutant('guard', "t8 : dec [m==1] / m =0: guard Eq -> LtE")
+        self.assertEqual(None, run_mutant(self.sc, mutant, self.suite))
+        # the simulator of the original model is unaffected
+        sim = Simulator(self.sc)
+        sim.enabled_inputs.add("power_on")
+        sim.next()
+        self.assertEqual(set(["light_on"]), sim.outputs)
+
+    def test_analyse(self):
+        fingerprint = self.sc.get_fingerprint()
+        report = analyse_mutants(self.sc, self.sequences, processes=0)
+        self.assertEqual(fingerprint, self.sc.get_fingerprint())
+        self.assertEqual(len(report.results), len(report.killed) + len(report.survivors))
+        self.assertTrue(0.5 < report.score < 1.0)
+        self.assertTrue(str(report).startswith("killed %d/" % len(report.killed)))
+        report2 = analyse_mutants(CVM, self.sequences, processes=2)
+        self.assertEqual([m.description for m in report.survivors],
+                [m.description for m in report2.survivors])
@@ -0,0 +1,73 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pymbt.nusmv.nusmv import to_nusmv
+from pymbt.nusmv.translator import NuSMVModel, FragmentCache
+from pymbt.statechart import read_statechart
+from pymbt.transition import make_transition
+from test.test_timers import create_machine_statechart
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class TranslateTestCase(unittest.TestCase):
+
+    def test_expressions(self):
+        self.assertEqual("m > 0 & m < 10", to_nusmv("m > 0 and m < 10"))
+        self.assertEqual("0 < m & m < 10", to_nusmv("0 < m < 10"))
+        self.assertEqual("!(x | y)", to_nusmv("not (x or y)"))
+        self.assertEqual("(m + 1) * 2", to_nusmv("(m + 1) * 2"))
+
+
+class NuSMVModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_model(self):
+        lines = NuSMVModel(read_statechart(CVM), ranges={'m': '0..11'}).to_string().splitlines()
+        for line in ["  m: 0..11;", "  in-idle := in-coffee & COFFEE=idle;",
+                "  mayoccur-t3 := in-idle & m > 0 & coffee;",
+                "  enabled-t2 := mayoccur-t2;", "  init(m) := 0;", "  next(start) := next(t3);"]:
+            self.assertTrue(line in lines, line)
+        # power on enters the start states of both regions
+        start = lines.index("  next(MONEY) := case")
+        self.assertTrue("    next(t1): empty;" in lines[start:lines.index("  esac;", start)])
+
+    def test_cache(self):
+        path = os.path.join(self.directory, "cvm.smv")
+        cache = FragmentCache(path + ".cache")
+        NuSMVModel(read_statechart(CVM), cache=cache).write_file(path)
+        cache.save()
+        with open(path) as fp:
+            expected = fp.read()
+        cache = FragmentCache(path + ".cache")
+        model = NuSMVModel(read_statechart(CVM), cache=cache)
+        self.assertEqual(expected, model.to_string())
+        self.assertEqual(0, cache.misses)
+        # only the changed guard is translated again
+        sc = read_statechart(CVM)
+        [transition] = [t for t in sc.all_transitions if t.guard_s == "m<10"]
+        changed = make_transition("inc [m < 9]")
+        (transition.guard_s, transition.guard_ast) = (changed.guard_s, changed.guard_ast)
+        misses = cache.misses
+        text = NuSMVModel(sc, cache=cache).to_string()
+        self.assertEqual(1, cache.misses - misses)
+        self.assertTrue("  mayoccur-t6 := in-notempty & m < 9 & inc;" in text)
+
+    def test_timeouts(self):
+        text = NuSMVModel(create_machine_statechart()).to_string()
+        self.assertFalse("after(" in text)
+        lines = text.splitlines()
+        for line in ["  timeout-t3: boolean;", "  mayoccur-t3 := in-busy & TRUE & timeout-t3;",
+                "  init(timeout-t3) := FALSE;",
+                "  next(timeout-t3) := stable ? {TRUE, FALSE} : FALSE;"]:
+            self.assertTrue(line in lines, line)
+        self.assertTrue("timeout-t4" in [line for line in lines
+                if line.startswith("  stable := ")][0])
@@ -0,0 +1,122 @@
+
+import os
+import unittest
+
+from pymbt.executor import Executor, FakeAdapter
+from pymbt.generator import generate_random_sequences
+from pymbt.schedule import PrefixTrie, TrieExecution
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+SEQUENCES = [
+    [(("power_on",), ()), (("inc",), ()), (("coffee",), ())],
+    [(("power_on",), ()), (("inc",), ())],
+    [(("power_on",), ()), (("inc",), ()), (("inc",), ())],
+    [(("power_on",), ()), (("power_off",), ())],
+]
+
+
+class FlakyAdapter(FakeAdapter):
+    """Adapter producing faults only after its first reset, e.g. when
+    replaying a prefix.
+    """
+
+    def __init__(self, model, faults):
+        FakeAdapter.__init__(self, model)
+        self.replay_faults = faults
+
+    def reset(self):
+        FakeAdapter.reset(self)
+        if self.resets > 1:
+            self.faults = self.replay_faults
+
+
+class PrefixTrieTestCase(unittest.TestCase):
+
+    def test_trie(self):
+        trie = PrefixTrie(SEQUENCES)
+        self.assertEqual(4, trie.count)
+        # power_on, inc, coffee, inc, power_off
+        self.assertEqual(5, len(trie))
+        [power_on] = trie.root.children
+        self.assertEqual([("inc",), ("power_off",)], [n.inputs for n in power_on.children])
+        self.assertEqual([1], power_on.children[0].sequences)
+        # branches after power_on and power_on, inc
+        self.assertEqual((3, 3), trie.get_cost(checkpoints=False))
+        self.assertEqual((1, 0), trie.get_cost(checkpoints=True))
+
+
+class TrieExecutionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+        self.sim = Simulator(self.sc)
+        self.initial = self.sim.get_configuration()
+
+    def execute(self, adapter, sequences=SEQUENCES):
+        execution = TrieExecution(self.sim, self.initial, adapter)
+        results = execution.run(PrefixTrie(sequences).root)
+        return (execution, sorted(results, key=lambda result: result.number))
+
+    def test_replay(self):
+        adapter = FakeAdapter(self.sc)
+        (execution, results) = self.execute(adapter)
+        self.assertEqual([True] * 4, [result.passed for result in results])
+        self.assertEqual([3, 2, 3, 2], [result.steps for result in results])
+        self.assertEqual((3, 3), (execution.resets, execution.replayed))
+        self.assertEqual(3, adapter.resets)
+        # 5 steps plus 3 replayed
+        self.assertEqual(8, sum(len(result.latencies) for result in results))
+
+    def test_checkpoints(self):
+        adapter = FakeAdapter(self.sc, checkpoints=True)
+        (execution, results) = self.execute(adapter)
+        self.assertEqual([True] * 4, [result.passed for result in results])
+        self.assertEqual((1, 0, 2), (execution.resets, execution.replayed, execution.restores))
+        self.assertEqual(5, sum(len(result.latencies) for result in results))
+        self.assertEqual({}, execution.saved)
+
+    def test_divergence(self):
+        sim = Simulator(self.sc)
+        sim.enabled_inputs.add("power_on")
+        sim.next()
+        faults = {(sim.get_configuration(), frozenset(["inc"])): set(["bogus"])}
+        for checkpoints in (False, True):
+            adapter = FakeAdapter(self.sc, faults=faults, checkpoints=checkpoints)
+            (execution, results) = self.execute(adapter)
+            self.assertEqual([False, False, False, True], [result.passed for result in results])
+            self.assertEqual((1, ("inc",), [], ["bogus"]), results[0].divergence)
+
+
+    def test_replay_divergence(self):
+        sim = Simulator(self.sc)
+        sim.enabled_inputs.add("power_on")
+        sim.next()
+        faults = {(sim.get_configuration(), frozenset(["inc"])): set(["bogus"])}
+        # replaying power_on, inc for the third sequence diverges
+        (execution, results) = self.execute(FlakyAdapter(self.sc, faults))
+        self.assertEqual([True, True, False, True], [result.passed for result in results])
+        self.assertEqual((None, 2), (results[2].error, results[2].steps))
+        self.assertEqual((1, ("inc",), [], ["bogus"]), results[2].divergence)
+
+
+class ScheduledExecutorTestCase(unittest.TestCase):
+
+    def test_run(self):
+        sc = read_statechart(CVM)
+        sequences = list(generate_random_sequences(sc, 50, 10, seed=3))
+        for (workers, checkpoints) in [(0, False), (0, True), (2, True)]:
+            executor = Executor(sc, FakeAdapter, (sc, 0.0, None, checkpoints), workers=workers,
+                    use_threads=True, schedule=True)
+            report = executor.run(sequences)
+            self.assertTrue(report.passed, str(report))
+            self.assertEqual(range(50), [result.number for result in report.results])
+            if checkpoints:
+                # a reset per group of sequences with the same first step
+                self.assertTrue(report.resets <= 3)
+                self.assertEqual(len(PrefixTrie(sequences)), report.steps)
+            else:
+                # these sequences are not prefixes of each other
+                self.assertEqual(50, report.resets)
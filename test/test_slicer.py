@@ -0,0 +1,52 @@
+
+import os
+import unittest
+
+from pymbt.simulator import Simulator
+from pymbt.slicer import ConeOfInfluence, slice_statechart
+from pymbt.statechart import StateChart, State, read_statechart
+from pymbt.transition import Transition
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class SlicerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = read_statechart(CVM)
+
+    def test_cone(self):
+        cone = ConeOfInfluence(self.sc, states=["BUSY"])
+        self.assertEqual(set(['m']), cone.variables)
+        self.assertTrue("dec" in cone.events)
+
+    def test_slice_output(self):
+        sliced = slice_statechart(self.sc, outputs=["light_on"])
+        self.assertEqual(["root", "ON", "OFF"], [st.label for st in sliced.all_states])
+        self.assertEqual(["t2", "t1"], [t.name for t in sliced.all_transitions])
+        self.assertEqual(None, sliced.init.action)
+        sim = Simulator(sliced)
+        sim.enabled_inputs.add("power_on")
+        sim.next()
+        self.assertEqual(set(["light_on"]), sim.outputs)
+        self.assertEqual({}, sim.variables)
+
+    def test_assignment_read_later(self):
+        # v only becomes relevant after t1, which reads w, is in the cone
+        root = StateChart("root")
+        (a, b) = (State("A"), State("B"))
+        root.add_state(a)
+        root.add_state(b)
+        root.set_start_state(a)
+        root.init = Transition("", action="v = 0; w = 5")
+        a.add_transition(Transition("go", outputs=["o"], action="v = w", name="t1"), b)
+        b.add_transition(Transition("go2", guard="v > 0", outputs=["p"], name="t2"), a)
+        root.compile()
+        sliced = slice_statechart(root, outputs=["o", "p"])
+        self.assertEqual(set(["v", "w"]), ConeOfInfluence(root, outputs=["o", "p"]).variables)
+        sim = Simulator(sliced)
+        for (event, outputs) in (("go", ["o"]), ("go2", ["p"])):
+            sim.enabled_inputs.add(event)
+            sim.next()
+            self.assertEqual(set(outputs), sim.outputs)
+        self.assertEqual({'v': 5, 'w': 5}, sim.variables)
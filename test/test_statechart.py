@@ -0,0 +1,46 @@
+
+import os
+import unittest
+
+from pymbt.conflicts import ConflictTable
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class LazyLoadTestCase(unittest.TestCase):
+
+    def get_state(self, sc, label):
+        [state] = [st for st in sc.iter_states() if st.label == label]
+        return state
+
+    def test_load_on_activation(self):
+        sc = read_statechart(CVM, lazy=True)
+        coffee = self.get_state(sc, 'COFFEE')
+        self.assertTrue(coffee.pending)
+        self.assertEqual([], self.get_state(sc, 'IDLE').transitions)
+        ntransitions = len(sc.all_transitions)
+        sim = Simulator(sc)
+        self.assertTrue(coffee.pending)
+        sim.inputs.power_on.fire()
+        self.assertFalse(coffee.pending)
+        self.assertTrue(self.get_state(sc, 'IDLE').transitions)
+        self.assertTrue(len(sc.all_transitions) > ntransitions)
+        self.assertEqual(range(len(sc.all_transitions)),
+                [t.index for t in sc.all_transitions])
+        # the table extended on loading is the table of all the transitions
+        table = ConflictTable(sc)
+        for name in ('transitions', 'rank', 'conflicts', 'lower', 'nondeterministic'):
+            self.assertEqual(getattr(table, name), getattr(sc.conflicts, name))
+
+    def test_same_as_eager(self):
+        (eager, lazy) = (read_statechart(CVM), read_statechart(CVM, lazy=True))
+        (sim1, sim2) = (Simulator(eager, seed=1), Simulator(lazy, seed=1))
+        for _ in range(30):
+            self.assertEqual(sim1.random_step(), sim2.random_step())
+            self.assertEqual(sim1.outputs, sim2.outputs)
+            self.assertEqual(sim1.get_configuration(), sim2.get_configuration())
+        self.assertEqual(eager.get_fingerprint(), lazy.get_fingerprint())
+        self.assertEqual([t.get_label() for t in eager.all_transitions],
+                [t.get_label() for t in lazy.all_transitions])
@@ -0,0 +1,135 @@
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import networkx as nx
+
+from pymbt.explorer import Explorer
+from pymbt.statechart import read_statechart
+from pymbt.stategraph import GraphBuilder, StateGraphError, from_networkx, load_graph
+from pymbt.visited import HashCompactStore
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+def create_graph(n, edges):
+    builder = GraphBuilder()
+    for node in range(n):
+        builder.add_node(node, configuration=node)
+    for (source, target) in edges:
+        builder.add_edge(source, target, inputs=("e%d" % target,), outputs=frozenset())
+    return builder.build()
+
+
+class StateGraphTestCase(unittest.TestCase):
+
+    def test_build(self):
+        # edges of each node keep the order they were added in
+        graph = create_graph(4, [(2, 0), (0, 1), (2, 3), (0, 2)])
+        self.assertEqual([0, 2, 2, 4, 4], list(graph.offsets))
+        self.assertEqual([1, 2], list(graph.successors(0)))
+        self.assertEqual([0, 3], list(graph.successors(2)))
+        self.assertEqual([2, 2], [graph.get_source(edge) for edge in graph.out_edges(2)])
+        self.assertEqual([1, 3], graph.deadlocks())
+        self.assertEqual(dict(inputs=("e3",), outputs=frozenset()), graph.get_edge_data(3))
+        self.assertEqual(4, len(graph.label_table))
+        self.assertRaises(StateGraphError, GraphBuilder().add_node, 1)
+
+    def test_components(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            n = rng.randint(1, 30)
+            edges = [(rng.randrange(n), rng.randrange(n)) for _ in range(rng.randint(0, 2 * n))]
+            graph = create_graph(n, edges)
+            (count, components) = graph.strongly_connected_components()
+            g = nx.DiGraph()
+            g.add_nodes_from(range(n))
+            g.add_edges_from(edges)
+            expected = sorted(sorted(c) for c in nx.strongly_connected_components(g))
+            found = dict()
+            for node in range(n):
+                found.setdefault(components[node], []).append(node)
+            self.assertEqual(count, len(found))
+            self.assertEqual(expected, sorted(found.values()))
+            # reverse topological order: edges never lead to a later component
+            for (source, target) in edges:
+                self.assertTrue(components[source] >= components[target])
+
+    def test_long_chain(self):
+        n = 100000
+        graph = create_graph(n, [(i, i + 1) for i in range(n - 1)] + [(n - 1, 0)])
+        self.assertEqual(1, graph.strongly_connected_components()[0])
+        paths = graph.get_shortest_paths(0)
+        self.assertEqual(n - 1, paths.distances[n - 1])
+        self.assertEqual(range(10), paths.get_path(10))
+
+    def test_shortest_paths(self):
+        graph = create_graph(5, [(0, 1), (1, 2), (0, 3), (3, 2), (2, 0)])
+        paths = graph.get_shortest_paths(0)
+        self.assertEqual([0, 1, 2, 1, -1], list(paths.distances))
+        self.assertEqual([0, 2], paths.get_path(2))
+        self.assertEqual([], paths.get_path(0))
+        self.assertEqual(None, paths.get_path(4))
+
+    def test_edge_cover(self):
+        graph = create_graph(5, [(0, 1), (1, 2), (0, 3), (3, 2), (2, 0), (4, 0)])
+        paths = graph.get_edge_cover()
+        self.assertEqual([[0, 2, 3, 1, 4]], paths)
+        covered = set(edge for path in paths for edge in path)
+        self.assertEqual(set(range(5)), covered)  # 4 -> 0 is unreachable
+        for path in graph.get_edge_cover(max_length=2):
+            self.assertEqual(0, graph.get_source(path[0]))
+            for (edge, next_edge) in zip(path, path[1:]):
+                self.assertEqual(graph.get_target(edge), graph.get_source(next_edge))
+
+    def test_explore(self):
+        explorer = Explorer(read_statechart(CVM), graph=GraphBuilder())
+        graph = explorer.explore().build()
+        expected = from_networkx(Explorer(read_statechart(CVM)).explore())
+        self.assertEqual((explorer.stats['states'], explorer.stats['edges']),
+                (len(graph), graph.number_of_edges()))
+        for node in range(len(graph)):
+            self.assertEqual(sorted(expected.successors(node)), sorted(graph.successors(node)))
+        self.assertEqual(explorer.initial, graph.get_configuration(0))
+        self.assertEqual([(("power_on",), frozenset(["light_on"]))],
+                graph.get_steps(graph.get_shortest_paths().get_path(1)))
+        self.assertEqual([], graph.deadlocks())
+
+    def test_explore_without_configurations(self):
+        explorer = Explorer(read_statechart(CVM), visited=HashCompactStore(1000),
+                graph=GraphBuilder(configurations=False))
+        builder = explorer.explore()
+        self.assertEqual({}, explorer.nodes)
+        self.assertEqual(None, builder.configurations)
+        self.assertEqual(explorer.stats['states'], len(builder.nodes))
+        graph = builder.build()
+        self.assertEqual(None, graph.get_configuration(0))
+        expected = Explorer(read_statechart(CVM), graph=GraphBuilder()).explore().build()
+        self.assertEqual(list(expected.targets), list(graph.targets))
+        self.assertEqual(expected.get_edge_cover(), graph.get_edge_cover())
+
+    def test_save_load(self):
+        graph = from_networkx(Explorer(read_statechart(CVM)).explore())
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "cvm.graph")
+            graph.save(path)
+            loaded = load_graph(path)
+            for name in ('offsets', 'targets', 'labels'):
+                self.assertEqual(list(getattr(graph, name)), list(getattr(loaded, name)))
+            self.assertEqual(graph.configurations, loaded.configurations)
+            self.assertEqual(graph.get_edge_cover(), loaded.get_edge_cover())
+            self.assertEqual(graph.strongly_connected_components()[0],
+                    loaded.strongly_connected_components()[0])
+            with open(path, 'wb') as fp:
+                fp.write("x" * 64)
+            self.assertRaises(StateGraphError, load_graph, path)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+
+import unittest
+
+from pymbt.simulator import Simulator
+from pymbt.statechart import StateChart, State
+from pymbt.statistical import (InState, Output, StatisticalError, HypothesisTest,
+        choose_input, sample, estimate, check)
+from pymbt.transition import make_transition
+
+
+def create_fork_statechart():
+    """Returns a statechart which from START moves to LEFT on left, with
+    output went_left, or to RIGHT on right.
+    """
+    root = StateChart("root")
+    (start, left, right) = (State("START"), State("LEFT"), State("RIGHT"))
+    for state in (start, left, right):
+        root.add_state(state)
+    root.set_start_state(start)
+    root.init = make_transition("")
+    start.add_transition(make_transition("left / went_left"), left)
+    start.add_transition(make_transition("right"), right)
+    root.compile()
+    return root
+
+
+class StatisticalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sc = create_fork_statechart()
+
+    def test_choose_input(self):
+        sim = Simulator(self.sc, seed=1)
+        self.assertEqual("left", choose_input(sim, {'right': 0}))
+        counts = dict(left=0, right=0)
+        for _ in xrange(1000):
+            counts[choose_input(sim, {'left': 3})] += 1
+        self.assertTrue(700 < counts['left'] < 800)
+
+    def test_sample(self):
+        sim = Simulator(self.sc)
+        self.assertEqual(True, sample(sim, InState("START"), 0))
+        self.assertEqual(True, sample(sim, Output("went_left"), 1, {'right': 0}))
+        # no inputs are expected in LEFT
+        self.assertEqual(False, sample(sim, InState("RIGHT"), 5))
+
+    def test_estimate(self):
+        result = estimate(self.sc, InState("LEFT"), 1, weights={'left': 3},
+                epsilon=0.02, processes=0, seed=1)
+        (low, high) = result.get_interval()
+        self.assertTrue(low <= 0.75 <= high)
+        self.assertTrue(high - low <= 0.04)
+        # stopped well before the fixed sample size bound
+        self.assertTrue(result.samples < 4612)
+
+    def test_estimate_processes(self):
+        results = [estimate(self.sc, Output("went_left"), 1, epsilon=0.05,
+                processes=processes, batch=50, seed=2) for processes in (0, 2)]
+        self.assertEqual((results[0].samples, results[0].successes),
+                (results[1].samples, results[1].successes))
+
+    def test_check(self):
+        result = check(self.sc, InState("LEFT"), 1, theta=0.5, delta=0.05,
+                weights={'left': 3}, processes=0, seed=3)
+        self.assertEqual(True, result.accepted)
+        result = check(self.sc, InState("LEFT"), 1, theta=0.9, delta=0.05,
+                weights={'left': 3}, processes=0, seed=3)
+        self.assertEqual(False, result.accepted)
+        self.assertTrue(result.samples < 1000)
+
+    def test_check_undecided(self):
+        result = check(self.sc, InState("LEFT"), 1, theta=0.5, delta=0.01,
+                max_samples=100, processes=0, seed=4)
+        self.assertEqual(None, result.accepted)
+        self.assertEqual(100, result.samples)
+
+    def test_bad_hypothesis(self):
+        self.assertRaises(StatisticalError, HypothesisTest, 0.99, 0.05)
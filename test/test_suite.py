@@ -0,0 +1,104 @@
+
+import imp
+import os
+import shutil
+import tempfile
+import unittest
+
+from pymbt.executor import Executor, FakeAdapter
+from pymbt.generator import TestSequence, generate_random_sequences
+from pymbt.statechart import read_statechart
+from pymbt.suite import SuiteError, minimize_suite, set_durations, write_test_modules
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class SilentAdapter(FakeAdapter):
+    """A faulty SUT producing no outputs.
+    """
+
+    def read_outputs(self):
+        return set()
+
+
+class MinimizeTestCase(unittest.TestCase):
+
+    def test_set_cover(self):
+        sequences = [
+            TestSequence([1], frozenset("ab")),
+            TestSequence([1, 2], frozenset("abcd")),
+            TestSequence([1], frozenset("cd")),
+            TestSequence([1, 2, 3], frozenset("e")),
+        ]
+        self.assertEqual([sequences[1], sequences[3]], minimize_suite(sequences))
+        self.assertEqual([sequences[0], sequences[2], sequences[3]],
+                minimize_suite(sequences, weight=lambda seq: len(seq) ** 2))
+
+    def test_integer_weights(self):
+        # ratios 1.5, 2 and 1: dividing integers would rank the first as 2
+        sequences = [
+            TestSequence([1, 2], frozenset("abc")),
+            TestSequence([1], frozenset("ab")),
+            TestSequence([1], frozenset("c")),
+        ]
+        self.assertEqual(sequences[1:], minimize_suite(sequences, weight=len))
+
+    def test_time(self):
+        sequences = [
+            TestSequence([1], frozenset("ab"), duration=1.0),
+            TestSequence([1, 2], frozenset("abcd"), duration=5.0),
+            TestSequence([1], frozenset("cd"), duration=1.0),
+        ]
+        self.assertEqual([sequences[0], sequences[2]], minimize_suite(sequences, weight='time'))
+        sequences.append(TestSequence([1], frozenset("e")))
+        self.assertRaises(SuiteError, minimize_suite, sequences, weight='time')
+        sequences[-1].duration = 0.0
+        self.assertRaises(SuiteError, minimize_suite, sequences, weight='time')
+
+    def test_set_durations(self):
+        sequences = list(generate_random_sequences(read_statechart(CVM), 5, 10, seed=1))
+        report = Executor(CVM, FakeAdapter, (CVM,), workers=0).run(sequences)
+        set_durations(sequences, report)
+        self.assertTrue(all(seq.duration >= 0 for seq in sequences))
+        self.assertTrue(minimize_suite([seq for seq in sequences if seq.duration > 0],
+                weight='time'))
+
+    def test_random_sequences(self):
+        sequences = list(generate_random_sequences(read_statechart(CVM), 50, 10, seed=1))
+        suite = minimize_suite(sequences, weight='length')
+        self.assertTrue(len(suite) < 10)
+        covered = frozenset().union(*[seq.coverage for seq in sequences])
+        self.assertEqual(covered, frozenset().union(*[seq.coverage for seq in suite]))
+
+
+class WriteTestModulesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_modules(self, adapter):
+        sequences = generate_random_sequences(read_statechart(CVM), 5, 10, seed=2)
+        model = os.path.abspath(CVM)
+        paths = write_test_modules(self.directory, sequences, model, adapter, (model,),
+                tests_per_module=2)
+        self.assertEqual(3, len(paths))
+        suite = unittest.TestSuite()
+        for (index, path) in enumerate(paths):
+            module = imp.load_source("generated_%s_%d" % (adapter.rpartition(".")[2], index), path)
+            suite.addTests(unittest.defaultTestLoader.loadTestsFromModule(module))
+        result = unittest.TestResult()
+        suite.run(result)
+        self.assertEqual(5, result.testsRun)
+        return result
+
+    def test_write_and_run(self):
+        result = self.run_modules("pymbt.executor.FakeAdapter")
+        self.assertEqual([], result.failures + result.errors)
+
+    def test_faulty_sut(self):
+        result = self.run_modules("test.test_suite.SilentAdapter")
+        self.assertEqual(5, len(result.failures))
+        self.assertRaises(SuiteError, write_test_modules, self.directory, [], CVM, "Adapter")
@@ -0,0 +1,130 @@
+
+import time
+import unittest
+
+from pymbt.explorer import Explorer, Independence
+from pymbt.simulator import Simulator
+from pymbt.statechart import StateChart, AndState, State
+from pymbt.transition import make_transition, ParseError
+
+
+def create_machine_statechart():
+    """Returns a statechart of a machine, BUSY for at most 30s after
+    start, and a ticker producing tick every minute.
+    """
+    root = StateChart("root")
+    on = AndState("ON")
+    (machine, ticker) = (StateChart("MACHINE"), StateChart("TICKER"))
+    (idle, busy, ticking) = (State("IDLE"), State("BUSY"), State("TICKING"))
+    for (parent, children) in ((root, [on]), (on, [machine, ticker]),
+            (machine, [idle, busy]), (ticker, [ticking])):
+        for child in children:
+            parent.add_state(child)
+    for (chart, start) in ((root, on), (machine, idle), (ticker, ticking)):
+        chart.set_start_state(start)
+        chart.init = make_transition("")
+    idle.add_transition(make_transition("start"), busy)
+    busy.add_transition(make_transition("done / served"), idle)
+    busy.add_transition(make_transition("after(30s) / timeout"), idle)
+    ticking.add_transition(make_transition("after(1min) / tick"), ticking)
+    root.compile()
+    return root
+
+
+class TimersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = Simulator(create_machine_statechart())
+
+    def get_states(self):
+        return sorted(st.label for st in self.sim.active_states if st.is_basic())
+
+    def test_parse(self):
+        self.assertEqual(0.25, make_transition("after(250ms)").timeout)
+        self.assertEqual(5400.0, make_transition("after( 1.5h )").timeout)
+        self.assertEqual(None, make_transition("after").timeout)
+        self.assertRaises(ParseError, make_transition, "after(soon)")
+
+    def test_timeout(self):
+        sim = self.sim
+        self.assertEqual(["start"], sorted(sim.inputs.iterevents()))
+        sim.inputs.start.fire()
+        self.assertEqual(30.0, sim.get_next_deadline())
+        self.assertEqual(0, sim.advance(29))
+        self.assertEqual(["BUSY", "TICKING"], self.get_states())
+        self.assertEqual(1, sim.advance(1))
+        self.assertEqual(set(["timeout"]), sim.outputs)
+        self.assertEqual(["IDLE", "TICKING"], self.get_states())
+        self.assertEqual(30.0, sim.clock)
+
+    def test_cancel(self):
+        sim = self.sim
+        sim.inputs.start.fire()
+        sim.advance(10)
+        sim.inputs.done.fire()
+        self.assertEqual(60.0, sim.get_next_deadline())
+        # starting again restarts the timer
+        sim.inputs.start.fire()
+        self.assertEqual(1, sim.advance(35))
+        self.assertEqual(set(["timeout"]), sim.outputs)
+        self.assertEqual(45.0, sim.clock)
+
+    def test_jump_to_deadline(self):
+        sim = self.sim
+        self.assertEqual(1, sim.advance())
+        self.assertEqual((60.0, set(["tick"])), (sim.clock, sim.outputs))
+        start = time.time()
+        self.assertEqual(600, sim.advance(10 * 3600))
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual(36060.0, sim.clock)
+
+    def test_checkpoint(self):
+        self.sim.inputs.start.fire()
+        self.sim.advance(12)
+        sim = Simulator(self.sim.sc)
+        sim.set_checkpoint(self.sim.get_checkpoint())
+        self.assertEqual(12.0, sim.clock)
+        self.assertEqual(30.0, sim.get_next_deadline())
+        # expired timers not yet stepped are kept
+        [transition] = [t for t in self.sim.armed if t.timeout == 30]
+        self.sim.expired.add(transition)
+        sim.set_checkpoint(self.sim.get_checkpoint())
+        self.assertEqual(set([transition]), sim.expired)
+        sim.next()
+        self.assertEqual(set(["timeout"]), sim.outputs)
+
+    def test_explore(self):
+        # only start and done are explored, counting the armed tickers
+        explorer = Explorer(self.sim.sc)
+        graph = explorer.explore()
+        self.assertEqual((2, 2, 2), (explorer.stats['states'], explorer.stats['edges'],
+                explorer.stats['timeouts']))
+        self.assertEqual(set([("start",), ("done",)]),
+                set(data['inputs'] for (_, _, data) in graph.edges(data=True)))
+        self.assertEqual(["done", "start"], sorted(Independence(self.sim.sc).closures))
+
+    def test_lazy_renumbering(self):
+        # transitions of A and ON are loaded on activation, and loading all
+        # of them numbers x before the timeout transition loaded first
+        root = StateChart("root")
+        (off, a, on) = (State("OFF"), StateChart("A"), StateChart("ON"))
+        (a1, wait, done) = (State("A1"), State("WAIT"), State("DONE"))
+        for (parent, children) in ((root, [off, a, on]), (a, [a1]), (on, [wait, done])):
+            for child in children:
+                parent.add_state(child)
+            parent.set_start_state(children[0])
+            parent.init = make_transition("")
+        off.add_transition(make_transition("start"), on)
+        off.add_transition(make_transition("go"), a)
+        a.pending = [(a1, dict(event="x"), a1)]
+        on.pending = [(wait, dict(event="after(10s)", outputs=["late"]), done)]
+        root.compile()
+        sim = Simulator(root, flatten=False)
+        sim.inputs.start.fire()
+        checkpoint = sim.get_checkpoint()
+        self.assertEqual(1, sim.advance(10))
+        self.assertEqual(set(["late"]), sim.outputs)
+        sim = Simulator(root, flatten=False)
+        sim.set_checkpoint(checkpoint)
+        self.assertEqual(1, sim.advance(10))
+        self.assertEqual(set(["late"]), sim.outputs)
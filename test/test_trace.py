@@ -0,0 +1,55 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pymbt.simulator import Simulator
+from pymbt.statechart import read_statechart
+from pymbt.trace import TraceWriter, TraceReader
+
+CVM = os.path.join(os.path.dirname(__file__), "..", "examples", "cvm.graphml")
+
+
+class TraceTestCase(unittest.TestCase):
+
+    inputs = ["power_on", "inc", "inc", "coffee", "done", "change", "power_off"]
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.path = os.path.join(self.dirname, "cvm.trace")
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def run_simulator(self, writer, repeat=1):
+        sim = Simulator(read_statechart(CVM))
+        sim.recorder = writer
+        for event in self.inputs * repeat:
+            sim.enabled_inputs.add(event)
+            sim.next()
+        return sim
+
+    def test_read_step(self):
+        with TraceWriter(self.path, chunk_size=4) as writer:
+            self.run_simulator(writer)
+        trace = TraceReader(self.path)
+        self.assertEqual(9, len(trace))  # coffee and change take 2 steps
+        step = trace[0]
+        self.assertEqual(("IDLE", "EMPTY"), step.states)
+        self.assertEqual(frozenset(["power_on"]), step.inputs)
+        self.assertEqual(frozenset(["light_on"]), step.outputs)
+        self.assertEqual({'m': 0}, step.variables)
+        self.assertEqual(2, trace[2].variables['m'])
+        self.assertEqual(("OFF",), trace[-1].states)
+        self.assertEqual(9, len(list(trace)))
+        trace.close()
+
+    def test_read_without_index(self):
+        writer = TraceWriter(self.path, chunk_size=4)
+        self.run_simulator(writer, repeat=3)
+        writer.fp.close()  # simulate a crash
+        trace = TraceReader(self.path)
+        self.assertEqual(24, len(trace))  # last partial chunk is lost
+        self.assertEqual(frozenset(["power_off"]), trace[17].inputs)
+        trace.close()